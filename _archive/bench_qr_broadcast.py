@@ -0,0 +1,135 @@
+"""
+End-to-end latency test for the QR WebSocket broadcaster.
+
+Starts a QRBroadcaster on a local port, publishes synthetic QR states from a
+producer thread at each rate, and has several WebSocket clients measure
+publish-to-receive latency from each message's timestamp. One extra client
+only handles the newest message every 100 ms, like a renderer drawing at
+10 fps, to show that a slow consumer still sees fresh state and does not
+delay the others.
+
+With --url it only acts as a client of an already running server (e.g.
+python qr.py --source clip.avi --headless) and reports what it receives.
+
+Usage: python bench_qr_broadcast.py [--rates 30 60] [--clients 4] [--seconds 5]
+"""
+import argparse
+import asyncio
+import math
+import socket
+import time
+from threading import Thread
+
+import numpy as np
+import websockets
+
+from qr_broadcast import QRBroadcaster, decode_message, encode_message
+
+SLOW_CLIENT_DELAY = 0.1  # seconds between messages the slow client handles
+
+
+def synthetic_qr_data(i):
+    angle = i / 30
+    cx, cy = 320 + 100 * math.cos(angle), 240 + 100 * math.sin(angle)
+    corners = [[cx + 50 * math.cos(angle + k * math.pi / 2), cy + 50 * math.sin(angle + k * math.pi / 2)]
+               for k in range(4)]
+    return [{"info": "bench-marker", "location": corners, "rotation": np.float32(angle), "scale": np.float32(70.7)}]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+async def client(url, seconds, delay=0.0):
+    """
+    (latencies in ms, sequence numbers) of the messages handled in the given time
+
+    With a delay, messages are drained as they arrive and the client handles
+    only the newest one after each delay, the way a renderer that draws once
+    per animation frame consumes the stream.
+    """
+    latencies, seqs = [], []
+    handled_at = -math.inf
+
+    def handle(message):
+        latencies.append(time.time_ns() / 1e6 - message["ts"] / 1e3)
+        seqs.append(message["seq"])
+
+    async with websockets.connect(url) as websocket:
+        deadline = time.monotonic() + seconds
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                payload = await asyncio.wait_for(websocket.recv(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if not delay:
+                handle(decode_message(payload))
+                continue
+            if time.monotonic() - handled_at >= delay:
+                handle(decode_message(payload))
+                handled_at = time.monotonic()
+    return np.array(latencies), seqs
+
+
+async def run_clients(url, clients, seconds, slow=True):
+    delays = [0.0] * clients + ([SLOW_CLIENT_DELAY] if slow else [])
+    return await asyncio.gather(*(client(url, seconds, delay) for delay in delays))
+
+
+def produce(broadcaster, rate, seconds):
+    interval, start = 1 / rate, time.perf_counter()
+    for i in range(int(rate * seconds)):
+        broadcaster.publish(synthetic_qr_data(i))
+        delay = start + (i + 1) * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _row(label, published, latencies, seqs):
+    if not len(latencies):
+        return f"{label:<22}{published:>10}{0:>10}"
+    return (f"{label:<22}{published:>10}{len(seqs):>10}{np.percentile(latencies, 50):>9.2f}"
+            f"{np.percentile(latencies, 99):>9.2f}{latencies.max():>9.2f}")
+
+
+def benchmark(rates, clients, seconds, encoding):
+    sample = synthetic_qr_data(0)
+    print(f"payload bytes: msgpack {len(encode_message(sample, 1))}, json {len(encode_message(sample, 1, 'json'))}")
+    print(f"{'rate / client':<22}{'published':>10}{'received':>10}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for rate in rates:
+        broadcaster = QRBroadcaster("localhost", _free_port(), encoding).start()
+        url = f"ws://localhost:{broadcaster.port}"
+        results = {}
+        # Clients connect first, then the producer runs for the measured window
+        consumer = Thread(target=lambda: results.update(r=asyncio.run(run_clients(url, clients, seconds + 0.5))))
+        consumer.start()
+        time.sleep(0.3)
+        produce(broadcaster, rate, seconds)
+        consumer.join()
+        broadcaster.stop()
+
+        published = broadcaster.published
+        fast = results["r"][:clients]
+        all_latencies = np.concatenate([latencies for latencies, _ in fast])
+        print(_row(f"{rate} Hz x {clients} clients", published, all_latencies, [s for _, seqs in fast for s in seqs]))
+        slow_latencies, slow_seqs = results["r"][clients]
+        print(_row(f"{rate} Hz slow client", published, slow_latencies, slow_seqs))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rates", type=int, nargs="+", default=[30, 60], help="publish rates in Hz")
+    parser.add_argument("--clients", type=int, default=4, help="normal-speed clients per run")
+    parser.add_argument("--seconds", type=float, default=5.0, help="measured duration per rate")
+    parser.add_argument("--encoding", choices=("msgpack", "json"), default="msgpack")
+    parser.add_argument("--url", help="measure an already running server instead")
+    args = parser.parse_args()
+
+    if args.url:
+        latencies, seqs = asyncio.run(client(args.url, args.seconds))
+        print(f"{'client':<22}{'published':>10}{'received':>10}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        print(_row(args.url, (seqs[-1] - seqs[0] + 1) if seqs else 0, latencies, seqs))
+    else:
+        benchmark(args.rates, args.clients, args.seconds, args.encoding)
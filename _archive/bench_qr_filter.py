@@ -0,0 +1,77 @@
+"""
+Jitter and message-volume benchmark for the QR pose filter.
+
+Feeds a synthetic marker trajectory through QRPoseFilter at the camera frame
+rate. The marker holds still, sweeps across the frame while turning, then
+holds still again. Its corners and angle get Gaussian noise like the raw
+detector output. Reports the error against the true pose for raw and
+filtered output, and how many messages each would send downstream.
+
+Usage: python bench_qr_filter.py [--fps 30] [--noise 1.5]
+"""
+import argparse
+import math
+
+import numpy as np
+
+from qr import calculate_rotation_and_scale
+from qr_filter import QRPoseFilter
+
+SIZE = 80.0  # marker side in px
+
+
+def true_pose(t):
+    """(centre x, centre y, angle) of the marker at time t: hold 2 s, move 2 s, hold 2 s"""
+    progress = min(max((t - 2.0) / 2.0, 0.0), 1.0)
+    progress = progress * progress * (3 - 2 * progress)  # smoothstep
+    return 150 + 300 * progress, 240 + 60 * math.sin(math.pi * progress), math.radians(60) * progress
+
+
+def corners(cx, cy, angle):
+    half = SIZE / 2
+    square = np.array([[-half, -half], [half, -half], [half, half], [-half, half]])
+    rotation = np.array([[math.cos(angle), -math.sin(angle)], [math.sin(angle), math.cos(angle)]])
+    return square @ rotation.T + (cx, cy)
+
+
+def run(fps, noise, seconds=6.0):
+    rng = np.random.default_rng(0)
+    pose_filter = QRPoseFilter()
+    raw_errors, filtered_errors, emitted_errors = [], [], []
+    last_emitted = None
+
+    for i in range(int(seconds * fps)):
+        t = i / fps
+        truth = corners(*true_pose(t))
+        observed = truth + rng.normal(0, noise, truth.shape)
+        rotation, scale = calculate_rotation_and_scale(observed)
+        messages = pose_filter.update(
+            [{"info": "bench-marker", "location": observed.tolist(), "rotation": rotation, "scale": scale}], t)
+        if messages:
+            last_emitted = np.array(messages[0]["location"])
+
+        smoothed = np.array(pose_filter.markers["bench-marker"].as_qr_data()["location"])
+        raw_errors.append(np.linalg.norm(observed.mean(axis=0) - truth.mean(axis=0)))
+        filtered_errors.append(np.linalg.norm(smoothed.mean(axis=0) - truth.mean(axis=0)))
+        emitted_errors.append(np.linalg.norm(last_emitted.mean(axis=0) - truth.mean(axis=0)))
+
+    still = np.r_[0:int(2 * fps), int(4.5 * fps):int(seconds * fps)]
+    moving = np.r_[int(2 * fps):int(4 * fps)]
+    print(f"{fps} fps, corner noise {noise} px; centre error vs truth in px")
+    print(f"{'output':<22}{'messages':>9}{'still rms':>11}{'moving rms':>12}")
+    for label, errors, messages in (
+        ("raw detections", raw_errors, pose_filter.received),
+        ("filtered", filtered_errors, pose_filter.received),
+        ("filtered, thresholded", emitted_errors, pose_filter.emitted),
+    ):
+        errors = np.array(errors)
+        print(f"{label:<22}{messages:>9}{np.sqrt(np.mean(errors[still] ** 2)):>11.2f}"
+              f"{np.sqrt(np.mean(errors[moving] ** 2)):>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--noise", type=float, default=1.5, help="corner noise standard deviation in px")
+    args = parser.parse_args()
+    run(args.fps, args.noise)
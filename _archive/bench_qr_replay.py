@@ -0,0 +1,63 @@
+"""
+Deterministic QR pipeline benchmark over recorded logs.
+
+Replays each log (see qr_replay.py) through full-frame process_image and
+through the ROI tracker, and reports frames/sec, p50/p99 per-frame latency
+and detection accuracy against the detections stored in the log. Exits
+non-zero if a run falls below --min-fps or --min-recall, so it can gate
+changes without a camera.
+
+Usage: python bench_qr_replay.py [log ...] [--min-fps F] [--min-recall R]
+Without logs, a synthetic clip is generated and recorded first.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from bench_qr_tracking import synthesize_clip
+from qr import QRProcessor
+from qr_replay import RESULT_HEADER, format_result, record, run_replay
+from qr_tracking import REDETECT_INTERVAL, QRTracker
+
+
+def benchmark(logs, min_fps, min_recall, native=False):
+    failures = []
+    print(RESULT_HEADER)
+    for log in logs:
+        name = os.path.splitext(os.path.basename(log))[0]
+        processor, tracker = QRProcessor(), QRTracker(redetect_interval=REDETECT_INTERVAL)
+        runs = {
+            "process_image": None,
+            # Tracking runs on the same contrast-enhanced frames process_image decodes
+            f"track/{REDETECT_INTERVAL}": lambda image: tracker.update(processor.enhance(image)),
+        }
+        for label, find_markers in runs.items():
+            result = run_replay(log, native, find_markers)
+            print(format_result(f"{name[:14]} {label}", result))
+            if min_fps is not None and result["fps"] < min_fps:
+                failures.append(f"{name} {label}: {result['fps']:.1f} fps < {min_fps}")
+            if min_recall is not None and result["recall"] < min_recall:
+                failures.append(f"{name} {label}: recall {result['recall']:.3f} < {min_recall}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("logs", nargs="*", help="recorded .qrlog files (default: a synthetic recording)")
+    parser.add_argument("--native", action="store_true", help="replay at the recorded frame rate")
+    parser.add_argument("--min-fps", type=float, help="fail if any run is slower")
+    parser.add_argument("--min-recall", type=float, help="fail if any run detects fewer of the logged markers")
+    args = parser.parse_args()
+
+    if args.logs:
+        sys.exit(benchmark(args.logs, args.min_fps, args.min_recall, args.native))
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = synthesize_clip(os.path.join(tmp, "synthetic.avi"))
+        log = os.path.join(tmp, "synthetic.qrlog")
+        frames = record(clip, log)
+        print(f"recorded {frames} frames: {os.path.getsize(clip):,} B clip -> {os.path.getsize(log):,} B log")
+        sys.exit(benchmark([log], args.min_fps, args.min_recall, args.native))
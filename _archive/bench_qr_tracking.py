@@ -0,0 +1,109 @@
+"""
+Offline benchmark of full-frame QR detection versus ROI tracking.
+
+Runs every frame of each clip through CLAHE and then either a full-frame
+detectAndDecodeMulti or a QRTracker. Full detection on every frame is the
+reference. Reports per-frame detection latency, recall (frames where the
+tracker reports a marker the reference found) and mean corner error
+against the reference.
+
+Usage: python bench_qr_tracking.py [clip ...] [--interval N ...]
+Without clips a synthetic moving, rotating marker clip is generated.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from qr import QRProcessor
+from qr_tracking import REDETECT_INTERVAL, QRTracker
+
+
+def synthesize_clip(path, frames=300, size=(640, 480), fps=30):
+    """Write a clip of one QR code drifting and rotating over a noisy background"""
+    marker = cv2.QRCodeEncoder.create().encode("bench-marker")
+    marker = cv2.resize(marker, None, fx=5, fy=5, interpolation=cv2.INTER_NEAREST)
+    marker = cv2.copyMakeBorder(marker, 20, 20, 20, 20, cv2.BORDER_CONSTANT, value=255)
+    h, w = marker.shape
+    rng = np.random.default_rng(0)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, size)
+    for i in range(frames):
+        angle = 20 * np.sin(i / 40)
+        cx = size[0] / 2 + 150 * np.sin(i / 30)
+        cy = size[1] / 2 + 60 * np.cos(i / 45)
+        transform = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        transform[:, 2] += (cx - w / 2, cy - h / 2)
+        frame = cv2.warpAffine(marker, transform, size, borderValue=90)
+        frame = np.clip(frame + rng.normal(0, 6, frame.shape), 0, 255).astype(np.uint8)
+        writer.write(cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR))
+    writer.release()
+    return path
+
+
+def read_enhanced(path):
+    processor, frames = QRProcessor(), []
+    cap = cv2.VideoCapture(path)
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(processor.enhance(frame))
+    cap.release()
+    return frames
+
+
+def run_detector(frames, find_markers):
+    """(latencies in ms, {info: corners} per frame)"""
+    latencies, results = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        qr_data = find_markers(frame)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({qr["info"]: np.array(qr["location"]) for qr in qr_data})
+    return np.array(latencies), results
+
+
+def score(reference, results):
+    """(recall against the reference, mean corner error in px)"""
+    expected = found = 0
+    errors = []
+    for truth, got in zip(reference, results):
+        for info, corners in truth.items():
+            expected += 1
+            if info in got:
+                found += 1
+                errors.append(np.linalg.norm(got[info] - corners, axis=1).mean())
+    recall = found / expected if expected else float("nan")
+    return recall, (float(np.mean(errors)) if errors else float("nan"))
+
+
+def run(clips, intervals):
+    print(f"{'clip':<18}{'mode':<14}{'mean ms':>9}{'p95 ms':>9}{'recall':>8}{'err px':>8}{'speedup':>9}")
+    for clip in clips:
+        frames = read_enhanced(clip)
+        name = os.path.basename(clip)[:17]
+        full_ms, reference = run_detector(frames, QRProcessor().detect)
+        print(f"{name:<18}{'full':<14}{full_ms.mean():>9.2f}{np.percentile(full_ms, 95):>9.2f}"
+              f"{1.0:>8.3f}{0.0:>8.2f}{1.0:>8.1f}x")
+        for interval in intervals:
+            ms, results = run_detector(frames, QRTracker(redetect_interval=interval).update)
+            recall, error = score(reference, results)
+            print(f"{name:<18}{f'track/{interval}':<14}{ms.mean():>9.2f}{np.percentile(ms, 95):>9.2f}"
+                  f"{recall:>8.3f}{error:>8.2f}{full_ms.mean() / ms.mean():>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("clips", nargs="*", help="recorded video files (default: a synthetic clip)")
+    parser.add_argument("--interval", type=int, nargs="+", default=[5, REDETECT_INTERVAL, 30],
+                        help="full re-detect intervals to compare")
+    args = parser.parse_args()
+
+    if args.clips:
+        run(args.clips, args.interval)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            run([synthesize_clip(os.path.join(tmp, "synthetic.avi"))], args.interval)
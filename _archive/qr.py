@@ -1,53 +1,19 @@
 import cv2
 import numpy as np
-import asyncio
-import websockets
-import json
-from queue import Queue
-from threading import Thread
-from typing import List, Dict, Any
+import argparse
+import time
+import traceback
+from collections import deque
+from queue import Empty, Full, Queue
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
 
 # Constants
-WS_HOST = "localhost"
-WS_PORT = 8765
 WINDOW_WIDTH = 1000  # Smaller window width
 WINDOW_HEIGHT = 1000  # Smaller window height
 
-# Queue to hold QR code data
-qr_queue: Queue = Queue()
-
-
-async def websocket_server(websocket, path):
-    while True:
-        if not qr_queue.empty():
-            data = qr_queue.get()
-            data = convert_to_json_serializable(data)
-
-            await websocket.send(json.dumps(data))
-        else:
-            await asyncio.sleep(0.1)
-
-
-async def start_server():
-    server = await websockets.serve(websocket_server, WS_HOST, WS_PORT)
-    print(f"WebSocket server started on ws://{WS_HOST}:{WS_PORT}")
-    await server.wait_closed()
-
-
-def convert_to_json_serializable(obj):
-    if isinstance(obj, np.float32):
-        return float(obj)
-    elif isinstance(obj, dict):
-        return {k: convert_to_json_serializable(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_to_json_serializable(i) for i in obj]
-    return obj
-
-
-def run_websocket_server(loop: asyncio.AbstractEventLoop):
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(start_server())
-
+PIPELINE_QUEUE_SIZE = 2  # frames buffered between stages
+STATS_WINDOW = 120  # recent frames the FPS/latency counters cover
 
 def calculate_rotation_and_scale(points):
     # Calculate rotation
@@ -60,87 +26,385 @@ def calculate_rotation_and_scale(points):
     return angle, width
 
 
-def process_image(image: np.ndarray) -> np.ndarray:
-    # Split the image into its color channels
-    b, g, r = cv2.split(image)
-
-    # Create a CLAHE object
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-
-    # Apply CLAHE to each channel
-    b = clahe.apply(b)
-    g = clahe.apply(g)
-    r = clahe.apply(r)
-
-    # Merge the channels back together
-    contrast_image = cv2.merge((b, g, r))
-
-    qcd = cv2.QRCodeDetector()
-    ret_qr, decoded_info, points, _ = qcd.detectAndDecodeMulti(contrast_image)
+class QRProcessor:
+    """CLAHE contrast enhancement and QR decoding with reusable OpenCV objects.
+
+    Creating the CLAHE and QRCodeDetector objects per frame is wasteful, but
+    neither is safe to share between threads, so each pipeline stage owns
+    its own processor.
+    """
+
+    def __init__(self):
+        self.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        self.detector = cv2.QRCodeDetector()
+
+    def enhance(self, image: np.ndarray) -> np.ndarray:
+        # Apply CLAHE to each colour channel
+        return cv2.merge([self.clahe.apply(channel) for channel in cv2.split(image)])
 
-    qr_data: List[Dict[str, Any]] = []
-    if ret_qr:
-        for info, point in zip(decoded_info, points):
-            if info:
-                print(f"Decoded info: {info} at {point}")
-                cv2.putText(contrast_image, info, (int(point[0][0]), int(point[0][1] - 10)),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2, cv2.LINE_AA)
-
-                rotation, scale = calculate_rotation_and_scale(point)
-
-                qr_data.append({
-                    "info": info,
-                    "location": point.tolist(),
-                    "rotation": rotation,
-                    "scale": scale
-                })
-            contrast_image = cv2.polylines(
-                contrast_image, [point.astype(int)], True, (0, 0, 255), 2)
-
-    if qr_data:
-        qr_queue.put(qr_data)
-
-    return contrast_image
+    def detect(self, image: np.ndarray) -> List[Dict[str, Any]]:
+        ret_qr, decoded_info, points, _ = self.detector.detectAndDecodeMulti(image)
+
+        qr_data: List[Dict[str, Any]] = []
+        if ret_qr:
+            for info, point in zip(decoded_info, points):
+                if info:
+                    rotation, scale = calculate_rotation_and_scale(point)
+                    qr_data.append({
+                        "info": info,
+                        "location": point.tolist(),
+                        "rotation": rotation,
+                        "scale": scale
+                    })
+        return qr_data
+
+
+def annotate(image: np.ndarray, qr_data: List[Dict[str, Any]]) -> np.ndarray:
+    """Draw the decoded text and outline of each QR code onto image (in place)"""
+    for qr in qr_data:
+        point = np.array(qr["location"])
+        cv2.putText(image, qr["info"], (int(point[0][0]), int(point[0][1] - 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2, cv2.LINE_AA)
+        cv2.polylines(image, [point.astype(int)], True, (0, 0, 255), 2)
+    return image
+
+
+_default_processor: Optional[QRProcessor] = None
+
+
+def process_image(image: np.ndarray, publish: Optional[Callable] = None) -> np.ndarray:
+    """Enhance, decode and annotate one frame, passing any QR data to publish"""
+    global _default_processor
+    if _default_processor is None:
+        _default_processor = QRProcessor()
+
+    contrast_image = _default_processor.enhance(image)
+    qr_data = _default_processor.detect(contrast_image)
+    if qr_data and publish is not None:
+        publish(qr_data)
+
+    return annotate(contrast_image, qr_data)
+
+
+class Frame(NamedTuple):
+    seq: int
+    captured_at: float  # time.perf_counter() when the frame was read
+    image: np.ndarray
+    qr_data: Optional[List[Dict[str, Any]]] = None
+
+
+class StageStats:
+    """Thread-safe throughput and latency counters for one pipeline stage"""
+
+    def __init__(self, name: str, window: int = STATS_WINDOW):
+        self.name = name
+        self.processed = 0
+        self.dropped = 0  # frames discarded from this stage's input queue
+        self.failed = 0  # frames whose work raised, and were discarded
+        self._lock = Lock()
+        self._done_at: deque = deque(maxlen=window)
+        self._latencies: deque = deque(maxlen=window)
+
+    def record(self, latency: float):
+        with self._lock:
+            self.processed += 1
+            self._done_at.append(time.perf_counter())
+            self._latencies.append(latency)
+
+    def record_drop(self):
+        with self._lock:
+            self.dropped += 1
+
+    def record_failure(self):
+        with self._lock:
+            self.failed += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            done_at, latencies = list(self._done_at), list(self._latencies)
+            processed, dropped, failed = self.processed, self.dropped, self.failed
+        span = done_at[-1] - done_at[0] if len(done_at) > 1 else 0.0
+        latencies_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+        return {
+            "stage": self.name,
+            "processed": processed,
+            "dropped": dropped,
+            "failed": failed,
+            "fps": (len(done_at) - 1) / span if span > 0 else 0.0,
+            "latency_ms": float(latencies_ms.mean()),
+            "latency_p95_ms": float(np.percentile(latencies_ms, 95)),
+        }
+
+
+_STOP = None  # end-of-stream marker passed down the pipeline
+
+
+class QRPipeline:
+    """Capture -> preprocess -> detect -> publish, one thread per stage.
+
+    Stages are connected by small bounded queues. With drop_stale (the
+    default, for live cameras) a stage that falls behind loses its oldest
+    queued frame instead of blocking the stage before it, so the published
+    QR state is always as fresh as possible; without it every frame is
+    processed, which is what a benchmark over a recorded file wants.
+
+    Parameters:
+    - source: camera index or video file path
+    - on_result: optional callback(frame) for each published Frame
+    - queue_size: frames buffered between stages
+    - drop_stale: drop the oldest queued frame when a stage falls behind
+    - pace: replay video files at their native frame rate
+    - keep_annotated: keep the latest annotated frame for display
+    - publish: callback receiving qr_data to send (e.g. QRBroadcaster.publish): each non-empty
+      detection, or with smooth every changed filtered state, [] once all markers are gone
+    - track_interval: if set, track markers between full detections (see
+      qr_tracking.QRTracker), re-detecting the full frame every this many frames
+    - smooth: publish filtered poses, and only when they change (see qr_filter.QRPoseFilter)
+    """
+
+    STAGES = ("capture", "preprocess", "detect", "publish")
+
+    def __init__(self, source, on_result=None, queue_size=PIPELINE_QUEUE_SIZE, drop_stale=True,
+                 pace=False, keep_annotated=False, publish: Optional[Callable] = None,
+                 track_interval: Optional[int] = None, smooth=False):
+        self.source = source
+        self.on_result = on_result
+        self.drop_stale = drop_stale
+        self.pace = pace
+        self.keep_annotated = keep_annotated
+        self.publish = publish
+        self.track_interval = track_interval
+        self.pose_filter = None
+        if smooth:
+            from qr_filter import QRPoseFilter
+            self.pose_filter = QRPoseFilter()
+
+        self.stats = {name: StageStats(name) for name in self.STAGES}
+        self.end_to_end = StageStats("end_to_end")
+        self._queues = {name: Queue(maxsize=queue_size) for name in self.STAGES[1:]}
+        self._stop = Event()
+        self._threads: List[Thread] = []
+        self._latest_lock = Lock()
+        self._latest: Optional[np.ndarray] = None
+
+    def _offer(self, stage: str, item):
+        """Hand item to a stage; when dropping stale frames, evict its oldest queued frame if full"""
+        queue = self._queues[stage]
+        if not self.drop_stale:
+            # Every stage drains its queue until _STOP, so this cannot deadlock
+            queue.put(item)
+            return
+        while True:
+            try:
+                queue.put_nowait(item)
+                return
+            except Full:
+                try:
+                    queue.get_nowait()
+                    self.stats[stage].record_drop()
+                except Empty:
+                    pass
+
+    def _open_capture(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            raise RuntimeError(f"Could not open video source {self.source!r}")
+        if isinstance(self.source, int):
+            # Set the capture resolution
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, WINDOW_WIDTH)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, WINDOW_HEIGHT)
+        return cap
+
+    def _capture(self, cap):
+        stats = self.stats["capture"]
+        fps = cap.get(cv2.CAP_PROP_FPS) if self.pace else 0
+        interval = 1 / fps if fps and fps > 0 else 0
+        started = time.perf_counter()
+        seq = 0
+        try:
+            while not self._stop.is_set():
+                t0 = time.perf_counter()
+                ret, image = cap.read()
+                if not ret:
+                    break
+                stats.record(time.perf_counter() - t0)
+                self._offer("preprocess", Frame(seq, t0, image))
+                seq += 1
+                if interval:
+                    delay = started + seq * interval - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+        finally:
+            cap.release()
+            self._offer("preprocess", _STOP)
+
+    def _stage(self, name: str, work, next_stage: Optional[str]):
+        """
+        Run work(frame) -> frame on every frame from this stage's queue
+
+        A frame whose work raises is reported and discarded, so one bad frame
+        neither kills the stage nor keeps _STOP from reaching the next one.
+        """
+        stats, queue = self.stats[name], self._queues[name]
+        try:
+            while True:
+                frame = queue.get()
+                if frame is _STOP:
+                    break
+                t0 = time.perf_counter()
+                try:
+                    frame = work(frame)
+                except Exception:
+                    stats.record_failure()
+                    print(f"{name} stage failed on frame {frame.seq}:", flush=True)
+                    traceback.print_exc()
+                    continue
+                stats.record(time.perf_counter() - t0)
+                if next_stage:
+                    self._offer(next_stage, frame)
+        finally:
+            if next_stage:
+                self._offer(next_stage, _STOP)
+
+    def _publish(self, frame: Frame) -> Frame:
+        if self.pose_filter is not None:
+            # Empty frames go through the filter too, so markers time out;
+            # it returns None when nothing changed and [] once all are gone
+            qr_data = self.pose_filter.update(frame.qr_data or [], frame.captured_at)
+            changed = qr_data is not None
+        else:
+            qr_data = frame.qr_data
+            changed = bool(qr_data)
+        if changed and self.publish is not None:
+            self.publish(qr_data)
+        if self.keep_annotated:
+            annotated = annotate(frame.image, frame.qr_data)
+            with self._latest_lock:
+                self._latest = annotated
+        if self.on_result is not None:
+            self.on_result(frame)
+        self.end_to_end.record(time.perf_counter() - frame.captured_at)
+        return frame
+
+    def start(self):
+        cap = self._open_capture()
+        preprocessor, detector = QRProcessor(), QRProcessor()
+        find_markers = detector.detect
+        if self.track_interval:
+            from qr_tracking import QRTracker
+            find_markers = QRTracker(detector, redetect_interval=self.track_interval).update
+
+        def preprocess(frame: Frame) -> Frame:
+            return frame._replace(image=preprocessor.enhance(frame.image))
+
+        def detect(frame: Frame) -> Frame:
+            return frame._replace(qr_data=find_markers(frame.image))
+
+        self._threads = [
+            Thread(target=self._capture, args=(cap,), name="qr-capture", daemon=True),
+            Thread(target=self._stage, args=("preprocess", preprocess, "detect"), name="qr-preprocess", daemon=True),
+            Thread(target=self._stage, args=("detect", detect, "publish"), name="qr-detect", daemon=True),
+            Thread(target=self._stage, args=("publish", self._publish, None), name="qr-publish", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Stop capturing; frames already in flight drain through the pipeline"""
+        self._stop.set()
+
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def join(self, timeout: Optional[float] = None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def latest_annotated(self) -> Optional[np.ndarray]:
+        with self._latest_lock:
+            return self._latest
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Counters for every stage plus capture-to-publish latency"""
+        return [self.stats[name].snapshot() for name in self.STAGES] + [self.end_to_end.snapshot()]
+
+
+def format_stats(snapshot: List[Dict[str, Any]]) -> str:
+    lines = [f"{'stage':<12}{'frames':>8}{'dropped':>9}{'failed':>8}{'fps':>8}{'mean ms':>9}{'p95 ms':>9}"]
+    for s in snapshot:
+        lines.append(f"{s['stage']:<12}{s['processed']:>8}{s['dropped']:>9}{s['failed']:>8}{s['fps']:>8.1f}"
+                     f"{s['latency_ms']:>9.2f}{s['latency_p95_ms']:>9.2f}")
+    return "\n".join(lines)
 
 
 def main():
-    cap = cv2.VideoCapture(0)
-
-    if not cap.isOpened():
-        print("Error: Could not open video.")
+    parser = argparse.ArgumentParser(description="Pipelined QR code detection feeding the map over a WebSocket")
+    parser.add_argument("--source", default="0", help="camera index or video file (default: 0)")
+    parser.add_argument("--headless", action="store_true", help="no preview window")
+    parser.add_argument("--no-websocket", action="store_true", help="do not start the WebSocket server")
+    parser.add_argument("--host", default="localhost", help="WebSocket host")
+    parser.add_argument("--port", type=int, default=8765, help="WebSocket port")
+    parser.add_argument("--encoding", choices=("msgpack", "json"), default="msgpack", help="WebSocket message encoding")
+    parser.add_argument("--no-drop", action="store_true", help="process every frame instead of dropping stale ones")
+    parser.add_argument("--pace", action="store_true", help="replay video files at their native frame rate")
+    parser.add_argument("--queue-size", type=int, default=PIPELINE_QUEUE_SIZE, help="frames buffered between stages")
+    parser.add_argument("--track", type=int, metavar="N", help="track markers between full detections, re-detecting every N frames")
+    parser.add_argument("--smooth", action="store_true", help="smooth marker poses and publish only significant changes")
+    parser.add_argument("--stats-every", type=float, default=5.0, help="seconds between stats printouts (0: only at exit)")
+    args = parser.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    pipeline = QRPipeline(
+        source,
+        queue_size=args.queue_size,
+        drop_stale=not args.no_drop,
+        pace=args.pace,
+        track_interval=args.track,
+        smooth=args.smooth,
+        keep_annotated=not args.headless,
+    )
+
+    broadcaster = None
+    try:
+        if not args.no_websocket:
+            from qr_broadcast import QRBroadcaster
+            broadcaster = QRBroadcaster(args.host, args.port, args.encoding).start()
+            pipeline.publish = broadcaster.publish
+        pipeline.start()
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        if broadcaster is not None:
+            broadcaster.stop()
         return
 
-    # Set the capture resolution
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, WINDOW_WIDTH)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, WINDOW_HEIGHT)
-
-    websocket_loop = asyncio.new_event_loop()
-    websocket_thread = Thread(
-        target=run_websocket_server, args=(websocket_loop,))
-    websocket_thread.start()
-
+    last_stats = time.perf_counter()
     try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("Failed to capture image.")
-                break
-
-            processed_frame = process_image(frame)
-
-            # Resize the frame to the desired window size
-            resized_frame = cv2.resize(
-                processed_frame, (WINDOW_WIDTH, WINDOW_HEIGHT))
-
-            cv2.imshow('QR Code Scanner', resized_frame)
-
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+        while pipeline.running():
+            if args.headless:
+                pipeline.join(timeout=0.1)
+            else:
+                frame = pipeline.latest_annotated()
+                if frame is not None:
+                    # Resize the frame to the desired window size
+                    cv2.imshow('QR Code Scanner', cv2.resize(frame, (WINDOW_WIDTH, WINDOW_HEIGHT)))
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+            if args.stats_every and time.perf_counter() - last_stats >= args.stats_every:
+                print(format_stats(pipeline.snapshot()), flush=True)
+                last_stats = time.perf_counter()
+    except KeyboardInterrupt:
+        pass
     finally:
-        cap.release()
-        cv2.destroyAllWindows()
-        websocket_loop.call_soon_threadsafe(websocket_loop.stop)
-        websocket_thread.join()
+        pipeline.stop()
+        pipeline.join(timeout=2)
+        if not args.headless:
+            cv2.destroyAllWindows()
+        if broadcaster is not None:
+            broadcaster.stop()
+        print(format_stats(pipeline.snapshot()))
+        if pipeline.pose_filter is not None:
+            print(f"smoothing: {pipeline.pose_filter.emitted} of {pipeline.pose_filter.received} detections published")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import time
+from threading import Event, Lock, Thread
+from typing import Any, Dict, List, Optional
+
+import msgpack
+import numpy as np
+import websockets
+
+WS_HOST = "localhost"
+WS_PORT = 8765
+# Outgoing bytes buffered per connection before send() waits; kept small so a
+# client on a slow link coalesces in its pending slot instead of in a buffer
+WRITE_LIMIT = 4096
+
+
+def to_serializable(obj):
+    """NumPy scalars/arrays to plain Python values for serialization"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, dict):
+        return {k: to_serializable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_serializable(v) for v in obj]
+    return obj
+
+
+def encode_message(qr_data: List[Dict[str, Any]], seq: int, encoding: str = "msgpack"):
+    """
+    Wire message for one QR state, as msgpack bytes or JSON text
+
+    {"seq": n, "ts": publish time in epoch microseconds, "markers": qr_data}.
+    msgpack floats are single precision, plenty for pixel coordinates.
+    """
+    message = {"seq": seq, "ts": time.time_ns() // 1000, "markers": to_serializable(qr_data)}
+    if encoding == "json":
+        return json.dumps(message)
+    return msgpack.packb(message, use_single_float=True)
+
+
+def decode_message(payload) -> Dict[str, Any]:
+    """Inverse of encode_message for either encoding"""
+    if isinstance(payload, str):
+        return json.loads(payload)
+    return msgpack.unpackb(payload)
+
+
+class _Client:
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.pending = None  # newest undelivered payload
+        self.ready = asyncio.Event()
+
+
+class QRBroadcaster:
+    """Push-based fan-out of QR state to every connected WebSocket client.
+
+    publish() may be called from any thread: it encodes the message once and
+    hands it to the event loop with call_soon_threadsafe. Numbering and
+    handing over happen under one lock, so seq values are unique and reach
+    the loop in increasing order whatever the publishing thread. Each client has a
+    single pending slot that is overwritten by newer messages, so a slow
+    client skips stale states instead of falling behind, and never holds up
+    the other clients.
+
+    Parameters:
+    - host, port: address to listen on
+    - encoding: "msgpack" (binary frames) or "json" (text frames)
+    """
+
+    def __init__(self, host: str = WS_HOST, port: int = WS_PORT, encoding: str = "msgpack"):
+        if encoding not in ("msgpack", "json"):
+            raise ValueError(f"Unknown encoding {encoding!r}")
+        self.host = host
+        self.port = port
+        self.encoding = encoding
+        self.clients = set()
+        self.latest = None  # sent to clients as soon as they connect
+        self.published = 0
+        self.sent = 0
+        self._seq = 0
+        self._publish_lock = Lock()
+        self._error: Optional[BaseException] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Future] = None
+        self._ready = Event()
+        self._thread: Optional[Thread] = None
+
+    def publish(self, qr_data: List[Dict[str, Any]]):
+        """Thread-safe: queue qr_data for every client (no-op before the server starts)"""
+        if self._loop is None:
+            return
+        with self._publish_lock:
+            self._seq += 1
+            payload = encode_message(qr_data, self._seq, self.encoding)
+            try:
+                self._loop.call_soon_threadsafe(self._deliver, payload)
+            except RuntimeError:
+                pass  # loop already closed during shutdown
+
+    def _deliver(self, payload):
+        self.latest = payload
+        self.published += 1
+        for client in self.clients:
+            client.pending = payload
+            client.ready.set()
+
+    async def _handler(self, websocket, path=None):
+        client = _Client(websocket)
+        self.clients.add(client)
+        if self.latest is not None:
+            client.pending = self.latest
+            client.ready.set()
+        closed = asyncio.ensure_future(websocket.wait_closed())
+        try:
+            while True:
+                # Wake up for a new message or a disconnect, whichever comes first
+                waiting = asyncio.ensure_future(client.ready.wait())
+                await asyncio.wait((waiting, closed), return_when=asyncio.FIRST_COMPLETED)
+                if closed.done():
+                    waiting.cancel()
+                    break
+                client.ready.clear()
+                payload, client.pending = client.pending, None
+                await websocket.send(payload)
+                self.sent += 1
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            closed.cancel()
+            self.clients.discard(client)
+
+    async def serve(self):
+        """Run the server until stop() is called"""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = self._loop.create_future()
+        async with websockets.serve(self._handler, self.host, self.port, write_limit=WRITE_LIMIT):
+            print(f"WebSocket server started on ws://{self.host}:{self.port}")
+            self._ready.set()
+            await self._stopped
+
+    def _run(self):
+        try:
+            asyncio.run(self.serve())
+        except Exception as e:
+            self._error = e
+        finally:
+            self._ready.set()
+
+    def start(self):
+        """Run the server on a background thread; returns once it is listening"""
+        self._error = None
+        self._thread = Thread(target=self._run, name="qr-websocket", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise RuntimeError(f"WebSocket server failed to start: {self._error}") from self._error
+        return self
+
+    def stop(self):
+        if self._loop is not None and self._stopped is not None:
+            self._loop.call_soon_threadsafe(lambda: self._stopped.done() or self._stopped.set_result(None))
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,145 @@
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# One-Euro filter parameters, in pixel units: the cutoff rises from
+# MIN_CUTOFF Hz at rest by BETA Hz per px/s of speed, so a still marker is
+# heavily smoothed while a moving one follows with little lag
+MIN_CUTOFF = 1.0
+BETA = 0.05
+DERIVATIVE_CUTOFF = 1.0
+
+# Minimum change since the last emitted state worth sending downstream
+POSITION_THRESHOLD = 2.0  # px, marker centre
+ROTATION_THRESHOLD = math.radians(1.0)
+SCALE_THRESHOLD = 0.01  # relative
+
+MARKER_TIMEOUT = 1.0  # seconds without a detection before a marker is forgotten
+
+
+def _smoothing_factor(cutoff, dt):
+    tau = 1.0 / (2 * np.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """One-Euro low-pass filter over a vector of values, one cutoff per component"""
+
+    def __init__(self, min_cutoff=MIN_CUTOFF, beta=BETA, d_cutoff=DERIVATIVE_CUTOFF):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.value: Optional[np.ndarray] = None
+        self.derivative: Optional[np.ndarray] = None
+        self.t: Optional[float] = None
+
+    def __call__(self, value, t: float) -> np.ndarray:
+        value = np.asarray(value, dtype=np.float64)
+        if self.value is None:
+            self.value, self.derivative, self.t = value, np.zeros_like(value), t
+            return self.value
+        dt = t - self.t
+        if dt <= 0:
+            return self.value
+
+        a_d = _smoothing_factor(self.d_cutoff, dt)
+        self.derivative = a_d * (value - self.value) / dt + (1 - a_d) * self.derivative
+        a = _smoothing_factor(self.min_cutoff + self.beta * np.abs(self.derivative), dt)
+        self.value = a * value + (1 - a) * self.value
+        self.t = t
+        return self.value
+
+
+class MarkerState:
+    """Filtered pose of one marker; the state vector is its 4 corners, rotation and scale"""
+
+    def __init__(self, info: str, **filter_params):
+        self.info = info
+        self.filter = OneEuroFilter(**filter_params)
+        self.emitted: Optional[np.ndarray] = None  # state vector when last sent downstream
+        self.last_seen = None
+
+    def update(self, qr: Dict[str, Any], t: float) -> np.ndarray:
+        rotation = float(qr["rotation"])
+        if self.filter.value is not None:
+            # Unwrap so a turn through +-pi is not filtered as a full spin
+            previous = self.filter.value[8]
+            rotation = previous + (rotation - previous + math.pi) % (2 * math.pi) - math.pi
+        state = np.concatenate([np.ravel(qr["location"]), [rotation, float(qr["scale"])]])
+        self.last_seen = t
+        return self.filter(state, t)
+
+    def changed(self) -> bool:
+        """Has the filtered pose moved past the thresholds since it was last emitted?"""
+        if self.emitted is None:
+            return True
+        now, then = self.filter.value, self.emitted
+        moved = np.hypot(*(now[:8].reshape(4, 2).mean(axis=0) - then[:8].reshape(4, 2).mean(axis=0)))
+        return bool(
+            moved > POSITION_THRESHOLD
+            or abs(now[8] - then[8]) > ROTATION_THRESHOLD
+            or abs(now[9] - then[9]) > SCALE_THRESHOLD * max(abs(then[9]), 1e-9)
+        )
+
+    def as_qr_data(self, t: Optional[float] = None) -> Dict[str, Any]:
+        """Smoothed marker in qr_data form plus velocities, optionally extrapolated to time t"""
+        value, derivative = self.filter.value, self.filter.derivative
+        if t is not None and t > self.filter.t:
+            value = value + derivative * (t - self.filter.t)
+        return {
+            "info": self.info,
+            "location": value[:8].reshape(4, 2).tolist(),
+            "rotation": math.atan2(math.sin(value[8]), math.cos(value[8])),
+            "scale": float(value[9]),
+            "velocity": derivative[:8].reshape(4, 2).mean(axis=0).tolist(),  # px/s of the centre
+            "angular_velocity": float(derivative[8]),  # rad/s
+            "scale_velocity": float(derivative[9]),  # px/s
+        }
+
+
+class QRPoseFilter:
+    """Per-marker smoothing of the QR stream, keyed by the decoded info string.
+
+    update() takes raw qr_data from a frame (an empty list for a frame without
+    detections, so stale markers still expire) and returns the smoothed state
+    of every tracked marker, but only when a marker appeared, timed out, or
+    moved past the position/rotation/scale thresholds since the last
+    emission. The state is then an empty list once every marker is gone.
+    Otherwise it returns None and nothing needs to be sent or recomputed
+    downstream.
+
+    Parameters:
+    - timeout: seconds without a detection before a marker is forgotten
+    - filter_params: OneEuroFilter keyword arguments (min_cutoff, beta, d_cutoff)
+    """
+
+    def __init__(self, timeout: float = MARKER_TIMEOUT, **filter_params):
+        self.timeout = timeout
+        self.filter_params = filter_params
+        self.markers: Dict[str, MarkerState] = {}
+        self.received = 0
+        self.emitted = 0
+
+    def update(self, qr_data: List[Dict[str, Any]], t: float) -> Optional[List[Dict[str, Any]]]:
+        if qr_data:
+            self.received += 1
+        for qr in qr_data:
+            marker = self.markers.get(qr["info"])
+            if marker is None:
+                marker = self.markers[qr["info"]] = MarkerState(qr["info"], **self.filter_params)
+            marker.update(qr, t)
+        expired = [info for info, m in self.markers.items() if t - m.last_seen > self.timeout]
+        for info in expired:
+            del self.markers[info]
+
+        if not expired and not any(marker.changed() for marker in self.markers.values()):
+            return None
+        for marker in self.markers.values():
+            marker.emitted = marker.filter.value.copy()
+        self.emitted += 1
+        return [marker.as_qr_data() for marker in self.markers.values()]
+
+    def predict(self, t: float) -> List[Dict[str, Any]]:
+        """Smoothed markers extrapolated to time t with their current velocities"""
+        return [marker.as_qr_data(t) for marker in self.markers.values()]
@@ -0,0 +1,235 @@
+"""
+Record QR sessions to a compact log and replay them without a camera.
+
+A log is a msgpack stream: a header map, then one map per frame.
+
+    header  {"format": LOG_FORMAT, "encoding": "jpg"|"png", "fps": float, "width": int, "height": int}
+    frame   {"seq": int, "t": seconds since the first frame, "image": encoded bytes, "qr": qr_data}
+
+Each frame stores the raw camera image (JPEG by default; PNG is lossless)
+and the markers detected at recording time, which serve as the reference
+when the log is replayed. A replay decodes exactly the same bytes every
+time, so runs over the same log are deterministic.
+
+    python qr_replay.py record --source 0 -o session.qrlog
+    python qr_replay.py record --source clip.avi -o clip.qrlog --encoding png
+    python qr_replay.py replay session.qrlog [--native]
+"""
+import argparse
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+import cv2
+import msgpack
+import numpy as np
+
+from qr import QRProcessor, process_image
+from qr_broadcast import to_serializable
+
+LOG_FORMAT = "qrlog/1"
+ENCODINGS = {"jpg": (".jpg", [cv2.IMWRITE_JPEG_QUALITY, 90]), "png": (".png", [cv2.IMWRITE_PNG_COMPRESSION, 1])}
+
+
+class LoggedFrame(NamedTuple):
+    seq: int
+    t: float
+    image: np.ndarray
+    qr_data: List[Dict[str, Any]]
+
+
+class QRRecorder:
+    """Append frames and their detections to a log file"""
+
+    def __init__(self, path: str, fps: float = 30.0, encoding: str = "jpg"):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding {encoding!r}")
+        self.path = path
+        self.fps = fps
+        self.encoding = encoding
+        self.frames = 0
+        self._file = open(path, "wb")
+        self._packer = msgpack.Packer(use_single_float=True)
+        self._started = None
+
+    def write(self, image: np.ndarray, qr_data: List[Dict[str, Any]], t: Optional[float] = None):
+        """Append one frame; t defaults to the time since the first write"""
+        now = time.perf_counter()
+        if self._started is None:
+            self._started = now
+            self._file.write(self._packer.pack({
+                "format": LOG_FORMAT, "encoding": self.encoding, "fps": float(self.fps),
+                "width": image.shape[1], "height": image.shape[0],
+            }))
+        extension, params = ENCODINGS[self.encoding]
+        ok, encoded = cv2.imencode(extension, image, params)
+        if not ok:
+            raise ValueError(f"Could not encode frame {self.frames} as {self.encoding}")
+        self._file.write(self._packer.pack({
+            "seq": self.frames,
+            "t": now - self._started if t is None else t,
+            "image": encoded.tobytes(),
+            "qr": to_serializable(qr_data),
+        }))
+        self.frames += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_log(path: str):
+    """(header, iterator of LoggedFrame) for a log file"""
+    f = open(path, "rb")
+    unpacker = msgpack.Unpacker(f, raw=False, max_buffer_size=64 * 1024 * 1024)
+    try:
+        header = next(unpacker)
+    except StopIteration:
+        f.close()
+        raise ValueError(f"{path} is empty")
+    if not isinstance(header, dict) or header.get("format") != LOG_FORMAT:
+        f.close()
+        raise ValueError(f"{path} is not a {LOG_FORMAT} log")
+
+    def frames() -> Iterator[LoggedFrame]:
+        with f:
+            for record in unpacker:
+                image = cv2.imdecode(np.frombuffer(record["image"], np.uint8), cv2.IMREAD_COLOR)
+                yield LoggedFrame(record["seq"], record["t"], image, record["qr"])
+
+    return header, frames()
+
+
+def replay(path: str, native: bool = False) -> Iterator[LoggedFrame]:
+    """Frames of a log, as fast as possible or paced at their recorded timestamps"""
+    _, frames = read_log(path)
+    started = time.perf_counter()
+    for frame in frames:
+        if native:
+            delay = started + frame.t - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        yield frame
+
+
+def record(source, path: str, encoding: str = "jpg", max_frames: Optional[int] = None, show: bool = False) -> int:
+    """Record frames from a camera or video file with their detections; returns the frame count"""
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video source {source!r}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    from_file = not isinstance(source, int)
+    processor = QRProcessor()
+
+    with QRRecorder(path, fps, encoding) as recorder:
+        try:
+            while max_frames is None or recorder.frames < max_frames:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                qr_data = processor.detect(processor.enhance(frame))
+                # Files are recorded on their own clock so replays keep the clip's timing
+                recorder.write(frame, qr_data, recorder.frames / fps if from_file else None)
+                if show:
+                    cv2.imshow("Recording", frame)
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+        finally:
+            cap.release()
+            if show:
+                cv2.destroyAllWindows()
+        return recorder.frames
+
+
+def match_detections(reference: List[Dict[str, Any]], detected: List[Dict[str, Any]]):
+    """(matched, missed, extra, corner errors in px) comparing markers by info"""
+    expected = {qr["info"]: np.array(qr["location"]) for qr in reference}
+    found = {qr["info"]: np.array(qr["location"]) for qr in detected}
+    errors = [float(np.linalg.norm(found[info] - corners, axis=1).mean())
+              for info, corners in expected.items() if info in found]
+    return len(errors), len(expected) - len(errors), len(set(found) - set(expected)), errors
+
+
+def run_replay(path: str, native: bool = False, find_markers=None) -> Dict[str, Any]:
+    """
+    Feed a log through the detector and score it against the recorded detections
+
+    Parameters:
+    - path: log file
+    - native: pace frames at their recorded timestamps instead of max speed
+    - find_markers: image -> qr_data; defaults to process_image
+
+    Returns:
+    - dict with frames, fps, latency percentiles (ms) and recall/precision/corner error
+    """
+    if find_markers is None:
+        def find_markers(image):
+            qr_data = []
+            process_image(image, publish=qr_data.extend)
+            return qr_data
+
+    latencies = []
+    matched = missed = extra = 0
+    errors = []
+    started = time.perf_counter()
+    for frame in replay(path, native):
+        t0 = time.perf_counter()
+        detected = find_markers(frame.image)
+        latencies.append(time.perf_counter() - t0)
+
+        m, x, e, errs = match_detections(frame.qr_data, detected)
+        matched, missed, extra = matched + m, missed + x, extra + e
+        errors.extend(errs)
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "frames": len(latencies),
+        "fps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "recall": matched / (matched + missed) if matched + missed else 1.0,
+        "precision": matched / (matched + extra) if matched + extra else 1.0,
+        "corner_error_px": float(np.mean(errors)) if errors else 0.0,
+    }
+
+
+def format_result(label: str, result: Dict[str, Any]) -> str:
+    return (f"{label:<28}{result['frames']:>7}{result['fps']:>8.1f}{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+            f"{result['recall']:>8.3f}{result['precision']:>10.3f}{result['corner_error_px']:>8.2f}")
+
+
+RESULT_HEADER = f"{'run':<28}{'frames':>7}{'fps':>8}{'p50 ms':>9}{'p99 ms':>9}{'recall':>8}{'precision':>10}{'err px':>8}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay QR detection sessions")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rec = commands.add_parser("record", help="record a camera or video file to a log")
+    rec.add_argument("--source", default="0", help="camera index or video file (default: 0)")
+    rec.add_argument("-o", "--output", required=True, help="log file to write")
+    rec.add_argument("--encoding", choices=sorted(ENCODINGS), default="jpg", help="frame image encoding")
+    rec.add_argument("--frames", type=int, help="stop after this many frames")
+    rec.add_argument("--show", action="store_true", help="show a preview window while recording")
+
+    rep = commands.add_parser("replay", help="replay a log through process_image and score it")
+    rep.add_argument("log")
+    rep.add_argument("--native", action="store_true", help="replay at the recorded frame rate instead of max speed")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        source = int(args.source) if args.source.isdigit() else args.source
+        frames = record(source, args.output, args.encoding, args.frames, args.show)
+        print(f"Recorded {frames} frames to {args.output}")
+    else:
+        print(RESULT_HEADER)
+        print(format_result("process_image", run_replay(args.log, args.native)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import cv2
+import numpy as np
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from qr import QRProcessor, calculate_rotation_and_scale
+
+REDETECT_INTERVAL = 15  # frames between full-frame detections while tracking
+ROI_PADDING = 0.5  # region of interest margin, as a fraction of the marker size
+MAX_FEATURES = 40
+MIN_FEATURES = 8  # fewer surviving features than this counts as tracking loss
+
+_LK_PARAMS = dict(
+    winSize=(21, 21),
+    maxLevel=3,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+)
+
+
+class Track(NamedTuple):
+    info: str
+    corners: np.ndarray  # float32 (4, 2) in frame coordinates
+    features: Optional[np.ndarray]  # float32 (N, 1, 2) in frame coordinates; None if untracked
+
+
+def _roi(corners: np.ndarray, shape, padding: float):
+    """
+    Padded, clipped bounding box (x0, y0, x1, y1) around a marker
+
+    Returns None when clipping to the frame leaves less than the marker
+    itself, i.e. the marker has (partly) left the frame.
+    """
+    lo, hi = corners.min(axis=0), corners.max(axis=0)
+    margin = (hi - lo).max() * padding
+    x0, y0 = np.maximum(np.floor(lo - margin), 0).astype(int)
+    x1 = int(min(np.ceil(hi[0] + margin), shape[1]))
+    y1 = int(min(np.ceil(hi[1] + margin), shape[0]))
+    if x1 <= x0 or y1 <= y0 or x1 - x0 < hi[0] - lo[0] or y1 - y0 < hi[1] - lo[1]:
+        return None
+    return x0, y0, x1, y1
+
+
+class QRTracker:
+    """Full-frame QR detection with optical-flow tracking in between.
+
+    After a full detection, corner features inside each marker are tracked
+    with pyramidal Lucas-Kanade restricted to a padded region of interest
+    around the marker, and the marker's corners follow the similarity
+    transform fitted to those features. A full-frame detectAndDecodeMulti
+    only runs every redetect_interval frames or when a marker loses track.
+
+    Parameters:
+    - processor: QRProcessor used for full detections (a new one by default)
+    - redetect_interval: frames between forced full detections
+    - padding: region of interest margin as a fraction of the marker size
+    """
+
+    def __init__(self, processor: Optional[QRProcessor] = None, redetect_interval: int = REDETECT_INTERVAL,
+                 padding: float = ROI_PADDING):
+        self.processor = processor or QRProcessor()
+        self.redetect_interval = redetect_interval
+        self.padding = padding
+        self.tracks: List[Track] = []
+        self.last_mode = None  # "detect" or "track", for stats
+        self._prev_gray: Optional[np.ndarray] = None
+        self._since_detect = 0
+
+    def reset(self):
+        self.tracks = []
+        self._prev_gray = None
+
+    def _seed(self, gray: np.ndarray, info: str, corners: np.ndarray) -> Optional[Track]:
+        roi = _roi(corners, gray.shape, 0)
+        if roi is None:
+            return None
+        x0, y0, x1, y1 = roi
+        mask = np.zeros((y1 - y0, x1 - x0), np.uint8)
+        cv2.fillConvexPoly(mask, (corners - (x0, y0)).astype(np.int32), 255)
+        features = cv2.goodFeaturesToTrack(gray[y0:y1, x0:x1], MAX_FEATURES, 0.01, 5, mask=mask)
+        if features is None or len(features) < MIN_FEATURES:
+            return None
+        return Track(info, corners, features.astype(np.float32) + np.float32((x0, y0)))
+
+    def _follow(self, gray: np.ndarray, track: Track) -> Optional[Track]:
+        roi = None if track.features is None else _roi(track.corners, gray.shape, self.padding)
+        if roi is None:
+            return None
+        x0, y0, x1, y1 = roi
+        offset = np.float32((x0, y0))
+        previous = track.features - offset
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(
+            self._prev_gray[y0:y1, x0:x1], gray[y0:y1, x0:x1], previous, None, **_LK_PARAMS)
+        if moved is None:
+            return None
+        found = status.ravel() == 1
+        if found.sum() < MIN_FEATURES:
+            return None
+
+        transform, inliers = cv2.estimateAffinePartial2D(
+            previous[found], moved[found], method=cv2.RANSAC, ransacReprojThreshold=3.0)
+        if transform is None or inliers.sum() < MIN_FEATURES:
+            return None
+        corners = cv2.transform((track.corners - offset)[None], transform)[0] + offset
+        features = moved[found][inliers.ravel() == 1] + offset
+
+        # Replenish features before too many have drifted away or been rejected
+        if len(features) < MAX_FEATURES // 2:
+            return self._seed(gray, track.info, corners)
+        return Track(track.info, corners, features)
+
+    def _detect(self, image: np.ndarray, gray: np.ndarray) -> List[Track]:
+        tracks = []
+        for qr in self.processor.detect(image):
+            corners = np.array(qr["location"], dtype=np.float32)
+            track = self._seed(gray, qr["info"], corners)
+            # A marker too small or faint to track is still reported; as an
+            # untracked entry it cannot be followed, which forces a re-detect
+            tracks.append(track if track is not None else Track(qr["info"], corners, None))
+        return tracks
+
+    def update(self, image: np.ndarray) -> List[Dict[str, Any]]:
+        """QR data for the next frame, in the same format as QRProcessor.detect"""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        tracks = None
+        if self.tracks and self._prev_gray is not None and self._since_detect < self.redetect_interval:
+            followed = [self._follow(gray, track) for track in self.tracks]
+            if all(track is not None for track in followed):
+                tracks = followed
+
+        if tracks is None:
+            # Tracking lost, nothing tracked yet, or a periodic full re-detect
+            tracks = self._detect(image, gray)
+            self._since_detect = 0
+            self.last_mode = "detect"
+        else:
+            self._since_detect += 1
+            self.last_mode = "track"
+
+        self.tracks = tracks
+        self._prev_gray = gray
+
+        qr_data: List[Dict[str, Any]] = []
+        for track in tracks:
+            rotation, scale = calculate_rotation_and_scale(track.corners)
+            qr_data.append({
+                "info": track.info,
+                "location": track.corners.tolist(),
+                "rotation": rotation,
+                "scale": scale
+            })
+        return qr_data
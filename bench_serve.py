@@ -0,0 +1,127 @@
+"""
+Load test for the front-end static server against `python -m http.server`.
+
+Each simulated kiosk loads the page the way the browser does: index.html,
+styles.css, the js/ modules and the data files the map fetches. It repeats
+that over one keep-alive connection. In "cold" runs every load downloads
+everything; in "reload" runs later loads send the ETags they got back as
+If-None-Match, the way a browser revalidates on reload. Both servers run as subprocesses, so they do not share the GIL with the
+clients.
+
+Reports page loads per second, bytes on the wire per load and page-load
+latency percentiles for each concurrency level.
+
+Usage: python bench_serve.py [--clients 1 8 32] [--seconds 5] [--url http://host:port]
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PAGE = ["/", "/styles.css", "/js/config.js", "/js/mapLayers.js", "/js/controls.js", "/js/qrDetection.js",
+        "/js/app.js", "/trees.json", "/lic_bid.json", "/data/bikes/citibike_count.json"]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+def start_server(command, port):
+    """Run a server command that takes the port last; returns the process once it accepts connections"""
+    process = subprocess.Popen(command + [str(port)], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("localhost", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{' '.join(command)} did not start")
+
+
+def kiosk(host, port, deadline, revalidate, results):
+    """Load the page repeatedly until the deadline; appends (seconds, bytes) per load"""
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    etags = {}
+    while time.monotonic() < deadline:
+        start, received = time.perf_counter(), 0
+        for path in PAGE:
+            headers = {"Accept-Encoding": "gzip, deflate, br"}
+            if revalidate and path in etags:
+                headers["If-None-Match"] = etags[path]
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+            received += len(body) + sum(len(k) + len(v) + 4 for k, v in response.getheaders())
+            if response.getheader("ETag"):
+                etags[path] = response.getheader("ETag")
+            if response.status not in (200, 304):
+                raise RuntimeError(f"{path}: {response.status}")
+        results.append((time.perf_counter() - start, received))
+    connection.close()
+
+
+def load_test(host, port, clients, seconds, revalidate):
+    results = []
+    deadline = time.monotonic() + seconds
+    threads = [threading.Thread(target=kiosk, args=(host, port, deadline, revalidate, results))
+               for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = np.array([r[0] for r in results]) * 1000
+    return {
+        "loads_per_s": len(results) / elapsed,
+        "bytes_per_load": np.mean([r[1] for r in results]) if results else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50)) if results else 0.0,
+        "p99_ms": float(np.percentile(latencies, 99)) if results else 0.0,
+    }
+
+
+def report(label, host, port, clients_list, seconds):
+    for revalidate in (False, True):
+        for clients in clients_list:
+            r = load_test(host, port, clients, seconds, revalidate)
+            mode = "reload" if revalidate else "cold"
+            print(f"{label:<16}{mode:<8}{clients:>8}{r['loads_per_s']:>10.1f}{r['bytes_per_load'] / 1024:>11.1f}"
+                  f"{r['p50_ms']:>9.1f}{r['p99_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32], help="concurrent kiosks per run")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each run")
+    parser.add_argument("--url", help="test an already running server instead")
+    args = parser.parse_args()
+
+    print(f"{'server':<16}{'mode':<8}{'kiosks':>8}{'loads/s':>10}{'KiB/load':>11}{'p50 ms':>9}{'p99 ms':>9}")
+    if args.url:
+        url = urlparse(args.url)
+        report(url.netloc, url.hostname, url.port or 80, args.clients, args.seconds)
+    else:
+        servers = {
+            "http.server": [sys.executable, "-m", "http.server", "--bind", "localhost"],
+            "serve.py": [sys.executable, "serve.py", "--port"],
+        }
+        for label, command in servers.items():
+            port = _free_port()
+            process = start_server(command, port)
+            try:
+                report(label, "localhost", port, args.clients, args.seconds)
+            finally:
+                process.terminate()
+                process.wait()
@@ -0,0 +1,112 @@
+"""
+Correctness check and query benchmark for the BID statistics cube.
+
+Checks tree counts and roll-ups against a brute-force scan of trees.json,
+and Citibike totals against per-station distances to each polygon. Then
+times a full build, loading the cached cube, rebuilding only the Citibike
+component, and first and repeated dashboard queries.
+
+Usage: python data/bench_bid_cube.py [repeat]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+from bid_cube import (CITIBIKE_COUNT_PATH, CITIBIKE_NEAR_M, DBH_BANDS, TREES_PATH, UNKNOWN, BIDCube, dbh_band,
+                      load_arrays)
+from etl import PolygonClipper, load_bid_polygons
+
+
+def brute_force_rows():
+    with open(TREES_PATH) as f:
+        properties = [feature["properties"] for feature in json.load(f)["features"]]
+    bands = dbh_band([p.get("DBH") for p in properties])
+    return [(p["BIDPolygonID"], p.get("GenusSpecies") or UNKNOWN, p.get("TPCondition") or UNKNOWN, DBH_BANDS[b])
+            for p, b in zip(properties, bands)]
+
+
+def verify(cube):
+    rows = brute_force_rows()
+    assert cube.count() == len(rows)
+    for polygon in {row[0] for row in rows}:
+        assert cube.count(polygon=polygon) == sum(row[0] == polygon for row in rows)
+        assert cube.rollup("condition", polygon=polygon) == Counter(row[2] for row in rows if row[0] == polygon)
+    assert cube.rollup("species") == Counter(row[1] for row in rows)
+    assert cube.rollup(("dbh", "condition")) == Counter((row[3], row[2]) for row in rows)
+    assert cube.rollup("polygon", dbh=["18-23", "24+"]) == Counter(row[0] for row in rows if row[3] in ("18-23", "24+"))
+
+    # Citibike: a station counts once for any group of polygons it is near
+    with open(CITIBIKE_COUNT_PATH) as f:
+        stations = json.load(f)
+    clipper = PolygonClipper(load_bid_polygons())
+    lon, lat = np.array([[s["lon"], s["lat"]] for s in stations]).T
+    # Every station-polygon distance, not just the pairs the STRtree query keeps
+    station_index, polygon_index, pair_distance = clipper.pairs_within(lon, lat, 1e7)
+    distance = np.empty((len(stations), len(clipper.polygons)))
+    distance[station_index, polygon_index] = pair_distance
+    groups = [[p] for p in range(len(clipper.polygons))] + [[30, 67, 82], list(range(len(clipper.polygons)))]
+    for group in groups:
+        near = (distance[:, group] <= CITIBIKE_NEAR_M).any(axis=1)
+        expected = sum(s["total_count"] for s, n in zip(stations, near) if n)
+        assert abs(cube.citibike(group)["total_count"] - expected) < 1e-6, group
+        assert cube.citibike(group)["stations"] == near.sum()
+    return len(rows), len(groups)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cube.npz")
+        start = time.perf_counter()
+        arrays, rebuilt = load_arrays(path)
+        build = time.perf_counter() - start
+        assert rebuilt == ("trees", "citibike")
+        cached = timed(lambda: load_arrays(path), 20)
+        assert load_arrays(path)[1] == ()
+
+        # Pretend citibike_count.json changed: only the station join reruns
+        arrays["citibike_key"] = np.array("stale")
+        np.savez(path, **arrays)
+        start = time.perf_counter()
+        assert load_arrays(path)[1] == ("citibike",)
+        citibike_only = time.perf_counter() - start
+
+    cube = BIDCube(arrays)
+    trees, groups = verify(cube)
+    print(f"verified {trees} trees and {groups} polygon groups against brute force")
+    print(f"full build {build * 1e3:.1f} ms, cached load {cached * 1e3:.2f} ms, "
+          f"citibike-only rebuild {citibike_only * 1e3:.1f} ms")
+
+    queries = {
+        "count(polygon)": lambda: cube.count(polygon=82),
+        "count(species, condition)": lambda: cube.count(species="Ginkgo biloba - maidenhair tree", condition="Good"),
+        "rollup(condition, polygon)": lambda: cube.rollup("condition", polygon=30),
+        "rollup((dbh, condition))": lambda: cube.rollup(("dbh", "condition")),
+        "citibike([polygons])": lambda: cube.citibike([30, 67, 82]),
+        "summary(polygon)": lambda: cube.summary(67),
+    }
+    rows = brute_force_rows()
+    scan = timed(lambda: Counter(row[2] for row in rows if row[0] == 30), repeat)
+    print(f"brute-force scan of the parsed trees for rollup(condition, polygon): {scan * 1e6:.1f} us")
+    print(f"{'query':<28}{'first us':>10}{'repeat us':>11}")
+    for label, query in queries.items():
+        cube._memo.clear()
+        first = timed(lambda: (cube._memo.clear(), query()), repeat)
+        query()
+        again = timed(query, repeat)
+        print(f"{label:<28}{first * 1e6:>10.1f}{again * 1e6:>11.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,162 @@
+"""
+Correctness check and load-time benchmark for the bike-route preprocessor.
+
+data/bikes/bike_routes.csv is not in the repository, so this writes a
+synthetic CSV in the NYC Open Data layout: wiggly routes across LIC, some
+with several parts, and street names with quoted commas. It checks that
+every route and property survives, that the lines at each zoom stay within
+the pixel tolerance of the originals, and that the binary files decode to
+the GeoJSON lines. Then it times the conversion, a cached rerun, and
+loading each zoom as GeoJSON and as binary, next to the front end's
+regex parse of the CSV (ported to Python, NaN and all).
+
+Usage: python data/bench_bike_routes.py [routes]
+"""
+import csv
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+
+import numpy as np
+import shapely
+
+from bike_routes import (TOLERANCE_PX, ZOOMS, BikeRoutes, LocalProjection, convert, metres_per_pixel, output_paths,
+                         read_routes)
+
+HEADER = ["the_geom", "boro", "comments", "fromstreet", "onoffst", "street", "tostreet", "facilitycl", "ft_facilit",
+          "tf_facilit", "lanecount", "shape_leng"]
+STREETS = ["Vernon Blvd", "Jackson Ave", "Queens Plaza, North", "Thomson Ave", "21st St", "Skillman Ave, Service Rd"]
+
+
+def synthesize_csv(path, routes=2000, seed=0):
+    """Write a synthetic bike-route CSV; returns the rows' (street, part count)"""
+    rng = np.random.default_rng(seed)
+    expected = []
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i in range(routes):
+            parts = 1 + (rng.random() < 0.2) * rng.integers(1, 4)
+            lines = []
+            for _ in range(parts):
+                start = np.array([-73.96, 40.735]) + rng.random(2) * [0.05, 0.025]
+                heading = rng.random() * 2 * math.pi
+                steps = rng.integers(20, 200)
+                turns = heading + np.cumsum(rng.normal(0, 0.08, steps))
+                # ~2 m steps with GPS-like wiggle, like digitized street centrelines
+                walk = np.column_stack([np.cos(turns), np.sin(turns)]) * 2.0 + rng.normal(0, 0.3, (steps, 2))
+                lonlat = start + np.cumsum(walk, axis=0) / [84_300, 111_200]
+                lines.append("(" + ", ".join(f"{lon:.13f} {lat:.13f}" for lon, lat in lonlat) + ")")
+            street = STREETS[i % len(STREETS)]
+            writer.writerow([f"MULTILINESTRING ({', '.join(lines)})", "4", "", f"{i} Ave", "ON", street, "End St",
+                             "I II III".split()[i % 3], "Protected Path", "", "1", "100.5"])
+            expected.append((street, parts))
+    return expected
+
+
+def _number(text):
+    # JavaScript's Number(): NaN instead of an error
+    try:
+        return float(text)
+    except ValueError:
+        return math.nan
+
+
+def regex_parse(text):
+    """The front end's bikeCsvToGeoJson, line for line"""
+    lines = text.strip().split("\n")
+    headers = lines[0].split(",")
+    features = []
+    for line in lines[1:]:
+        match = re.search(r"MULTILINESTRING \(\((.*?)\)\)", line)
+        if not match:
+            continue
+        coordinates = [[_number(v) for v in pair.split(" ")] for pair in match.group(1).split(", ")]
+        values = line[line.find('")') + 2:].split(",")  # indexOf: -1 when absent
+        properties = {headers[j]: values[j - 1].strip() if j - 1 < len(values) else "" for j in range(1, len(headers))}
+        features.append({"geometry": {"type": "LineString", "coordinates": coordinates}, "properties": properties})
+    return features
+
+
+def verify(csv_path, out_dir, expected):
+    original, properties = read_routes(csv_path)
+    assert len(original) == len(expected)
+    assert properties["street"] == [street for street, _ in expected]
+    assert list(shapely.get_num_geometries(original)) == [parts for _, parts in expected]
+
+    projection = LocalProjection(original)
+    original_m = shapely.transform(original, projection.forward)
+    for zoom in ZOOMS:
+        geojson_path, binary_path = output_paths(zoom, out_dir)
+        with open(geojson_path) as f:
+            features = json.load(f)["features"]
+        assert [feature["properties"]["street"] for feature in features] == properties["street"]
+        simplified = shapely.from_geojson([json.dumps(feature["geometry"]) for feature in features])
+        # Within the tolerance plus the coordinate rounding (and a hair for float error)
+        limit = TOLERANCE_PX * metres_per_pixel(zoom, projection.origin[1]) + 0.2
+        distance = shapely.hausdorff_distance(original_m, shapely.transform(simplified, projection.forward))
+        assert distance.max() <= limit, (zoom, distance.max(), limit)
+
+        with BikeRoutes(binary_path) as routes:
+            for i in range(0, len(features), 97):
+                lines = features[i]["geometry"]["coordinates"]
+                lines = [lines] if features[i]["geometry"]["type"] == "LineString" else lines
+                paths = routes.paths(i)
+                assert len(paths) == len(lines)
+                for path, line in zip(paths, lines):
+                    assert np.abs(path - np.array(line)).max() < 1e-6
+            assert list(routes.decode("street")) == properties["street"]
+
+
+def timed(fn, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(routes):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, out_dir = os.path.join(tmp, "bike_routes.csv"), os.path.join(tmp, "routes")
+        expected = synthesize_csv(csv_path, routes)
+
+        start = time.perf_counter()
+        manifest, written = convert(csv_path, out_dir)
+        cold = time.perf_counter() - start
+        assert written
+        cached = timed(lambda: convert(csv_path, out_dir))
+        assert not convert(csv_path, out_dir)[1]
+        verify(csv_path, out_dir, expected)
+
+        with open(csv_path) as f:
+            text = f.read()
+        broken = regex_parse(text)
+        wrong = sum(feature["properties"]["street"] != street for feature, (street, _) in zip(broken, expected))
+        corrupt = sum(np.isnan(feature["geometry"]["coordinates"]).any() for feature in broken)
+        print(f"{routes} routes verified; the regex parse gets {wrong} street names wrong "
+              f"and NaN coordinates in {corrupt} multi-part routes")
+        print(f"convert {cold * 1e3:.0f} ms, cached rerun {cached * 1e3:.2f} ms; "
+              f"{manifest['source_vertices']:,} source vertices, CSV {os.path.getsize(csv_path):,} B")
+
+        print(f"{'load':<24}{'vertices':>10}{'bytes':>12}{'ms':>9}")
+        print(f"{'csv, regex parse':<24}{manifest['source_vertices']:>10,}{len(text.encode()):>12,}"
+              f"{timed(lambda: regex_parse(open(csv_path).read()), 3) * 1e3:>9.1f}")
+        for zoom in ZOOMS:
+            stats = manifest["stats"][str(zoom)]
+            geojson_path, binary_path = output_paths(zoom, out_dir)
+            print(f"{f'z{zoom} geojson':<24}{stats['vertices']:>10,}{stats['geojson_bytes']:>12,}"
+                  f"{timed(lambda: json.load(open(geojson_path))) * 1e3:>9.1f}")
+
+            def load_binary():
+                with BikeRoutes(binary_path) as routes:
+                    routes.lonlat()
+            print(f"{f'z{zoom} binary':<24}{stats['vertices']:>10,}{stats['binary_bytes']:>12,}"
+                  f"{timed(load_binary) * 1e3:>9.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,72 @@
+"""
+Correctness check and sweep benchmark for the Citibike station simulation.
+
+Checks the batched simulation against a scalar port of the loop in
+loadCitibikeCountData (haversine distance in place of raw degrees), counts
+the station/site pairs whose in-range status the raw-degree distance gets
+wrong, then times sweeping a placement grid with the scalar loop and with
+one batched call.
+
+Usage: python data/bench_citibike_sim.py [spacing_m]
+"""
+import math
+import sys
+import time
+
+import numpy as np
+
+from citibike_sim import (DEFAULT_CAPACITY, DEFAULT_IMPACT, DEFAULT_RANGE_M, CitibikeStations, bid_bounds,
+                          haversine_m, placement_grid)
+
+DEGREE_RANGE = 0.003  # simulationStationRange in js/config.js
+
+
+def scalar_relief(stations, lon, lat, capacity=DEFAULT_CAPACITY, impact=DEFAULT_IMPACT, range_m=DEFAULT_RANGE_M):
+    """Trips taken off existing stations, one station at a time as the front end does"""
+    relief = 0.0
+    for s_lon, s_lat, start, end in zip(stations.lon, stations.lat, stations.start, stations.end):
+        distance = float(haversine_m(lon, lat, s_lon, s_lat))
+        if distance < range_m:
+            factor = (range_m - distance) / range_m
+            capacity_factor = capacity / 20
+            start_impact = -factor * impact * capacity_factor * start * 0.3
+            end_impact = -factor * impact * capacity_factor * end * 0.3
+            relief += start - max(0.0, start + start_impact) + end - max(0.0, end + end_impact)
+    return relief
+
+
+def main(spacing_m):
+    stations = CitibikeStations.load()
+    grid = placement_grid(bid_bounds(), spacing_m)
+
+    scores = stations.score(grid)
+    sample = np.random.default_rng(0).choice(len(grid), min(200, len(grid)), replace=False)
+    for i in sample:
+        assert math.isclose(scores["relief"][i], scalar_relief(stations, *grid[i]), abs_tol=1e-9)
+    capacities = np.linspace(5, 60, len(grid))
+    varied = stations.score(grid, capacity=capacities)
+    for i in sample[:50]:
+        assert math.isclose(varied["relief"][i], scalar_relief(stations, *grid[i], capacity=capacities[i]),
+                            abs_tol=1e-9)
+    print(f"verified {len(sample)} sites against the scalar loop")
+
+    degrees = np.hypot(grid[:, :1] - stations.lon, grid[:, 1:] - stations.lat) < DEGREE_RANGE
+    metres = haversine_m(grid[:, :1], grid[:, 1:], stations.lon, stations.lat) < DEFAULT_RANGE_M
+    print(f"site/station pairs in range: degrees {degrees.sum()}, metres {metres.sum()}, "
+          f"disagreeing {(degrees != metres).sum()} of {degrees.size}")
+
+    start = time.perf_counter()
+    for lon, lat in grid:
+        scalar_relief(stations, lon, lat)
+    scalar = time.perf_counter() - start
+    repeat = 20
+    start = time.perf_counter()
+    for _ in range(repeat):
+        stations.rank(grid)
+    batched = (time.perf_counter() - start) / repeat
+    print(f"{len(grid)} sites x {len(stations)} stations: scalar loop {scalar * 1e3:.1f} ms, "
+          f"batched rank {batched * 1e3:.2f} ms ({scalar / batched:.0f}x)")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 50.0)
@@ -0,0 +1,77 @@
+"""
+Correctness check and per-frame benchmark for the hex aggregation.
+
+Verifies that every point's hexagon centre is its nearest hexagon centre
+(no further than the hexagon radius), that QR-weighted bins match a full
+re-aggregation with the QR point appended, then compares that full
+re-aggregation against the cached base plus incremental reweight.
+
+Usage: python data/bench_hexbin.py [repeat]
+"""
+import sys
+import time
+
+import numpy as np
+
+from hexbin import HexAggregator, hex_cells, hex_centers, load_citibike_counts
+from tree_index import TREES_PATH, load_tree_features
+
+# Marker positions: on a tree (populated cell) and off the data entirely
+QR_POSITIONS = {"hit": (-73.936883, 40.741382), "miss": (-73.90, 40.70)}
+
+
+def verify_cells(xy, radius):
+    q, r = hex_cells(xy, radius)
+    assigned = np.hypot(*(xy - hex_centers(q, r, radius)).T)
+    assert (assigned <= radius + 1e-9).all(), assigned.max()
+    # No neighbouring centre is closer than the assigned one
+    for dq, dr in ((1, 0), (-1, 0), (0, 1), (0, -1), (1, -1), (-1, 1)):
+        neighbour = np.hypot(*(xy - hex_centers(q + dq, r + dr, radius)).T)
+        assert (assigned <= neighbour + 1e-9).all()
+
+
+def full_rebin(aggregator, lon, lat, weight, radius):
+    """What the browser does today: append the QR point and aggregate everything"""
+    return HexAggregator(
+        np.vstack([aggregator.lonlat, [lon, lat]]),
+        np.append(aggregator.weights, weight),
+    ).base(radius)
+
+
+def verify_impact(aggregator, lon, lat, weight, radius):
+    full = full_rebin(aggregator, lon, lat, weight, radius)
+    incremental = aggregator.with_impact(lon, lat, weight, radius)
+    assert np.array_equal(full.keys, incremental.keys)
+    assert np.array_equal(full.positions, incremental.positions)
+    assert np.allclose(full.weights, incremental.weights)
+    assert np.array_equal(full.counts, incremental.counts)
+
+
+def _best_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(repeat):
+    layers = {
+        "trees": (load_tree_features(TREES_PATH)[0], None, 50),
+        "citibike": (*load_citibike_counts(), 30),
+    }
+    print(f"{'layer':<10}{'marker':<8}{'cells':>7}{'full ms':>10}{'incremental ms':>16}{'speedup':>9}")
+    for name, (lonlat, weights, radius) in layers.items():
+        aggregator = HexAggregator(lonlat, weights)
+        verify_cells(aggregator.xy, radius)
+        cells = len(aggregator.base(radius).keys)
+        for marker, (lon, lat) in QR_POSITIONS.items():
+            verify_impact(aggregator, lon, lat, 5.0, radius)
+            full_ms = _best_ms(lambda: full_rebin(aggregator, lon, lat, 5.0, radius), repeat)
+            incremental_ms = _best_ms(lambda: aggregator.with_impact(lon, lat, 5.0, radius), repeat)
+            print(f"{name:<10}{marker:<8}{cells:>7}{full_ms:>10.3f}{incremental_ms:>16.4f}{full_ms / incremental_ms:>8.0f}x")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,274 @@
+"""
+Correctness check and benchmark for the vector tile server.
+
+Decodes the generated MVT tiles with a small independent protobuf reader
+and checks, for every tile covering the data at each zoom:
+- from FULL_DETAIL_ZOOM up, every tree appears exactly once, at its
+  projected position;
+- below it, the point_count of the kept points adds up to all trees;
+- exterior rings are clockwise and holes anticlockwise;
+- the BID polygon area summed over tiles matches the polygons' own area.
+
+Then it times cold and cached tiles, compares the bytes of one map viewport
+with the full trees.json and lic_bid.json, checks that the LRU cache stays
+within a small budget, and renders tiles over a synthetic citywide point
+set.
+
+Usage: python data/bench_tiles.py [--synthetic 600000]
+"""
+import argparse
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+import shapely
+
+from tiles import (BID_PATH, EXTENT, FULL_DETAIL_ZOOM, MAX_ZOOM, MIN_ZOOM, TREES_PATH, PointLayer, TileCache,
+                   TileServer, load_layers, mercator, render_tile)
+
+VIEWPORT_PX = (1280, 800)
+VIEW_CENTER = (-73.93561, 40.743)  # js/config.js INITIAL_VIEW_STATE
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _fields(data):
+    """(field number, wire type, value) of a protobuf message"""
+    pos = 0
+    while pos < len(data):
+        key, pos = _read_varint(data, pos)
+        number, wire = key >> 3, key & 7
+        if wire == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire == 2:
+            length, pos = _read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        elif wire == 5:
+            value, pos = data[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"wire type {wire}")
+        yield number, wire, value
+
+
+def _unpack(data):
+    values, pos = [], 0
+    while pos < len(data):
+        value, pos = _read_varint(data, pos)
+        values.append(value)
+    return values
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def _decode_value(data):
+    for number, _, value in _fields(data):
+        if number == 1:
+            return value.decode()
+        if number == 3:
+            return struct.unpack("<d", value)[0]
+        if number in (4, 5):
+            return value
+        if number == 6:
+            return _unzigzag(value)
+        if number == 7:
+            return bool(value)
+    return None
+
+
+def decode_geometry(commands):
+    """Rings/points of a geometry as lists of (x, y)"""
+    parts, x, y, i = [], 0, 0, 0
+    while i < len(commands):
+        command, count = commands[i] & 7, commands[i] >> 3
+        i += 1
+        if command == 7:
+            parts[-1].append(parts[-1][0])
+            continue
+        for _ in range(count):
+            x += _unzigzag(commands[i])
+            y += _unzigzag(commands[i + 1])
+            i += 2
+            if command == 1:
+                parts.append([(x, y)])
+            else:
+                parts[-1].append((x, y))
+    return parts
+
+
+def decode_tile(data):
+    """{layer name: [(id, type, properties, parts)]}"""
+    layers = {}
+    for number, _, layer_data in _fields(data):
+        assert number == 3
+        name, keys, values, features, extent, version = None, [], [], [], None, None
+        for field, _, value in _fields(layer_data):
+            if field == 1:
+                name = value.decode()
+            elif field == 2:
+                features.append(value)
+            elif field == 3:
+                keys.append(value.decode())
+            elif field == 4:
+                values.append(_decode_value(value))
+            elif field == 5:
+                extent = value
+            elif field == 15:
+                version = value
+        assert version == 2 and extent == EXTENT
+        decoded = []
+        for feature in features:
+            fid, kind, tags, geometry = None, None, [], []
+            for field, _, value in _fields(feature):
+                if field == 1:
+                    fid = value
+                elif field == 2:
+                    tags = _unpack(value)
+                elif field == 3:
+                    kind = value
+                elif field == 4:
+                    geometry = _unpack(value)
+            properties = {keys[tags[k]]: values[tags[k + 1]] for k in range(0, len(tags), 2)}
+            decoded.append((fid, kind, properties, decode_geometry(geometry)))
+        layers[name] = decoded
+    return layers
+
+
+def _ring_area(ring):
+    ring = np.array(ring, dtype=np.float64)
+    return float(np.dot(ring[:-1, 0], ring[1:, 1]) - np.dot(ring[1:, 0], ring[:-1, 1])) / 2
+
+
+def covering_tiles(layers, z):
+    """Every tile at zoom z that overlaps the data"""
+    west, north = np.inf, np.inf
+    east, south = -np.inf, -np.inf
+    for name, layer in layers.items():
+        bounds = shapely.total_bounds(layer.world) if name == "bid" else (*layer.world.min(0), *layer.world.max(0))
+        west, north, east, south = min(west, bounds[0]), min(north, bounds[1]), max(east, bounds[2]), max(south, bounds[3])
+    n = 2 ** z
+    return [(z, x, y) for x in range(int(west * n), int(east * n) + 1) for y in range(int(north * n), int(south * n) + 1)]
+
+
+def verify(layers):
+    trees = layers["trees"]
+    expected_ids = sorted(int(i) for i in trees.ids)
+    world = dict(zip(trees.ids.tolist(), trees.world))
+    bid_area = shapely.area(layers["bid"].world).sum()
+    for z in range(MIN_ZOOM, MAX_ZOOM + 1):
+        ids, total_count, area = [], 0, 0.0
+        for _, x, y in covering_tiles(layers, z):
+            decoded = decode_tile(render_tile(layers, z, x, y))
+            for fid, kind, properties, parts in decoded.get("trees", []):
+                assert kind == 1
+                ids.append(fid)
+                total_count += properties.get("point_count", 1)
+                px, py = parts[0][0]
+                wx, wy = world[fid]
+                assert abs((wx * 2 ** z - x) * EXTENT - px) <= 1 and abs((wy * 2 ** z - y) * EXTENT - py) <= 1
+            tile_box = shapely.box(0, 0, EXTENT, EXTENT)
+            for fid, kind, _, parts in decoded.get("bid", []):
+                assert kind == 3
+                polygons = []
+                for ring in parts:
+                    if _ring_area(ring) > 0:
+                        polygons.append([ring])
+                    else:
+                        assert polygons, "hole before any exterior ring"
+                        polygons[-1].append(ring)
+                for rings in polygons:
+                    polygon = shapely.Polygon(rings[0], rings[1:])
+                    area += shapely.area(shapely.intersection(shapely.make_valid(polygon), tile_box))
+        if z >= FULL_DETAIL_ZOOM:
+            assert sorted(ids) == expected_ids, z
+        else:
+            assert len(set(ids)) == len(ids) and total_count == len(expected_ids), (z, total_count)
+        # Tile units are EXTENT per tile side, world units 1 per world side
+        area_ratio = area / (bid_area * (EXTENT * 2 ** z) ** 2)
+        if z >= 14:  # lower zooms quantize lots to a few tile units
+            assert abs(area_ratio - 1) < 0.01, (z, area_ratio)
+        print(f"z{z:<3}{len(ids):>6} tree features{total_count:>6} trees  BID area ratio {area_ratio:.4f}")
+
+
+def viewport_tiles(z, center=VIEW_CENTER, viewport=VIEWPORT_PX, tile_px=512):
+    wx, wy = mercator(*center)
+    n = 2 ** z
+    half_x, half_y = viewport[0] / 2 / tile_px, viewport[1] / 2 / tile_px
+    return [(z, x, y) for x in range(int(wx * n - half_x), int(wx * n + half_x) + 1)
+            for y in range(int(wy * n - half_y), int(wy * n + half_y) + 1)]
+
+
+def timed_tiles(server, tiles):
+    times, sizes = [], []
+    for tile in tiles:
+        start = time.perf_counter()
+        sizes.append(len(server.tile(*tile)))
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000, sizes
+
+
+def main(synthetic):
+    layers = load_layers()
+    verify(layers)
+
+    full_bytes = os.path.getsize(TREES_PATH) + os.path.getsize(BID_PATH)
+    with tempfile.TemporaryDirectory() as tmp:
+        server = TileServer(layers, TileCache(tmp))
+        print(f"{'viewport':<10}{'tiles':>6}{'bytes':>10}{'cold p50 ms':>13}{'cold max ms':>13}{'cached p50 ms':>15}")
+        for z in (12, 14, 16, 18):
+            tiles = viewport_tiles(z)
+            cold, sizes = timed_tiles(server, tiles)
+            cached, _ = timed_tiles(server, tiles)
+            print(f"{f'z{z}':<10}{len(tiles):>6}{sum(sizes):>10,}{np.median(cold):>13.2f}{cold.max():>13.2f}"
+                  f"{np.median(cached):>15.3f}")
+        print(f"full trees.json + lic_bid.json: {full_bytes:,} B")
+
+    # A budget of a few tiles: the cache must evict and stay under it
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TileCache(tmp, max_bytes=40_000)
+        server = TileServer(layers, cache)
+        for tile in covering_tiles(layers, 16) + covering_tiles(layers, 17):
+            server.tile(*tile)
+        on_disk = sum(os.path.getsize(os.path.join(d, f)) for d, _, names in os.walk(tmp) for f in names)
+        assert cache.bytes == on_disk <= cache.max_bytes and cache.evictions > 0
+        last = covering_tiles(layers, 17)[-1]
+        assert cache.get(f"{server.version}/{last[0]}/{last[1]}/{last[2]}.mvt") is not None
+        reopened = TileCache(tmp, max_bytes=40_000)
+        assert reopened.bytes == on_disk
+        print(f"LRU cache: {cache.evictions} evictions, {cache.bytes:,} of {cache.max_bytes:,} B in use")
+
+    if synthetic:
+        rng = np.random.default_rng(0)
+        # Points over the five boroughs' bounding box
+        lonlat = np.column_stack([rng.uniform(-74.26, -73.70, synthetic), rng.uniform(40.49, 40.92, synthetic)])
+        properties = [{"DBH": int(d)} for d in rng.integers(0, 40, synthetic)]
+        start = time.perf_counter()
+        points = PointLayer(lonlat, properties, ids=np.arange(synthetic), priority=[p["DBH"] for p in properties])
+        built = time.perf_counter() - start
+        print(f"synthetic citywide layer: {synthetic:,} points indexed in {built * 1e3:.0f} ms")
+        server = TileServer({"trees": points}, None, version="synthetic")
+        for z in (12, 14, 16):
+            times, sizes = timed_tiles(server, viewport_tiles(z))
+            print(f"  z{z}: {len(sizes)} viewport tiles, {sum(sizes):,} B, p50 {np.median(times):.1f} ms, "
+                  f"max {times.max():.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--synthetic", type=int, default=600_000, help="points in the citywide run (0 to skip)")
+    args = parser.parse_args()
+    main(args.synthetic)
@@ -0,0 +1,115 @@
+"""
+Benchmark TreeIndex queries against a brute-force scan of every tree.
+
+Runs random bbox, radius and k-nearest queries around the data, checks each
+result against the brute-force answer, and prints the mean latency per query.
+The same is repeated on a synthetic citywide-sized point set (~700k street
+trees) to show how the index scales past the LIC extract. Finally the grid
+and a full scan are timed on both sides of SCAN_MAX_POINTS, the size below
+which TreeIndex scans instead of using its grid.
+
+Usage: python data/bench_tree_index.py [num_queries]
+"""
+import sys
+import time
+
+import numpy as np
+
+from tree_index import SCAN_MAX_POINTS, TreeIndex
+
+
+def _mean_us(fn, queries):
+    start = time.perf_counter()
+    for query in queries:
+        fn(*query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+CITYWIDE_TREES = 700_000
+CROSSOVER_SIZES = (SCAN_MAX_POINTS // 2, SCAN_MAX_POINTS, SCAN_MAX_POINTS * 2, SCAN_MAX_POINTS * 8)
+
+
+def tiled(lonlat, size, seed=1):
+    """The first size points of copies of lonlat tiled at random offsets, keeping its spatial density"""
+    rng = np.random.default_rng(seed)
+    lo, hi = lonlat.min(axis=0), lonlat.max(axis=0)
+    tiles = size // len(lonlat) + 1
+    offsets = rng.integers(0, int(np.sqrt(tiles)) + 1, size=(tiles, 2)) * (hi - lo)
+    return (lonlat[None, :, :] + offsets[:, None, :]).reshape(-1, 2)[:size]
+
+
+def bench(index, num_queries, label):
+    rng = np.random.default_rng(0)
+    lo, hi = index.lonlat.min(axis=0), index.lonlat.max(axis=0)
+    centres = lo + rng.random((num_queries, 2)) * (hi - lo)
+    half = rng.uniform(0.0005, 0.003, size=(num_queries, 2))
+    radii = rng.uniform(25, 300, size=num_queries)
+    ks = rng.integers(1, 50, size=num_queries)
+
+    bbox_queries = [(*(c - h), *(c + h)) for c, h in zip(centres, half)]
+    radius_queries = [(c[0], c[1], r) for c, r in zip(centres, radii)]
+    nearest_queries = [(c[0], c[1], k) for c, k in zip(centres, ks)]
+
+    def brute_bbox(x0, y0, x1, y1):
+        p = index.lonlat
+        return np.flatnonzero((p[:, 0] >= x0) & (p[:, 0] <= x1) & (p[:, 1] >= y0) & (p[:, 1] <= y1))
+
+    def brute_distances(lon, lat):
+        return np.hypot(*(index.xy - index.project([lon, lat])).T)
+
+    def brute_radius(lon, lat, r):
+        d = brute_distances(lon, lat)
+        return np.flatnonzero(d <= r)
+
+    def brute_nearest(lon, lat, k):
+        return np.sort(brute_distances(lon, lat))[:k]
+
+    # Verify against brute force
+    for query in bbox_queries:
+        assert set(index.bbox(*query)) == set(brute_bbox(*query))
+    for query in radius_queries:
+        assert set(index.within_radius(*query)[0]) == set(brute_radius(*query))
+    for query in nearest_queries:
+        assert np.allclose(index.nearest(*query)[1], brute_nearest(*query))
+
+    print(f"{label}: {len(index):,} trees, {num_queries:,} queries per type, results verified")
+    print(f"{'query':<10}{'index us':>10}{'scan us':>10}{'speedup':>10}")
+    for name, fn, brute, queries in (
+        ("bbox", index.bbox, brute_bbox, bbox_queries),
+        ("radius", index.within_radius, brute_radius, radius_queries),
+        ("nearest", index.nearest, brute_nearest, nearest_queries),
+    ):
+        indexed, scanned = _mean_us(fn, queries), _mean_us(brute, queries)
+        print(f"{name:<10}{indexed:>10.1f}{scanned:>10.1f}{scanned / indexed:>9.1f}x")
+
+
+def run(num_queries):
+    start = time.perf_counter()
+    index = TreeIndex.from_geojson()
+    print(f"trees.json loaded and indexed in {(time.perf_counter() - start) * 1000:.1f} ms")
+    bench(index, num_queries, "trees.json")
+
+    # Same spatial density as the LIC extract, tiled out to citywide size
+    citywide = tiled(index.lonlat, CITYWIDE_TREES)
+    start = time.perf_counter()
+    citywide_index = TreeIndex(citywide)
+    print(f"\nsynthetic citywide set indexed in {(time.perf_counter() - start) * 1000:.1f} ms")
+    bench(citywide_index, max(num_queries // 20, 10), "citywide")
+
+    print(f"\ngrid vs full scan (TreeIndex scans at or below {SCAN_MAX_POINTS:,} points)")
+    print(f"{'points':>8}{'bbox grid':>11}{'bbox scan':>11}{'near grid':>11}{'near scan':>11}")
+    rng = np.random.default_rng(2)
+    for size in (len(index), *CROSSOVER_SIZES):
+        points = tiled(index.lonlat, size)
+        grid, scan = TreeIndex(points, scan_max_points=0), TreeIndex(points, scan_max_points=size)
+        lo, hi = points.min(axis=0), points.max(axis=0)
+        centres = lo + rng.random((num_queries, 2)) * (hi - lo)
+        half = rng.uniform(0.0005, 0.003, size=(num_queries, 2))
+        bbox_queries = [(*(c - h), *(c + h)) for c, h in zip(centres, half)]
+        nearest_queries = [(c[0], c[1], 10) for c in centres]
+        print(f"{size:>8,}{_mean_us(grid.bbox, bbox_queries):>11.1f}{_mean_us(scan.bbox, bbox_queries):>11.1f}"
+              f"{_mean_us(grid.nearest, nearest_queries):>11.1f}{_mean_us(scan.nearest, nearest_queries):>11.1f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
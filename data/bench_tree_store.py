@@ -0,0 +1,65 @@
+"""
+Round-trip check and load-time benchmark for the binary tree store.
+
+Exports trees.json to a temporary store file, runs tree_store's round-trip
+check on it (also available as `python data/tree_store.py --check`), then
+compares the time to get usable coordinate/attribute arrays from each format.
+
+Usage: python data/bench_tree_store.py [repeat]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from tree_store import TREES_PATH, TreeStore, export, verify_round_trip
+
+
+def _best_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def load_geojson():
+    with open(TREES_PATH) as f:
+        features = json.load(f)["features"]
+    lonlat = np.array([f["geometry"]["coordinates"] for f in features])
+    species = [f["properties"]["GenusSpecies"] for f in features]
+    return lonlat, species
+
+
+def run(repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = export(path=os.path.join(tmp, "trees.bin"))
+
+        with TreeStore(path) as store:
+            error_deg = verify_round_trip(store)
+        print(f"round trip OK ({len(store):,} trees, max coordinate error {error_deg:.1e} deg)")
+        print(f"size: trees.json {os.path.getsize(TREES_PATH):,} B -> trees.bin {os.path.getsize(path):,} B")
+
+        def load_store():
+            store = TreeStore(path)
+            return store["coords"], store["species"]
+
+        def load_store_decoded():
+            store = TreeStore(path)
+            return store.lonlat(), store.decode("species")
+
+        print(f"{'load':<34}{'best ms':>10}")
+        for label, fn in (
+            ("trees.json (json.load + arrays)", load_geojson),
+            ("trees.bin mmap (zero-copy views)", load_store),
+            ("trees.bin mmap + decode columns", load_store_decoded),
+        ):
+            print(f"{label:<34}{_best_ms(fn, repeat):>10.3f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
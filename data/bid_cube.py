@@ -0,0 +1,303 @@
+"""
+Precomputed statistics per BID polygon: trees and nearby Citibike trips.
+
+Joins trees.json, lic_bid.json and data/bikes/citibike_count.json by
+polygon into two small arrays:
+
+    trees     int32 counts, shape (polygon, species, condition, dbh band)
+    citibike  which stations lie within CITIBIKE_NEAR_M of each polygon,
+              and every station's start/end/total trip counts
+
+Trees are assigned by the BIDPolygonID that data/etl.py records on them.
+Stations are matched with a projected STRtree query, so a station near
+several polygons counts towards each of them but only once towards any
+group of them.
+
+The arrays are cached in data/.bid_cube.npz with a key per component
+(the content hashes of its inputs and this file), so a changed
+citibike_count.json only redoes the station join and a changed trees.json
+only recounts the trees. BIDCube answers slices and roll-ups from the
+arrays and memoizes each distinct query, so repeated dashboard queries
+cost a dict lookup.
+
+    python data/bid_cube.py --polygon 82 --by condition
+    python data/bid_cube.py --by dbh --species "Ginkgo biloba - maidenhair tree"
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from etl import DATA_DIR, SIDEWALK_M, STAGE_OUTPUTS, PolygonClipper, file_hash, load_bid_polygons
+
+BID_PATH = STAGE_OUTPUTS["bid"]
+TREES_PATH = STAGE_OUTPUTS["trees"]
+CITIBIKE_COUNT_PATH = STAGE_OUTPUTS["citibike"]
+CUBE_PATH = os.path.join(DATA_DIR, ".bid_cube.npz")
+
+DIMENSIONS = ("polygon", "species", "condition", "dbh")
+# DBH in inches; bands are [0, 6), [6, 12), ... and 24 or more
+DBH_EDGES = (6, 12, 18, 24)
+DBH_BANDS = ("0-5", "6-11", "12-17", "18-23", "24+", "Unknown")
+UNKNOWN = "Unknown"
+
+CITIBIKE_NEAR_M = 250.0  # a few minutes' walk from the polygon edge
+CITIBIKE_MEASURES = ("start_count", "end_count", "total_count")
+
+COMPONENTS = ("trees", "citibike")
+COMPONENT_INPUTS = {"trees": (TREES_PATH, BID_PATH), "citibike": (CITIBIKE_COUNT_PATH, BID_PATH)}
+
+_hash_cache = {}
+
+
+def dbh_band(values):
+    """Index into DBH_BANDS for each DBH string ('' or unparsable -> Unknown)"""
+    dbh = np.array([float(v) if _is_number(v) else np.nan for v in values], dtype=np.float64)
+    bands = np.digitize(np.nan_to_num(dbh, nan=0.0), DBH_EDGES)
+    bands[np.isnan(dbh)] = DBH_BANDS.index(UNKNOWN)
+    return bands
+
+
+def _is_number(value):
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _codes(values):
+    """(sorted labels, code of each value)"""
+    labels, codes = np.unique(np.array(values, dtype=str), return_inverse=True)
+    return labels, codes
+
+
+def build_trees(polygon_count, trees_path=TREES_PATH, bid_path=BID_PATH):
+    """(tree count cube, species labels, condition labels)"""
+    with open(trees_path) as f:
+        features = json.load(f)["features"]
+    properties = [feature["properties"] for feature in features]
+
+    if features and all("BIDPolygonID" in p for p in properties):
+        polygon = np.array([p["BIDPolygonID"] for p in properties], dtype=np.int64)
+    else:
+        # trees.json written before the ETL recorded polygon ids
+        lonlat = np.array([feature["geometry"]["coordinates"] for feature in features], dtype=np.float64)
+        polygon = PolygonClipper(load_bid_polygons(bid_path), SIDEWALK_M).ids(*lonlat.reshape(-1, 2).T)
+    species, species_code = _codes([p.get("GenusSpecies") or UNKNOWN for p in properties])
+    conditions, condition_code = _codes([p.get("TPCondition") or UNKNOWN for p in properties])
+    band = dbh_band([p.get("DBH") for p in properties])
+
+    shape = (polygon_count, len(species), len(conditions), len(DBH_BANDS))
+    kept = (polygon >= 0) & (polygon < polygon_count)
+    flat = np.ravel_multi_index((polygon[kept], species_code[kept], condition_code[kept], band[kept]), shape)
+    cube = np.bincount(flat, minlength=int(np.prod(shape))).astype(np.int32).reshape(shape)
+    return cube, species, conditions
+
+
+def build_citibike(polygons, citibike_path=CITIBIKE_COUNT_PATH, near_m=CITIBIKE_NEAR_M):
+    """(polygon x station bool matrix of stations within near_m, station names, station measures)"""
+    with open(citibike_path) as f:
+        stations = json.load(f)
+    names = np.array([s["station_name"] for s in stations], dtype=str)
+    measures = np.array([[s[m] for m in CITIBIKE_MEASURES] for s in stations], dtype=np.float64)
+    measures = measures.reshape(-1, len(CITIBIKE_MEASURES))
+
+    near = np.zeros((len(polygons), len(stations)), dtype=bool)
+    if stations:
+        lon = np.array([s["lon"] for s in stations], dtype=np.float64)
+        lat = np.array([s["lat"] for s in stations], dtype=np.float64)
+        station_index, polygon_index, _ = PolygonClipper(polygons).pairs_within(lon, lat, near_m)
+        near[polygon_index, station_index] = True
+    return near, names, measures
+
+
+def _component_key(component):
+    digest = hashlib.sha256(file_hash(os.path.abspath(__file__), _hash_cache).encode())
+    for path in COMPONENT_INPUTS[component]:
+        digest.update(file_hash(path, _hash_cache).encode())
+    if component == "citibike":
+        digest.update(repr(CITIBIKE_NEAR_M).encode())
+    return digest.hexdigest()
+
+
+def load_arrays(path=CUBE_PATH, rebuild=False):
+    """
+    Cube arrays, rebuilding only the components whose inputs changed
+
+    Parameters:
+    - path: npz cache, rewritten when anything is rebuilt
+    - rebuild: ignore the cache and rebuild every component
+
+    Returns:
+    - (dict of arrays, tuple of the components that were rebuilt)
+    """
+    arrays = {}
+    if not rebuild and os.path.exists(path):
+        with np.load(path, allow_pickle=False) as cached:
+            arrays = dict(cached)
+
+    rebuilt = []
+    polygons = None
+    for component in COMPONENTS:
+        key = _component_key(component)
+        if str(arrays.get(f"{component}_key", "")) == key:
+            continue
+        if polygons is None:
+            polygons = load_bid_polygons(BID_PATH)
+        if component == "trees":
+            arrays["trees"], arrays["species"], arrays["conditions"] = build_trees(len(polygons))
+        else:
+            arrays["citibike_near"], arrays["stations"], arrays["station_measures"] = build_citibike(polygons)
+        arrays[f"{component}_key"] = np.array(key)
+        rebuilt.append(component)
+
+    if rebuilt:
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+    return arrays, tuple(rebuilt)
+
+
+class BIDCube:
+    """
+    Slicing and roll-up queries over the per-polygon statistics
+
+    Filters are keyword arguments named after DIMENSIONS: polygon takes
+    BIDPolygonIDs, species and condition take their labels and dbh takes
+    DBH_BANDS labels; each accepts one value or a list. Omitted dimensions
+    are summed over. Results are memoized per distinct query, so treat the
+    returned dicts as read-only.
+
+    Parameters:
+    - arrays: as returned by load_arrays
+    """
+
+    def __init__(self, arrays):
+        self.trees = arrays["trees"]
+        self.citibike_near = arrays["citibike_near"]
+        self.stations = arrays["stations"]
+        self.station_measures = arrays["station_measures"]
+        self.labels = {
+            "polygon": tuple(range(self.trees.shape[0])),
+            "species": tuple(arrays["species"].tolist()),
+            "condition": tuple(arrays["conditions"].tolist()),
+            "dbh": DBH_BANDS,
+        }
+        self._index = {dim: {label: i for i, label in enumerate(labels)} for dim, labels in self.labels.items()}
+        self._memo = {}
+
+    def _filters(self, filters):
+        unknown = set(filters) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown dimension(s) {sorted(unknown)}; expected {DIMENSIONS}")
+        normalized = []
+        for dim in DIMENSIONS:
+            value = filters.get(dim)
+            if value is None:
+                continue
+            values = tuple(value) if isinstance(value, (list, tuple, set, np.ndarray)) else (value,)
+            try:
+                normalized.append((dim, tuple(sorted(self._index[dim][v] for v in values))))
+            except KeyError as e:
+                raise KeyError(f"Unknown {dim} {e.args[0]!r}") from None
+        return tuple(normalized)
+
+    def _slice(self, filters):
+        cube = self.trees
+        for dim, indices in filters:
+            cube = np.take(cube, indices, axis=DIMENSIONS.index(dim))
+        return cube
+
+    def count(self, **filters):
+        """Number of trees matching the filters"""
+        key = ("count", self._filters(filters))
+        if key not in self._memo:
+            self._memo[key] = int(self._slice(key[1]).sum())
+        return self._memo[key]
+
+    def rollup(self, by, **filters):
+        """
+        Tree counts grouped by one or more dimensions
+
+        Parameters:
+        - by: dimension name, or a tuple of them
+        - filters: as for count
+
+        Returns:
+        - {label: count} (tuple labels when grouping by several dimensions), nonzero groups only
+        """
+        dims = (by,) if isinstance(by, str) else tuple(by)
+        if not dims or set(dims) - set(DIMENSIONS):
+            raise ValueError(f"Cannot group by {by!r}; expected names from {DIMENSIONS}")
+        normalized = self._filters(filters)
+        key = ("rollup", dims, normalized)
+        if key not in self._memo:
+            kept = dict(normalized)
+            cube = self._slice(normalized)
+            axes = tuple(i for i, dim in enumerate(DIMENSIONS) if dim not in dims)
+            grouped = cube.sum(axis=axes)
+            # sum() keeps the remaining axes in DIMENSIONS order; reorder to match `by`
+            remaining = [dim for dim in DIMENSIONS if dim in dims]
+            grouped = np.transpose(grouped, [remaining.index(dim) for dim in dims])
+            labels = [[self.labels[dim][i] for i in kept.get(dim, range(len(self.labels[dim])))] for dim in dims]
+            result = {}
+            for position in zip(*np.nonzero(grouped)):
+                label = tuple(labels[axis][i] for axis, i in enumerate(position))
+                result[label if len(dims) > 1 else label[0]] = int(grouped[position])
+            self._memo[key] = result
+        return self._memo[key]
+
+    def citibike(self, polygon=None):
+        """Start/end/total trips of the stations near the given polygon(s), each station counted once"""
+        normalized = self._filters({"polygon": polygon})
+        key = ("citibike", normalized)
+        if key not in self._memo:
+            near = self.citibike_near[list(normalized[0][1])] if normalized else self.citibike_near
+            stations = near.any(axis=0)
+            totals = self.station_measures[stations].sum(axis=0)
+            result = {measure: float(total) for measure, total in zip(CITIBIKE_MEASURES, totals)}
+            result["stations"] = int(stations.sum())
+            self._memo[key] = result
+        return self._memo[key]
+
+    def summary(self, polygon=None):
+        """Dashboard card for a polygon (or several, or the whole BID)"""
+        by_species = self.rollup("species", polygon=polygon)
+        return {
+            "trees": self.count(polygon=polygon),
+            "species": len(by_species),
+            "top_species": sorted(by_species.items(), key=lambda item: (-item[1], item[0]))[:5],
+            "condition": self.rollup("condition", polygon=polygon),
+            "dbh": self.rollup("dbh", polygon=polygon),
+            "citibike": self.citibike(polygon),
+        }
+
+
+def load_cube(path=CUBE_PATH, rebuild=False):
+    """BIDCube over the current inputs, reusing the cache where it is up to date"""
+    return BIDCube(load_arrays(path, rebuild)[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the per-BID-polygon statistics cube")
+    parser.add_argument("--polygon", type=int, nargs="+", help="BIDPolygonID(s); default: the whole BID")
+    parser.add_argument("--species", nargs="+")
+    parser.add_argument("--condition", nargs="+")
+    parser.add_argument("--dbh", nargs="+", choices=DBH_BANDS)
+    parser.add_argument("--by", nargs="+", choices=DIMENSIONS, help="group tree counts by these dimensions")
+    parser.add_argument("--rebuild", action="store_true", help="ignore the cached cube")
+    args = parser.parse_args()
+
+    arrays, rebuilt = load_arrays(rebuild=args.rebuild)
+    print(f"Rebuilt: {', '.join(rebuilt)}" if rebuilt else "Cube up to date")
+    cube = BIDCube(arrays)
+    filters = {dim: getattr(args, dim) for dim in DIMENSIONS}
+    if args.by:
+        print(json.dumps({str(k): v for k, v in cube.rollup(tuple(args.by), **filters).items()}, indent=2))
+    elif any(filters[dim] for dim in ("species", "condition", "dbh")):
+        print(cube.count(**filters))
+    else:
+        print(json.dumps(cube.summary(args.polygon), indent=2))
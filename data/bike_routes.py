@@ -0,0 +1,282 @@
+"""
+Preprocess the NYC bike-route CSV into per-zoom GeoJSON and binary polylines.
+
+The front end used to fetch data/bikes/bike_routes.csv and split it with
+regexes on every load, which broke on quoted commas and kept only the first
+part of each MULTILINESTRING. This script parses the CSV once with the csv
+module and vectorized shapely WKT parsing, and writes to data/bikes/routes/:
+
+    bike_routes.z{zoom}.geojson   FeatureCollection simplified for that zoom
+    bike_routes.z{zoom}.bin       the same lines as packed binary polylines
+    manifest.json                 cache key, zooms and per-zoom stats
+
+Lines are simplified in local metres with a tolerance of TOLERANCE_PX
+screen pixels at each zoom (512 px tiles, as deck.gl and Mapbox GL use), so
+low zooms carry a fraction of the vertices. Only the properties the map's
+layer and tooltip read are kept.
+
+The binary files use the tree store layout (data/tree_store.py) with magic
+LICBIKE1 and these columns, one row per route:
+
+    <property>     uint16   code into that property's dictionary
+    feature_paths  uint32   (routes + 1) offsets into path_starts
+    path_starts    uint32   (paths + 1) offsets into coords
+    coords         float32  (vertices, 2) lon/lat offsets from the origin
+
+path_starts and coords are what deck.gl's PathLayer takes as binary
+attributes (startIndices and getPath), once the origin is added back.
+
+Nothing is rewritten when the CSV, the zoom list and this file are
+unchanged; the CSV's content hash is cached by mtime and size. Each output
+replaces the old one only once it is complete, and the manifest is removed
+before a rebuild and rewritten only after every output is in place, so a
+failed run is redone on the next one.
+
+    python data/bike_routes.py [data/bikes/bike_routes.csv] [--zooms 10 12 14 16] [--force]
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+
+import numpy as np
+import shapely
+
+from etl import DATA_DIR, EARTH_RADIUS_M, FeatureWriter, _is_current, file_hash, read_batches
+from tree_store import TreeStore, _encode_dictionary, write_store
+
+BIKE_ROUTES_CSV = os.path.join(DATA_DIR, "bikes", "bike_routes.csv")
+ROUTES_DIR = os.path.join(DATA_DIR, "bikes", "routes")
+MANIFEST_NAME = "manifest.json"
+MAGIC = b"LICBIKE1"
+
+GEOMETRY_COLUMN = "the_geom"
+# Properties read by createBikeRoutesLayer and updateBikeRouteTooltip
+ROUTE_PROPERTIES = ("street", "fromstreet", "tostreet", "facilitycl", "ft_facilit", "tf_facilit")
+
+ZOOMS = (10, 12, 14, 16)
+TOLERANCE_PX = 0.5
+TILE_SIZE = 512
+COORDINATE_DECIMALS = 6  # ~0.1 m, below the tolerance at any zoom served
+
+
+def metres_per_pixel(zoom, lat):
+    """Ground resolution of a web-mercator pixel at a zoom and latitude"""
+    return 2 * math.pi * EARTH_RADIUS_M * math.cos(math.radians(lat)) / (TILE_SIZE * 2 ** zoom)
+
+
+def output_paths(zoom, out_dir=ROUTES_DIR):
+    """(GeoJSON path, binary path) for a zoom"""
+    stem = os.path.join(out_dir, f"bike_routes.z{zoom}")
+    return f"{stem}.geojson", f"{stem}.bin"
+
+
+def read_routes(path=BIKE_ROUTES_CSV):
+    """(array of shapely lon/lat MultiLineStrings, {property: list of strings}) from the CSV"""
+    header, batches = read_batches(path)
+    if GEOMETRY_COLUMN in header:
+        geom_col = header.index(GEOMETRY_COLUMN)
+    else:
+        geom_col = 0  # the front end assumed the geometry comes first
+    property_cols = {name: header.index(name) for name in ROUTE_PROPERTIES if name in header}
+
+    geometries = []
+    properties = {name: [] for name in ROUTE_PROPERTIES}
+    for batch in batches:
+        rows = [row for row in batch if len(row) > geom_col and row[geom_col].strip()]
+        parsed = shapely.from_wkt([row[geom_col] for row in rows], on_invalid="warn")
+        keep = ~(shapely.is_missing(parsed) | shapely.is_empty(parsed))
+        if keep.any():
+            # LineStrings are promoted so every route is a MultiLineString
+            parts, route = shapely.get_parts(parsed[keep], return_index=True)
+            geometries.append(shapely.multilinestrings(parts, indices=route))
+        for name in ROUTE_PROPERTIES:
+            col = property_cols.get(name)
+            properties[name].extend(row[col].strip() if col is not None and col < len(row) else ""
+                                    for row, k in zip(rows, keep) if k)
+    geometries = np.concatenate(geometries) if geometries else np.empty(0, dtype=object)
+    return geometries, properties
+
+
+class LocalProjection:
+    """Equirectangular metres around a centre, accurate to well under a pixel across a borough"""
+
+    def __init__(self, geometries):
+        min_x, min_y, max_x, max_y = shapely.total_bounds(geometries)
+        self.origin = np.array([(min_x + max_x) / 2, (min_y + max_y) / 2])
+        self.scale = np.radians(1.0) * EARTH_RADIUS_M * np.array([np.cos(np.radians(self.origin[1])), 1.0])
+
+    def forward(self, coords):
+        return (coords - self.origin) * self.scale
+
+    def inverse(self, coords):
+        return coords / self.scale + self.origin
+
+
+def simplify(geometries, zoom, projection):
+    """Lines simplified to TOLERANCE_PX pixels at a zoom, in lon/lat rounded to COORDINATE_DECIMALS"""
+    tolerance = TOLERANCE_PX * metres_per_pixel(zoom, projection.origin[1])
+    simplified = shapely.simplify(shapely.transform(geometries, projection.forward), tolerance,
+                                  preserve_topology=False)
+    return shapely.transform(simplified, lambda xy: np.round(projection.inverse(xy), COORDINATE_DECIMALS))
+
+
+def _geojson_geometry(geometry):
+    lines = [shapely.get_coordinates(line).tolist() for line in shapely.get_parts(geometry)]
+    if len(lines) == 1:
+        return {"type": "LineString", "coordinates": lines[0]}
+    return {"type": "MultiLineString", "coordinates": lines}
+
+
+def write_geojson(path, geometries, properties):
+    writer = FeatureWriter(path, "bike_routes")
+    try:
+        for i, geometry in enumerate(geometries):
+            writer.write({name: values[i] for name, values in properties.items()}, _geojson_geometry(geometry))
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return writer.count
+
+
+def write_binary(path, geometries, properties):
+    """Binary polylines as described in the module docstring"""
+    parts, feature_of_part = shapely.get_parts(geometries, return_index=True)
+    coords, part_of_vertex = shapely.get_coordinates(parts, return_index=True)
+    feature_paths = np.searchsorted(feature_of_part, np.arange(len(geometries) + 1)).astype(np.uint32)
+    path_starts = np.searchsorted(part_of_vertex, np.arange(len(parts) + 1)).astype(np.uint32)
+    origin = coords.min(axis=0) if len(coords) else np.zeros(2)
+
+    columns, dictionaries = {}, {}
+    for name, values in properties.items():
+        columns[name], dictionaries[name] = _encode_dictionary(values, np.uint16)
+    columns["feature_paths"] = feature_paths
+    columns["path_starts"] = path_starts
+    columns["coords"] = (coords - origin).astype(np.float32)
+    tmp = f"{path}.tmp"
+    try:
+        write_store(origin, columns, dictionaries, tmp, magic=MAGIC)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, path)
+    return len(coords)
+
+
+def _cache_key(source, zooms, hash_cache):
+    return hashlib.sha256(json.dumps({
+        "code": file_hash(os.path.abspath(__file__), hash_cache),
+        "input": file_hash(os.path.abspath(source), hash_cache),
+        "zooms": list(zooms),
+        "tolerance_px": TOLERANCE_PX,
+    }).encode()).hexdigest()
+
+
+def convert(source=BIKE_ROUTES_CSV, out_dir=ROUTES_DIR, zooms=ZOOMS, force=False):
+    """
+    Write the per-zoom outputs unless they are already up to date
+
+    Parameters:
+    - source: bike-route CSV
+    - out_dir: output directory, holding the manifest
+    - zooms: zoom levels to simplify for
+    - force: rewrite even if the cache key matches
+
+    Returns:
+    - (manifest dict, True if anything was written)
+    """
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    hash_cache = manifest.get("hashes", {})
+    key = _cache_key(source, zooms, hash_cache)
+    outputs = [path for zoom in zooms for path in output_paths(zoom, out_dir)]
+    if not force and manifest.get("key") == key and all(os.path.exists(path) for path in outputs):
+        return manifest, False
+
+    # Until every output is rewritten, no manifest may vouch for them
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    geometries, properties = read_routes(source)
+    projection = LocalProjection(geometries)
+    stats = {}
+    for zoom in zooms:
+        simplified = simplify(geometries, zoom, projection)
+        geojson_path, binary_path = output_paths(zoom, out_dir)
+        write_geojson(geojson_path, simplified, properties)
+        vertices = write_binary(binary_path, simplified, properties)
+        stats[str(zoom)] = {
+            "routes": len(simplified),
+            "vertices": vertices,
+            "geojson_bytes": os.path.getsize(geojson_path),
+            "binary_bytes": os.path.getsize(binary_path),
+        }
+
+    manifest = {
+        "key": key,
+        "source": os.path.relpath(os.path.abspath(source), out_dir),
+        "zooms": list(zooms),
+        "tolerance_px": TOLERANCE_PX,
+        "source_vertices": int(shapely.get_num_coordinates(geometries).sum()),
+        "stats": stats,
+        "hashes": {k: v for k, v in hash_cache.items() if _is_current(k)},
+    }
+    with open(f"{manifest_path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    return manifest, True
+
+
+def nearest_zoom(zoom, zooms=ZOOMS):
+    """The coarsest preprocessed zoom at least as detailed as the requested one"""
+    for candidate in sorted(zooms):
+        if candidate >= zoom:
+            return candidate
+    return max(zooms)
+
+
+class BikeRoutes(TreeStore):
+    """Memory-mapped binary polylines of one zoom"""
+
+    def __init__(self, path):
+        super().__init__(path, magic=MAGIC)
+        self._lonlat = None
+
+    def paths(self, route):
+        """float64 lon/lat arrays of one route's lines"""
+        feature_paths, path_starts = self.columns["feature_paths"], self.columns["path_starts"]
+        if self._lonlat is None:
+            self._lonlat = self.lonlat()
+        coords = self._lonlat
+        return [coords[path_starts[p]:path_starts[p + 1]]
+                for p in range(feature_paths[route], feature_paths[route + 1])]
+
+
+def load_routes(zoom=max(ZOOMS), out_dir=ROUTES_DIR):
+    """BikeRoutes for the preprocessed zoom closest to (and not coarser than) zoom"""
+    return BikeRoutes(output_paths(nearest_zoom(zoom), out_dir)[1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess the bike-route CSV into per-zoom GeoJSON and binary")
+    parser.add_argument("source", nargs="?", default=BIKE_ROUTES_CSV, help="bike-route CSV")
+    parser.add_argument("-o", "--out-dir", default=ROUTES_DIR)
+    parser.add_argument("--zooms", type=int, nargs="+", default=list(ZOOMS))
+    parser.add_argument("--force", action="store_true", help="rewrite even if the input is unchanged")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest, written = convert(args.source, args.out_dir, tuple(args.zooms), args.force)
+    if not written:
+        print(f"{os.path.relpath(args.out_dir)} up to date")
+    else:
+        print(f"{manifest['source_vertices']:,} source vertices in {time.perf_counter() - start:.2f} s")
+        for zoom, stats in manifest["stats"].items():
+            print(f"z{zoom:<3}{stats['routes']:>7,} routes{stats['vertices']:>10,} vertices"
+                  f"{stats['geojson_bytes']:>12,} B geojson{stats['binary_bytes']:>11,} B binary")
@@ -0,0 +1,201 @@
+"""
+Batched Citibike new-station simulation.
+
+A port of the simulation in loadCitibikeCountData (js/mapLayers.js): a new
+station of a given capacity takes a share of the trips at existing stations
+within its range, falling off linearly with distance,
+
+    factor  = (range - distance) / range            (0 outside the range)
+    impact  = -factor * impact * capacity / 20 * count * 0.3
+
+for the start and end counts alike (clamped so no station goes below zero),
+and generates capacity * 2 starts and as many ends itself.
+
+The front end measures distance in raw degrees, which stretches the range
+north-south: 0.003 degrees is 333 m of latitude but only 253 m of longitude
+here. This module uses haversine distances in metres, with the default range
+being 0.003 degrees of latitude. Candidate sites are evaluated as a
+(candidates x stations) array in chunks, so a whole placement grid is one
+call.
+
+    python data/citibike_sim.py --spacing 50 --capacity 20 --top 10
+"""
+import argparse
+import json
+import math
+from typing import NamedTuple
+
+import numpy as np
+import shapely
+
+from etl import EARTH_RADIUS_M, STAGE_OUTPUTS, load_bid_polygons
+
+CITIBIKE_COUNT_PATH = STAGE_OUTPUTS["citibike"]
+
+# Defaults of the front end's simulation controls (js/config.js)
+DEFAULT_CAPACITY = 20
+DEFAULT_IMPACT = 0.5
+DEFAULT_RANGE_M = math.radians(0.003) * EARTH_RADIUS_M
+STANDARD_CAPACITY = 20  # capacity whose impact is not scaled
+SHARE = 0.3  # share of a station's trips taken at zero distance, full impact and standard capacity
+TRIPS_PER_DOCK = 2  # starts (and ends) the new station generates per unit of capacity
+
+CHUNK_CANDIDATES = 4096
+RANK_METRICS = ("relief", "net", "generated")
+
+
+def haversine_m(lon1, lat1, lon2, lat2):
+    """Great-circle distance in metres, broadcasting over the inputs"""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class Simulation(NamedTuple):
+    """Per-candidate, per-station outcome; arrays are (candidates, stations) unless noted"""
+    distance_m: np.ndarray
+    start_impact: np.ndarray
+    end_impact: np.ndarray
+    start_count: np.ndarray  # counts after the new station, clamped at 0
+    end_count: np.ndarray
+    generated: np.ndarray  # (candidates,) starts plus ends of the new station
+
+
+class CitibikeStations:
+    """
+    Existing stations as arrays, from citibike_count.json
+
+    Parameters:
+    - stations: list of {station_name, lat, lon, start_count, end_count, ...}
+    """
+
+    def __init__(self, stations):
+        stations = [s for s in stations if s.get("lat") and s.get("lon")]
+        self.names = [s["station_name"] for s in stations]
+        self.lon = np.array([s["lon"] for s in stations], dtype=np.float64)
+        self.lat = np.array([s["lat"] for s in stations], dtype=np.float64)
+        self.start = np.array([s["start_count"] for s in stations], dtype=np.float64)
+        self.end = np.array([s["end_count"] for s in stations], dtype=np.float64)
+
+    @classmethod
+    def load(cls, path=CITIBIKE_COUNT_PATH):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def __len__(self):
+        return len(self.lon)
+
+    def simulate(self, candidates, capacity=DEFAULT_CAPACITY, impact=DEFAULT_IMPACT, range_m=DEFAULT_RANGE_M):
+        """
+        Effect of a new station at each candidate site
+
+        Parameters:
+        - candidates: (n, 2) lon/lat array
+        - capacity, impact, range_m: scalars or (n,) arrays, one per candidate
+
+        Returns:
+        - Simulation with (n, stations) arrays
+        """
+        candidates = np.asarray(candidates, dtype=np.float64).reshape(-1, 2)
+        capacity, impact, range_m = (np.broadcast_to(np.asarray(v, dtype=np.float64), len(candidates))[:, None]
+                                     for v in (capacity, impact, range_m))
+        distance = haversine_m(candidates[:, :1], candidates[:, 1:], self.lon, self.lat)
+        factor = np.clip((range_m - distance) / range_m, 0.0, None)
+        scale = -factor * impact * (capacity / STANDARD_CAPACITY) * SHARE
+        start_impact, end_impact = scale * self.start, scale * self.end
+        return Simulation(
+            distance, start_impact, end_impact,
+            np.maximum(0.0, self.start + start_impact), np.maximum(0.0, self.end + end_impact),
+            2 * TRIPS_PER_DOCK * capacity[:, 0],
+        )
+
+    def score(self, candidates, capacity=DEFAULT_CAPACITY, impact=DEFAULT_IMPACT, range_m=DEFAULT_RANGE_M,
+              chunk=CHUNK_CANDIDATES):
+        """
+        Per-candidate totals, evaluated chunk by chunk to bound memory
+
+        Returns:
+        - dict of (n,) arrays: relief (trips taken off existing stations),
+          generated (trips of the new station), net (generated - relief) and
+          affected (existing stations within range)
+        """
+        candidates = np.asarray(candidates, dtype=np.float64).reshape(-1, 2)
+        n = len(candidates)
+        params = [np.broadcast_to(np.asarray(v, dtype=np.float64), n) for v in (capacity, impact, range_m)]
+        relief, generated, affected = np.empty(n), np.empty(n), np.empty(n, dtype=np.int64)
+        for lo in range(0, n, chunk):
+            hi = min(lo + chunk, n)
+            sim = self.simulate(candidates[lo:hi], *(p[lo:hi] for p in params))
+            relief[lo:hi] = (self.start - sim.start_count).sum(axis=1) + (self.end - sim.end_count).sum(axis=1)
+            generated[lo:hi] = sim.generated
+            affected[lo:hi] = (sim.distance_m < params[2][lo:hi, None]).sum(axis=1)
+        return {"relief": relief, "generated": generated, "net": generated - relief, "affected": affected}
+
+    def rank(self, candidates, by="relief", top=10, **params):
+        """
+        Best candidate sites by a score() metric, highest first
+
+        Parameters:
+        - candidates: (n, 2) lon/lat array
+        - by: one of RANK_METRICS
+        - top: how many sites to return, None for all
+        - params: capacity, impact, range_m as for simulate
+
+        Returns:
+        - list of {lon, lat, relief, generated, net, affected}
+        """
+        if by not in RANK_METRICS:
+            raise ValueError(f"Unknown metric {by!r}; expected one of {RANK_METRICS}")
+        candidates = np.asarray(candidates, dtype=np.float64).reshape(-1, 2)
+        scores = self.score(candidates, **params)
+        # Ties (e.g. every site out of range) keep grid order
+        order = np.argsort(-scores[by], kind="stable")
+        if top is not None:
+            order = order[:top]
+        return [
+            {"lon": float(candidates[i, 0]), "lat": float(candidates[i, 1]),
+             **{metric: scores[metric][i].item() for metric in scores}}
+            for i in order
+        ]
+
+
+def placement_grid(bounds, spacing_m):
+    """
+    (n, 2) lon/lat grid of candidate sites spaced about spacing_m apart
+
+    Parameters:
+    - bounds: (min_lon, min_lat, max_lon, max_lat)
+    - spacing_m: grid spacing in metres
+    """
+    min_lon, min_lat, max_lon, max_lat = bounds
+    metres_per_degree = math.radians(1.0) * EARTH_RADIUS_M
+    lat_step = spacing_m / metres_per_degree
+    lon_step = lat_step / math.cos(math.radians((min_lat + max_lat) / 2))
+    lon, lat = np.meshgrid(np.arange(min_lon, max_lon + lon_step / 2, lon_step),
+                           np.arange(min_lat, max_lat + lat_step / 2, lat_step))
+    return np.column_stack([lon.ravel(), lat.ravel()])
+
+
+def bid_bounds():
+    """(min_lon, min_lat, max_lon, max_lat) of the BID polygons"""
+    return tuple(shapely.total_bounds(load_bid_polygons()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank new Citibike station sites over a grid covering the BID")
+    parser.add_argument("--spacing", type=float, default=50.0, help="grid spacing in metres")
+    parser.add_argument("--capacity", type=float, default=DEFAULT_CAPACITY)
+    parser.add_argument("--impact", type=float, default=DEFAULT_IMPACT)
+    parser.add_argument("--range-m", type=float, default=DEFAULT_RANGE_M)
+    parser.add_argument("--by", choices=RANK_METRICS, default="relief")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    stations = CitibikeStations.load()
+    grid = placement_grid(bid_bounds(), args.spacing)
+    ranked = stations.rank(grid, args.by, args.top, capacity=args.capacity, impact=args.impact, range_m=args.range_m)
+    print(f"{len(grid)} candidate sites, {len(stations)} stations; top {len(ranked)} by {args.by}")
+    print(f"{'lon':>11}{'lat':>11}{'relief':>9}{'generated':>11}{'net':>9}{'affected':>10}")
+    for site in ranked:
+        print(f"{site['lon']:>11.5f}{site['lat']:>11.5f}{site['relief']:>9.1f}{site['generated']:>11.0f}"
+              f"{site['net']:>9.1f}{site['affected']:>10}")
@@ -0,0 +1,407 @@
+"""
+Scripted, incremental replacement for the data-preparation notebooks.
+
+Each stage streams its raw CSV input in fixed-size batches (WKT parsed per
+batch with vectorized shapely), keeps only what the app needs and writes the
+dataset the front end loads:
+
+    bid       NYC_BIDS_09112015.csv           -> lic_bid.json   (LIC Partnership polygons, exploded)
+    trees     Forestry_Tree_Points.csv + bid  -> trees.json     (trees in or beside the BID polygons)
+    parks     Parks_Properties_20241031.csv   -> data/parks/parks.json (park centroids)
+    citibike  *citibike-tripdata*.csv + bid   -> data/bikes/citibike_count.json (ride counts per station)
+
+A stage is skipped when the content hashes of its inputs, its parameters and
+this file are unchanged since its outputs were last written (recorded in
+data/.etl_state.json). Stages whose raw inputs are missing are skipped too.
+Trees are clipped exactly to the BID polygons: a bounding-box test discards
+most of each batch, then an STRtree over the exploded polygons tests the
+rest in one vectorized query. The polygons are blocks and lots, so trees on
+the adjoining sidewalk (within --sidewalk-m, default 10 m) are kept too.
+Every kept tree records the BIDPolygonID of its polygon, the same id that is
+stored on lic_bid.json.
+
+Species colours are derived from a stable hash of the species name, so they
+no longer change between runs the way Python's salted hash() did.
+
+Usage: python data/etl.py [--raw DIR] [--stage NAME ...] [--force]
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import shapely
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(DATA_DIR)
+RAW_DIR = os.path.join(DATA_DIR, "raw")
+STATE_PATH = os.path.join(DATA_DIR, ".etl_state.json")
+
+BID_NAME = "Long Island City Partnership"
+BATCH_ROWS = 50_000
+# The BID polygons are blocks and lots, so street trees stand just outside
+# them; keep trees on the sidewalk up to this far from a polygon
+SIDEWALK_M = 10.0
+EARTH_RADIUS_M = 6371008.8
+
+# stage -> raw input file names (globs) and output paths
+STAGE_INPUTS = {
+    "bid": ("NYC_BIDS_09112015.csv",),
+    "trees": ("Forestry_Tree_Points.csv",),
+    "parks": ("Parks_Properties_20241031.csv",),
+    "citibike": ("*citibike-tripdata*.csv",),
+}
+STAGE_OUTPUTS = {
+    "bid": os.path.join(REPO_DIR, "lic_bid.json"),
+    "trees": os.path.join(REPO_DIR, "trees.json"),
+    "parks": os.path.join(DATA_DIR, "parks", "parks.json"),
+    "citibike": os.path.join(DATA_DIR, "bikes", "citibike_count.json"),
+}
+# Stages that read another stage's output
+STAGE_DEPENDS = {"trees": ("bid",), "citibike": ("bid",)}
+STAGES = ("bid", "trees", "parks", "citibike")
+
+_HASH_CHUNK = 1 << 20
+
+
+def species_color(name):
+    """Deterministic 24-bit RGB colour for a species name"""
+    digest = hashlib.blake2b(name.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % 16777215
+
+
+def file_hash(path, cache):
+    """sha256 of a file, reusing cache entries keyed by (path, mtime, size)"""
+    stat = os.stat(path)
+    key = f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+    if key not in cache:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_CHUNK), b""):
+                digest.update(block)
+        cache[key] = digest.hexdigest()
+    return cache[key]
+
+
+def _is_current(cache_key):
+    """Does a file_hash cache key still match the file on disk?"""
+    path = cache_key.rsplit(":", 2)[0]
+    if not os.path.exists(path):
+        return False
+    stat = os.stat(path)
+    return cache_key == f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def read_batches(path, batch_rows=BATCH_ROWS, required=()):
+    """
+    (header, iterator of row-list batches) for a CSV too large to load at once
+
+    The file stays open until the batches are exhausted. If the header lacks
+    any of the required columns, it is closed and ValueError is raised.
+    """
+    csv.field_size_limit(sys.maxsize)  # WKT multipolygons exceed the default limit
+    f = open(path, newline="", encoding="utf-8-sig")
+    try:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        missing = [name for name in required if name not in header]
+        if missing:
+            raise ValueError(f"{path}: missing column(s) {', '.join(missing)}")
+    except BaseException:
+        f.close()
+        raise
+
+    def batches():
+        with f:
+            while batch := list(itertools.islice(reader, batch_rows)):
+                yield batch
+
+    return header, batches()
+
+
+class FeatureWriter:
+    """
+    Stream GeoJSON features into a FeatureCollection, replacing the target atomically on close
+
+    abort() instead discards what was written and leaves the target as it was.
+    """
+
+    def __init__(self, path, name):
+        self.path = path
+        self.count = 0
+        self._tmp = f"{path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._f = open(self._tmp, "w")
+        self._f.write(f'{{"type": "FeatureCollection", "name": {json.dumps(name)}, "features": [\n')
+
+    def write(self, properties, geometry):
+        if self.count:
+            self._f.write(",\n")
+        self._f.write(json.dumps({"type": "Feature", "properties": properties, "geometry": geometry}))
+        self.count += 1
+
+    def close(self):
+        self._f.write("\n]}\n")
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        self._f.close()
+        os.remove(self._tmp)
+
+
+def load_bid_polygons(path=STAGE_OUTPUTS["bid"]):
+    """Shapely polygons of the exploded BID output"""
+    with open(path) as f:
+        features = json.load(f)["features"]
+    return np.array([shapely.geometry.shape(feature["geometry"]) for feature in features], dtype=object)
+
+
+class PolygonClipper:
+    """
+    Assigns points to the BID polygon containing them or within max_distance_m of it
+
+    The polygons are projected to local metres around their centre and
+    indexed in an STRtree (which prepares each geometry), so a whole batch
+    of points is matched in one vectorized query.
+
+    Parameters:
+    - polygons: array of shapely lon/lat polygons
+    - max_distance_m: tolerance around each polygon, 0 for strict containment
+    """
+
+    def __init__(self, polygons, max_distance_m=0.0):
+        self.max_distance_m = float(max_distance_m)
+        min_x, min_y, max_x, max_y = shapely.total_bounds(polygons)
+        self._origin = np.array([(min_x + max_x) / 2, (min_y + max_y) / 2])
+        self._scale = np.radians(1.0) * EARTH_RADIUS_M * np.array([np.cos(np.radians(self._origin[1])), 1.0])
+        self.polygons = shapely.transform(polygons, self._project)
+        self.tree = shapely.STRtree(self.polygons)
+
+    def _project(self, coords):
+        return (coords - self._origin) * self._scale
+
+    def pairs_within(self, x, y, distance_m):
+        """(point index, polygon index, distance in metres) of every point-polygon pair within distance_m"""
+        points = shapely.points(self._project(np.column_stack([x, y])))
+        if distance_m > 0:
+            point_index, polygon_index = self.tree.query(points, predicate="dwithin", distance=distance_m)
+        else:
+            point_index, polygon_index = self.tree.query(points, predicate="intersects")
+        return point_index, polygon_index, shapely.distance(points[point_index], self.polygons[polygon_index])
+
+    def ids(self, x, y):
+        """
+        Index of the polygon each point belongs to, -1 if none
+
+        A point inside (or on the edge of) several polygons, or within the
+        tolerance of several, gets the nearest one, ties going to the lowest
+        index.
+        """
+        point_index, polygon_index, distance = self.pairs_within(x, y, self.max_distance_m)
+        # Sort matches by point, then distance, then polygon; keep each point's first
+        order = np.lexsort((polygon_index, distance, point_index))
+        point_index, polygon_index = point_index[order], polygon_index[order]
+        first = np.ones(len(point_index), dtype=bool)
+        first[1:] = point_index[1:] != point_index[:-1]
+        ids = np.full(len(x), -1, dtype=np.int32)
+        ids[point_index[first]] = polygon_index[first]
+        return ids
+
+
+def run_bid(inputs, output, batch_rows):
+    header, batches = read_batches(inputs[0], batch_rows, required=("the_geom", "F_ALL_BI_2"))
+    geom_col, name_col = header.index("the_geom"), header.index("F_ALL_BI_2")
+    writer = FeatureWriter(output, "exploded_lic_data")
+    for batch in batches:
+        rows = [row for row in batch if row[name_col] == BID_NAME]
+        if not rows:
+            continue
+        geometries = shapely.from_wkt([row[geom_col] for row in rows], on_invalid="ignore")
+        for row, geometry in zip(rows, geometries):
+            if geometry is None:
+                continue
+            properties = {key: value for key, value in zip(header, row) if key != "the_geom"}
+            # explode(): one feature per polygon part
+            for part in shapely.get_parts(geometry):
+                writer.write({**properties, "BIDPolygonID": writer.count}, shapely.geometry.mapping(part))
+    writer.close()
+    return writer.count
+
+
+def _points(wkt_values):
+    """(x, y, valid mask) of a batch of POINT WKT strings"""
+    geometries = shapely.from_wkt(wkt_values, on_invalid="ignore")
+    valid = shapely.get_type_id(geometries) == shapely.GeometryType.POINT
+    valid &= ~shapely.is_empty(geometries)
+    x = np.full(len(geometries), np.nan)
+    y = np.full(len(geometries), np.nan)
+    x[valid], y[valid] = shapely.get_x(geometries[valid]), shapely.get_y(geometries[valid])
+    return x, y, valid
+
+
+def run_trees(inputs, output, batch_rows, sidewalk_m=SIDEWALK_M):
+    polygons = load_bid_polygons()
+    clipper = PolygonClipper(polygons, sidewalk_m)
+    # Bounding box of the polygons grown by the sidewalk tolerance
+    margin = sidewalk_m / (np.radians(1.0) * EARTH_RADIUS_M)
+    min_x, min_y, max_x, max_y = shapely.total_bounds(polygons)
+    min_x -= margin / np.cos(np.radians(min_y))
+    max_x += margin / np.cos(np.radians(min_y))
+    min_y, max_y = min_y - margin, max_y + margin
+    header, batches = read_batches(inputs[0], batch_rows, required=("Location", "GenusSpecies"))
+    location_col = header.index("Location")
+    species_col = header.index("GenusSpecies")
+    keep_cols = [i for i, key in enumerate(header) if key != "Location"]
+
+    species_ids = {}
+    writer = FeatureWriter(output, "trees_within_bid")
+    for batch in batches:
+        x, y, valid = _points(np.array([row[location_col] for row in batch], dtype=object))
+        candidates = np.flatnonzero(valid & (x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y))
+        ids = clipper.ids(x[candidates], y[candidates])
+        for i, polygon_id in zip(candidates.tolist(), ids.tolist()):
+            if polygon_id < 0:
+                continue
+            row = batch[i]
+            species = row[species_col]
+            properties = {header[c]: row[c] for c in keep_cols}
+            properties["GenusSpeciesID"] = species_ids.setdefault(species, len(species_ids))
+            properties["color"] = species_color(species)
+            properties["BIDPolygonID"] = polygon_id
+            writer.write(properties, {"type": "Point", "coordinates": [float(x[i]), float(y[i])]})
+    writer.close()
+    return writer.count
+
+
+def run_parks(inputs, output, batch_rows):
+    header, batches = read_batches(inputs[0], batch_rows, required=("multipolygon", "EAPPLY"))
+    geom_col, name_col = header.index("multipolygon"), header.index("EAPPLY")
+    writer = FeatureWriter(output, "parks")
+    for batch in batches:
+        geometries = shapely.from_wkt([row[geom_col] for row in batch], on_invalid="ignore")
+        centroids = shapely.centroid(geometries)
+        valid = ~shapely.is_missing(centroids) & ~shapely.is_empty(centroids)
+        for i in np.flatnonzero(valid):
+            point = centroids[i]
+            writer.write({"park_name": batch[i][name_col]},
+                         {"type": "Point", "coordinates": [point.x, point.y]})
+    writer.close()
+    return writer.count
+
+
+def run_citibike(inputs, output, batch_rows):
+    """Start/end ride counts for stations inside the BID bounding box, over every trip file"""
+    min_x, min_y, max_x, max_y = shapely.total_bounds(load_bid_polygons())
+    starts, ends, positions = {}, {}, {}
+    for path in inputs:
+        required = [f"{end}_{field}" for end in ("start", "end") for field in ("station_name", "lat", "lng")]
+        header, batches = read_batches(path, batch_rows, required)
+        for batch in batches:
+            for end, counts in (("start", starts), ("end", ends)):
+                name_col = header.index(f"{end}_station_name")
+                lat_col, lng_col = header.index(f"{end}_lat"), header.index(f"{end}_lng")
+                names = np.array([row[name_col] for row in batch], dtype=object)
+                lat = np.array([row[lat_col] or "nan" for row in batch], dtype=np.float64)
+                lng = np.array([row[lng_col] or "nan" for row in batch], dtype=np.float64)
+                inside = (names != "") & (lng >= min_x) & (lng <= max_x) & (lat >= min_y) & (lat <= max_y)
+                names, lat, lng = names[inside], lat[inside], lng[inside]
+                stations, first, batch_counts = np.unique(names, return_index=True, return_counts=True)
+                for station, i, n in zip(stations.tolist(), first.tolist(), batch_counts.tolist()):
+                    counts[station] = counts.get(station, 0) + n
+                    positions.setdefault(station, (lat[i], lng[i]))
+
+    stations = [
+        {
+            "station_name": name,
+            "start_count": float(starts.get(name, 0)),
+            "end_count": float(ends.get(name, 0)),
+            "total_count": float(starts.get(name, 0) + ends.get(name, 0)),
+            "lat": float(lat),
+            "lon": float(lng),
+        }
+        for name, (lat, lng) in sorted(positions.items())
+    ]
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(f"{output}.tmp", "w") as f:
+        json.dump(stations, f, indent=2)
+    os.replace(f"{output}.tmp", output)
+    return len(stations)
+
+
+STAGE_RUNNERS = {"bid": run_bid, "trees": run_trees, "parks": run_parks, "citibike": run_citibike}
+
+
+def _resolve_inputs(stage, raw_dir):
+    paths = []
+    for pattern in STAGE_INPUTS[stage]:
+        matches = sorted(glob.glob(os.path.join(raw_dir, pattern)))
+        if not matches:
+            return None
+        paths.extend(matches)
+    return paths
+
+
+def run(stages=STAGES, raw_dir=RAW_DIR, force=False, batch_rows=BATCH_ROWS, state_path=STATE_PATH,
+        sidewalk_m=SIDEWALK_M):
+    """Run the requested stages in order; returns {stage: "ran" | "skipped" | "missing input"}"""
+    stage_params = {"trees": {"sidewalk_m": sidewalk_m}}
+    state = {"hashes": {}, "stages": {}}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+    hash_cache = state["hashes"]
+    code_hash = file_hash(os.path.abspath(__file__), hash_cache)
+
+    results = {}
+    for stage in STAGES:
+        if stage not in stages:
+            continue
+        inputs = _resolve_inputs(stage, raw_dir)
+        if inputs is None:
+            print(f"{stage:<9} missing input {', '.join(STAGE_INPUTS[stage])} in {raw_dir}")
+            results[stage] = "missing input"
+            continue
+        output = STAGE_OUTPUTS[stage]
+        upstream = [STAGE_OUTPUTS[dep] for dep in STAGE_DEPENDS.get(stage, ())]
+        key = hashlib.sha256(json.dumps({
+            "code": code_hash,
+            "batch_rows": batch_rows,
+            "params": stage_params.get(stage, {}),
+            "inputs": [file_hash(path, hash_cache) for path in inputs + upstream],
+        }).encode()).hexdigest()
+
+        if not force and state["stages"].get(stage) == key and os.path.exists(output):
+            print(f"{stage:<9} up to date")
+            results[stage] = "skipped"
+            continue
+
+        start = time.perf_counter()
+        count = STAGE_RUNNERS[stage](inputs, output, batch_rows, **stage_params.get(stage, {}))
+        print(f"{stage:<9} wrote {count:,} records to {os.path.relpath(output, REPO_DIR)} "
+              f"in {time.perf_counter() - start:.1f} s")
+        state["stages"][stage] = key
+        results[stage] = "ran"
+
+    state["hashes"] = {key: value for key, value in hash_cache.items() if _is_current(key)}
+    with open(state_path, "w") as f:
+        json.dump(state, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the app datasets from the raw NYC Open Data CSVs")
+    parser.add_argument("--raw", default=RAW_DIR, help="directory holding the raw CSVs (default: data/raw)")
+    parser.add_argument("--stage", nargs="+", choices=STAGES, default=list(STAGES), help="stages to run")
+    parser.add_argument("--force", action="store_true", help="rerun stages even if their inputs are unchanged")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS, help="CSV rows per batch")
+    parser.add_argument("--sidewalk-m", type=float, default=SIDEWALK_M,
+                        help="keep trees up to this far outside a BID polygon (0: strictly inside)")
+    args = parser.parse_args()
+    run(args.stage, args.raw, args.force, args.batch_rows, sidewalk_m=args.sidewalk_m)
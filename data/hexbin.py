@@ -0,0 +1,255 @@
+"""
+Server-side hexagon aggregation for the map's HexagonLayer.
+
+Bins the tree points (and Citibike ride counts) into pointy-top hexagons with
+vectorized NumPy. The base binning for each hexagon radius is computed once
+and cached; the QR marker's "impact" is then applied per frame as an
+incremental reweight of the one cell under the marker, the same thing the
+front end does today by appending {position: QRPosition, weight: qrWeight}
+to the layer data and re-aggregating every point.
+
+Results are compact columnar arrays (float32 cell centres and weights) that
+deck.gl can draw directly with a ColumnLayer and binary attributes.
+
+Run as a script to serve the bins over HTTP:
+
+    python data/hexbin.py --port 8002
+    curl "localhost:8002/hexbins?layer=trees&radius=50&qr=-73.9356,40.743&weight=5"
+    curl "localhost:8002/hexbins?layer=citibike&radius=30&format=bin" -o bins.bin
+"""
+import argparse
+import functools
+import json
+import math
+import os
+import struct
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from tree_index import EARTH_RADIUS_M, REPO_DIR, TREES_PATH, load_tree_features
+
+CITIBIKE_COUNT_PATH = os.path.join(REPO_DIR, "data", "bikes", "citibike_count.json")
+
+# Projection origin shared by every layer so their hexagons line up; the
+# map's initial view centre from js/config.js
+ORIGIN_LON, ORIGIN_LAT = -73.93561, 40.743
+
+DEFAULT_RADIUS_M = 50  # HexagonLayer radius used by the tree layer
+MAX_CACHED_RADII = 8  # base binnings kept per layer
+
+_SQRT3 = math.sqrt(3)
+_KEY_OFFSET = 1 << 20  # axial coordinates fit comfortably in +-2^20 cells
+
+
+_SCALE_X = math.radians(1.0) * EARTH_RADIUS_M * math.cos(math.radians(ORIGIN_LAT))
+_SCALE_Y = math.radians(1.0) * EARTH_RADIUS_M
+
+
+def project(lonlat):
+    """Local planar metres around ORIGIN of (..., 2) lon/lat"""
+    return (np.asarray(lonlat, dtype=np.float64) - (ORIGIN_LON, ORIGIN_LAT)) * (_SCALE_X, _SCALE_Y)
+
+
+def unproject(xy):
+    """Inverse of project()"""
+    return np.asarray(xy, dtype=np.float64) / (_SCALE_X, _SCALE_Y) + (ORIGIN_LON, ORIGIN_LAT)
+
+
+def hex_cells(xy, radius):
+    """Axial (q, r) integer coordinates of the pointy-top hexagon containing each point"""
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    q = (_SQRT3 / 3 * xy[:, 0] - xy[:, 1] / 3) / radius
+    r = (2 / 3 * xy[:, 1]) / radius
+    s = -q - r
+
+    # Cube rounding: round all three, then fix the one with the largest error
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def _hex_cell_of_point(lon, lat, radius):
+    # Scalar fast path of project() + hex_cells(); the per-frame reweight bins
+    # a single point, where NumPy call overhead would dominate
+    x, y = (lon - ORIGIN_LON) * _SCALE_X, (lat - ORIGIN_LAT) * _SCALE_Y
+    q = (_SQRT3 / 3 * x - y / 3) / radius
+    r = (2 / 3 * y) / radius
+    s = -q - r
+    rq, rr, rs = round(q), round(r), round(s)
+    dq, dr, ds = abs(rq - q), abs(rr - r), abs(rs - s)
+    if dq > dr and dq > ds:
+        rq = -rr - rs
+    elif dr > ds:
+        rr = -rq - rs
+    return rq, rr
+
+
+def hex_centers(q, r, radius):
+    """Planar centres of axial hexagon coordinates"""
+    x = radius * _SQRT3 * (q + r / 2)
+    y = radius * 1.5 * r
+    return np.column_stack([x, y])
+
+
+def _cell_keys(q, r):
+    return (q + _KEY_OFFSET) * (2 * _KEY_OFFSET) + (r + _KEY_OFFSET)
+
+
+class HexBins(NamedTuple):
+    radius: float
+    keys: np.ndarray       # int64 (M,), sorted
+    positions: np.ndarray  # float32 (M, 2) lon/lat cell centres
+    weights: np.ndarray    # float32 (M,) summed point weights
+    counts: np.ndarray     # int32 (M,) points per cell
+
+    def to_json(self):
+        return {
+            "radius": self.radius,
+            "positions": self.positions.ravel().tolist(),
+            "weights": self.weights.tolist(),
+            "counts": self.counts.tolist(),
+        }
+
+    def to_bytes(self):
+        """uint32 cell count, float32 radius, then float32 positions (2M), float32 weights (M), int32 counts (M)"""
+        header = struct.pack("<If", len(self.keys), self.radius)
+        return header + self.positions.tobytes() + self.weights.tobytes() + self.counts.tobytes()
+
+
+class HexAggregator:
+    """Hex binning of one point layer, cached per radius (the MAX_CACHED_RADII most recent)"""
+
+    def __init__(self, lonlat, weights=None):
+        self.lonlat = np.asarray(lonlat, dtype=np.float64).reshape(-1, 2)
+        self.xy = project(self.lonlat)
+        self.weights = np.ones(len(self.xy)) if weights is None else np.asarray(weights, dtype=np.float64)
+        # Radii come from client queries, so the cache is bounded
+        self._binned = functools.lru_cache(maxsize=MAX_CACHED_RADII)(self._bin)
+
+    def base(self, radius=DEFAULT_RADIUS_M):
+        """Hex bins of the layer's own points (computed once per radius)"""
+        radius = float(radius)
+        if not math.isfinite(radius) or radius <= 0:
+            raise ValueError(f"radius must be a positive number of metres, got {radius}")
+        return self._binned(radius)
+
+    def _bin(self, radius):
+        q, r = hex_cells(self.xy, radius)
+        keys, inverse = np.unique(_cell_keys(q, r), return_inverse=True)
+        cell_q = keys // (2 * _KEY_OFFSET) - _KEY_OFFSET
+        cell_r = keys % (2 * _KEY_OFFSET) - _KEY_OFFSET
+        return HexBins(
+            radius,
+            keys,
+            unproject(hex_centers(cell_q, cell_r, radius)).astype(np.float32),
+            np.bincount(inverse, weights=self.weights, minlength=len(keys)).astype(np.float32),
+            np.bincount(inverse, minlength=len(keys)).astype(np.int32),
+        )
+
+    def with_impact(self, lon, lat, weight, radius=DEFAULT_RADIUS_M):
+        """
+        Base bins plus `weight` added to the cell under (lon, lat)
+
+        Equivalent to re-aggregating the layer with one extra point of the given
+        weight, but costs one binary search and a copy of the weight column.
+        """
+        if not all(math.isfinite(value) for value in (lon, lat, weight)):
+            raise ValueError("marker position and weight must be finite")
+        bins = self.base(radius)
+        radius = bins.radius
+        q, r = _hex_cell_of_point(lon, lat, radius)
+        key = _cell_keys(q, r)
+        i = int(bins.keys.searchsorted(key))
+
+        if i < len(bins.keys) and bins.keys[i] == key:
+            weights = bins.weights.copy()
+            weights[i] += weight
+            counts = bins.counts.copy()
+            counts[i] += 1
+            return bins._replace(weights=weights, counts=counts)
+
+        # Marker on an empty cell: splice a new cell in, keeping keys sorted
+        x, y = radius * _SQRT3 * (q + r / 2), radius * 1.5 * r
+        center = np.array([[x / _SCALE_X + ORIGIN_LON, y / _SCALE_Y + ORIGIN_LAT]], dtype=np.float32)
+        return HexBins(
+            bins.radius,
+            _splice(bins.keys, i, key),
+            np.concatenate((bins.positions[:i], center, bins.positions[i:])),
+            _splice(bins.weights, i, weight),
+            _splice(bins.counts, i, 1),
+        )
+
+
+def _splice(array, i, value):
+    # np.insert without its argument-normalization overhead
+    return np.concatenate((array[:i], np.array([value], dtype=array.dtype), array[i:]))
+
+
+def load_citibike_counts(path=CITIBIKE_COUNT_PATH):
+    """(lonlat array, total ride counts) for the Citibike stations"""
+    with open(path) as f:
+        stations = json.load(f)
+    lonlat = np.array([[s["lon"], s["lat"]] for s in stations], dtype=np.float64).reshape(-1, 2)
+    return lonlat, np.array([s["total_count"] for s in stations], dtype=np.float64)
+
+
+def load_layers():
+    """HexAggregators for every layer the map aggregates"""
+    return {
+        "trees": HexAggregator(load_tree_features(TREES_PATH)[0]),
+        "citibike": HexAggregator(*load_citibike_counts()),
+    }
+
+
+def make_handler(layers):
+    """HTTP handler class serving /hexbins for the given {name: HexAggregator}"""
+
+    class HexbinHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/hexbins":
+                self.send_error(404)
+                return
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            try:
+                aggregator = layers[params.get("layer", "trees")]
+                radius = float(params.get("radius", DEFAULT_RADIUS_M))
+                if "qr" in params:
+                    lon, lat = map(float, params["qr"].split(","))
+                    bins = aggregator.with_impact(lon, lat, float(params.get("weight", 1)), radius)
+                else:
+                    bins = aggregator.base(radius)
+            except (KeyError, ValueError) as e:
+                self.send_error(400, f"Bad query: {e}")
+                return
+
+            if params.get("format") == "bin":
+                body, content_type = bins.to_bytes(), "application/octet-stream"
+            else:
+                body, content_type = json.dumps(bins.to_json()).encode(), "application/json"
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(body)
+
+    return HexbinHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve hexagon-binned tree and Citibike layers")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8002)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(load_layers()))
+    print(f"Serving hex bins on http://{args.host}:{args.port}/hexbins")
+    server.serve_forever()
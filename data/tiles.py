@@ -0,0 +1,554 @@
+"""
+Vector tiles for the tree and BID layers, with an LRU disk cache.
+
+Cuts trees.json (points) and lic_bid.json (polygons) into a web-mercator
+zoom pyramid of Mapbox Vector Tiles (MVT 2.1, encoded here without extra
+dependencies), so the map fetches only the tiles in view with deck.gl's
+MVTLayer instead of loading every feature up front.
+
+- Points are kept in Morton (quadkey) order, so the points of any tile are
+  one contiguous range found by binary search. Below FULL_DETAIL_ZOOM they
+  are thinned to one point per THIN_CELL_PX pixel cell (the largest DBH
+  wins), and the kept point's point_count says how many it stands for.
+- Polygons are simplified to TOLERANCE_PX pixels per zoom, clipped to the
+  tile plus a small buffer and found through an STRtree.
+
+Tiles are generated on request and cached under data/.tile_cache/, keyed by
+the content hash of the inputs and this file. The cache is trimmed to
+--cache-mb by evicting the least recently used tiles; a hit refreshes the
+tile's mtime, so recency survives restarts.
+
+    python data/tiles.py --port 8003
+    curl localhost:8003/tiles/16/19302/24629.mvt -o tile.mvt
+    curl localhost:8003/tiles.json
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import struct
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import shapely
+
+from etl import DATA_DIR, STAGE_OUTPUTS, file_hash
+
+TREES_PATH = STAGE_OUTPUTS["trees"]
+BID_PATH = STAGE_OUTPUTS["bid"]
+CACHE_DIR = os.path.join(DATA_DIR, ".tile_cache")
+
+EXTENT = 4096  # tile coordinate units
+TILE_SIZE_PX = 512  # deck.gl and Mapbox GL draw vector tiles at 512 px
+BUFFER = 64  # extent units of polygon overlap past each tile edge
+MIN_ZOOM, MAX_ZOOM = 10, 18
+FULL_DETAIL_ZOOM = 16  # every point from this zoom up
+THIN_CELL_PX = 8  # at most (512 / 8)^2 = 4096 points per thinned tile
+TOLERANCE_PX = 0.5
+DEFAULT_CACHE_MB = 256
+
+_INDEX_BITS = 24  # Morton index resolution; supports zooms up to 24
+
+TREE_PROPERTIES = ("GenusSpecies", "TPCondition", "DBH", "color", "BIDPolygonID")
+BID_PROPERTIES = {"BIDPolygonID": "BIDPolygonID", "F_ALL_BI_2": "name", "Year_Found": "year_founded"}
+
+
+def mercator(lon, lat):
+    """World coordinates in [0, 1), x east and y south, for lon/lat arrays"""
+    lat = np.clip(lat, -85.05112878, 85.05112878)
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(np.radians(lat)) + 1.0 / np.cos(np.radians(lat))) / math.pi) / 2.0
+    return x, y
+
+
+def _spread_bits(v):
+    """Interleave zeros between the low 32 bits of a uint64 array"""
+    v = v & np.uint64(0xFFFFFFFF)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def morton(ix, iy):
+    """Morton (Z-order) codes of integer cell coordinates"""
+    return _spread_bits(np.asarray(ix, dtype=np.uint64)) | (_spread_bits(np.asarray(iy, dtype=np.uint64)) << np.uint64(1))
+
+
+# MVT protobuf encoding ------------------------------------------------------
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _field(number, wire_type):
+    return _varint((number << 3) | wire_type)
+
+
+def _message(number, payload):
+    return _field(number, 2) + _varint(len(payload)) + payload
+
+
+def _packed(number, values):
+    return _message(number, b"".join(_varint(v) for v in values))
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _command(command_id, count):
+    return (command_id & 0x7) | (count << 3)
+
+
+POINT, LINESTRING, POLYGON = 1, 2, 3
+
+
+def _encode_value(value):
+    if isinstance(value, bool):
+        return _field(7, 0) + _varint(int(value))
+    if isinstance(value, (int, np.integer)):
+        value = int(value)
+        return _field(6, 0) + _varint(_zigzag(value)) if value < 0 else _field(5, 0) + _varint(value)
+    if isinstance(value, (float, np.floating)):
+        return _field(3, 1) + struct.pack("<d", float(value))
+    encoded = str(value).encode()
+    return _message(1, encoded)
+
+
+class LayerEncoder:
+    """Accumulates features of one MVT layer, sharing the key and value tables"""
+
+    def __init__(self, name, extent=EXTENT):
+        self.name = name
+        self.extent = extent
+        self.keys, self.values = {}, {}
+        self.features = []
+
+    def _tags(self, properties):
+        tags = []
+        for key, value in properties.items():
+            if value is None or value == "":
+                continue
+            key_index = self.keys.setdefault(key, len(self.keys))
+            value_key = (type(value).__name__, value)
+            value_index = self.values.setdefault(value_key, len(self.values))
+            tags += (key_index, value_index)
+        return tags
+
+    def add(self, geometry_type, commands, properties, feature_id=None):
+        payload = b""
+        if feature_id is not None:
+            payload += _field(1, 0) + _varint(int(feature_id))
+        payload += _packed(2, self._tags(properties))
+        payload += _field(3, 0) + _varint(geometry_type)
+        payload += _packed(4, commands)
+        self.features.append(payload)
+
+    def encode(self):
+        payload = _field(15, 0) + _varint(2) + _message(1, self.name.encode())
+        payload += b"".join(_message(2, feature) for feature in self.features)
+        payload += b"".join(_message(3, key.encode()) for key in self.keys)
+        payload += b"".join(_message(4, _encode_value(value)) for _, value in self.values)
+        payload += _field(5, 0) + _varint(self.extent)
+        return _message(3, payload)
+
+
+def point_commands(x, y):
+    return [_command(1, 1), _zigzag(int(x)), _zigzag(int(y))]
+
+
+def _ring_area(ring):
+    """Signed area in tile coordinates; positive is clockwise on screen (y down)"""
+    x, y = ring[:, 0], ring[:, 1]
+    return float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)) / 2
+
+
+def polygon_commands(polygons):
+    """Commands for one (multi)polygon feature: a list of polygons, each a list of integer rings, exterior first"""
+    commands, cursor = [], (0, 0)
+    rings = [(i == 0, ring) for polygon in polygons for i, ring in enumerate(polygon)]
+    for exterior, ring in rings:
+        area = _ring_area(ring)
+        # Exterior rings clockwise (positive area), holes anticlockwise
+        if (area < 0) if exterior else (area > 0):
+            ring = ring[::-1]
+        commands += [_command(1, 1), _zigzag(int(ring[0, 0]) - cursor[0]), _zigzag(int(ring[0, 1]) - cursor[1])]
+        deltas = np.diff(ring, axis=0)
+        commands.append(_command(2, len(deltas)))
+        for dx, dy in deltas.tolist():
+            commands += (_zigzag(dx), _zigzag(dy))
+        commands.append(_command(7, 1))
+        cursor = (int(ring[-1, 0]), int(ring[-1, 1]))
+    return commands
+
+
+def _quantize_ring(coords, z, x, y):
+    """Integer tile coordinates of a closed world-coordinate ring, without repeats; None if degenerate"""
+    n = 2 ** z
+    ring = np.round(np.column_stack([coords[:, 0] * n - x, coords[:, 1] * n - y]) * EXTENT).astype(np.int64)
+    ring = ring[:-1]  # MVT closes rings itself
+    keep = np.ones(len(ring), dtype=bool)
+    keep[1:] = np.any(ring[1:] != ring[:-1], axis=1)
+    ring = ring[keep]
+    if len(ring) > 1 and (ring[0] == ring[-1]).all():
+        ring = ring[:-1]
+    if len(ring) < 3 or _ring_area(ring) == 0:
+        return None
+    return ring
+
+
+# Layers ----------------------------------------------------------------------
+
+class PointLayer:
+    """
+    Points in Morton order with per-tile thinning
+
+    Parameters:
+    - lonlat: (N, 2) array
+    - properties: list of property dicts
+    - ids: feature ids (or None)
+    - priority: larger is kept first when thinning
+    """
+
+    def __init__(self, lonlat, properties, ids=None, priority=None):
+        lonlat = np.asarray(lonlat, dtype=np.float64).reshape(-1, 2)
+        wx, wy = mercator(lonlat[:, 0], lonlat[:, 1])
+        scale = 2 ** _INDEX_BITS
+        codes = morton(np.clip(wx * scale, 0, scale - 1).astype(np.uint64),
+                       np.clip(wy * scale, 0, scale - 1).astype(np.uint64))
+        order = np.argsort(codes, kind="stable")
+        self.codes = codes[order]
+        self.world = np.column_stack([wx, wy])[order]
+        self.properties = [properties[i] for i in order]
+        self.ids = None if ids is None else np.asarray(ids)[order]
+        # Rank 0 is kept first; ties go to the earlier input
+        priority = np.zeros(len(order)) if priority is None else np.asarray(priority, dtype=np.float64)
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[np.lexsort((np.arange(len(order)), -priority))] = np.arange(len(order))
+        self.rank = rank[order]
+
+    def tile_range(self, z, x, y):
+        """Slice of the points inside a tile"""
+        shift = np.uint64(2 * (_INDEX_BITS - z))
+        prefix = morton(np.uint64(x), np.uint64(y))
+        lo = np.searchsorted(self.codes, prefix << shift, side="left")
+        hi = np.searchsorted(self.codes, (prefix + np.uint64(1)) << shift, side="left")
+        return slice(int(lo), int(hi))
+
+    def encode(self, layer, z, x, y):
+        rows = self.tile_range(z, x, y)
+        if rows.stop == rows.start:
+            return 0
+        n = 2 ** z
+        local = np.floor((self.world[rows] * n - (x, y)) * EXTENT).astype(np.int64)
+        local = np.clip(local, 0, EXTENT - 1)
+        indices = np.arange(rows.start, rows.stop)
+        counts = None
+        if z < FULL_DETAIL_ZOOM:
+            cell = THIN_CELL_PX * EXTENT // TILE_SIZE_PX
+            cells = (local[:, 0] // cell) * (EXTENT // cell + 1) + local[:, 1] // cell
+            by_rank = np.argsort(self.rank[rows], kind="stable")
+            _, first, counts = np.unique(cells[by_rank], return_index=True, return_counts=True)
+            kept = np.sort(by_rank[first])
+            counts = dict(zip(by_rank[first].tolist(), counts.tolist()))
+            indices, local = indices[kept], local[kept]
+            counts = [counts[k] for k in kept.tolist()]
+        for i, (index, (px, py)) in enumerate(zip(indices.tolist(), local.tolist())):
+            properties = self.properties[index]
+            if counts is not None:
+                properties = {**properties, "point_count": counts[i]}
+            layer.add(POINT, point_commands(px, py), properties, None if self.ids is None else self.ids[index])
+        return len(indices)
+
+
+class PolygonLayer:
+    """
+    Polygons simplified per zoom and clipped to tiles
+
+    Parameters:
+    - polygons: array of shapely lon/lat polygons
+    - properties: list of property dicts
+    - ids: feature ids (or None)
+    """
+
+    def __init__(self, polygons, properties, ids=None):
+        self.world = shapely.transform(np.asarray(polygons, dtype=object), lambda c: np.column_stack(mercator(*c.T)))
+        self.properties = properties
+        self.ids = ids
+        self.tree = shapely.STRtree(self.world)
+        self._simplified = {}
+        self._lock = threading.Lock()
+
+    def simplified(self, z):
+        with self._lock:
+            if z not in self._simplified:
+                tolerance = TOLERANCE_PX / (TILE_SIZE_PX * 2 ** z)
+                self._simplified[z] = shapely.simplify(self.world, tolerance, preserve_topology=True)
+            return self._simplified[z]
+
+    def encode(self, layer, z, x, y):
+        n = 2 ** z
+        pad = BUFFER / EXTENT
+        box = ((x - pad) / n, (y - pad) / n, (x + 1 + pad) / n, (y + 1 + pad) / n)
+        candidates = self.tree.query(shapely.box(*box), predicate="intersects")
+        if not len(candidates):
+            return 0
+        clipped = shapely.clip_by_rect(self.simplified(z)[candidates], *box)
+        written = 0
+        for index, geometry in zip(candidates.tolist(), clipped):
+            polygons = []
+            for polygon in shapely.get_parts(geometry):
+                if not isinstance(polygon, shapely.Polygon):
+                    continue  # clipping can leave slivers as lines or points
+                rings = [_quantize_ring(np.asarray(polygon.exterior.coords), z, x, y)]
+                if rings[0] is None:
+                    continue
+                rings += [r for r in (_quantize_ring(np.asarray(i.coords), z, x, y) for i in polygon.interiors)
+                          if r is not None]
+                polygons.append(rings)
+            if polygons:
+                layer.add(POLYGON, polygon_commands(polygons), self.properties[index],
+                          None if self.ids is None else self.ids[index])
+                written += 1
+        return written
+
+
+def _dbh(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def load_layers(trees_path=TREES_PATH, bid_path=BID_PATH):
+    """{"trees": PointLayer, "bid": PolygonLayer} from the app datasets"""
+    with open(trees_path) as f:
+        trees = [t for t in json.load(f)["features"] if t.get("geometry")]
+    tree_properties = [{key: t["properties"].get(key) for key in TREE_PROPERTIES} for t in trees]
+    for p in tree_properties:
+        p["DBH"] = _dbh(p["DBH"])
+    layers = {"trees": PointLayer(
+        [t["geometry"]["coordinates"][:2] for t in trees], tree_properties,
+        ids=[int(t["properties"]["OBJECTID"]) for t in trees],
+        priority=[p["DBH"] or 0 for p in tree_properties],
+    )}
+
+    with open(bid_path) as f:
+        bids = json.load(f)["features"]
+    layers["bid"] = PolygonLayer(
+        np.array([shapely.geometry.shape(b["geometry"]) for b in bids], dtype=object),
+        [{name: b["properties"].get(key) for key, name in BID_PROPERTIES.items()} for b in bids],
+        ids=[int(b["properties"].get("BIDPolygonID", i)) for i, b in enumerate(bids)],
+    )
+    return layers
+
+
+def render_tile(layers, z, x, y):
+    """MVT bytes of one tile holding every layer with features in it (b"" if none)"""
+    encoded = b""
+    for name, source in layers.items():
+        layer = LayerEncoder(name)
+        if source.encode(layer, z, x, y):
+            encoded += layer.encode()
+    return encoded
+
+
+# Cache and server --------------------------------------------------------------
+
+class TileCache:
+    """
+    Tiles on disk with least-recently-used eviction by total size
+
+    Parameters:
+    - root: cache directory
+    - max_bytes: size budget; the oldest tiles are deleted past it
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # relative path -> size, oldest first
+        found = []
+        for directory, _, names in os.walk(root):
+            for name in names:
+                if name.endswith(".mvt"):
+                    path = os.path.join(directory, name)
+                    stat = os.stat(path)
+                    found.append((stat.st_mtime_ns, os.path.relpath(path, root), stat.st_size))
+        for _, relative, size in sorted(found):
+            self._entries[relative] = size
+        self.bytes = sum(self._entries.values())
+        self._evict()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        path = os.path.join(self.root, key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.bytes -= self._entries.pop(key, 0)
+            return None
+        return data
+
+    def put(self, key, data):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self.bytes += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.root, key))
+            except FileNotFoundError:
+                pass
+
+
+class TileServer:
+    """
+    Tiles rendered on demand through a TileCache
+
+    Parameters:
+    - layers: as returned by load_layers
+    - cache: TileCache, or None to render every request
+    - version: cache namespace; defaults to a hash of sources and this file
+    - sources: files the layers were loaded from, e.g. the paths given to load_layers
+    """
+
+    def __init__(self, layers, cache=None, version=None, sources=(TREES_PATH, BID_PATH)):
+        self.layers = layers
+        self.cache = cache
+        if version is None:
+            hashes = {}
+            digest = hashlib.sha256()
+            for path in (*sources, os.path.abspath(__file__)):
+                digest.update(file_hash(path, hashes).encode())
+            version = digest.hexdigest()[:16]
+        self.version = version
+
+    def tile(self, z, x, y):
+        if not (MIN_ZOOM <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            raise ValueError(f"Tile {z}/{x}/{y} is outside zooms {MIN_ZOOM}-{MAX_ZOOM}")
+        key = f"{self.version}/{z}/{x}/{y}.mvt"
+        if self.cache is not None:
+            data = self.cache.get(key)
+            if data is not None:
+                return data
+        data = render_tile(self.layers, z, x, y)
+        if self.cache is not None:
+            self.cache.put(key, data)
+        return data
+
+    def tilejson(self, url):
+        west, south = np.inf, np.inf
+        east, north = -np.inf, -np.inf
+        for name in ("trees", "bid"):
+            world = self.layers[name].world
+            if name == "bid":
+                world = shapely.total_bounds(world).reshape(2, 2)
+            else:
+                world = np.vstack([world.min(axis=0), world.max(axis=0)])
+            lon = world[:, 0] * 360.0 - 180.0
+            lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * world[:, 1]))))
+            west, east = min(west, lon.min()), max(east, lon.max())
+            south, north = min(south, lat.min()), max(north, lat.max())
+        return {
+            "tilejson": "3.0.0",
+            "tiles": [url],
+            "minzoom": MIN_ZOOM,
+            "maxzoom": MAX_ZOOM,
+            "bounds": [west, south, east, north],
+            "vector_layers": [
+                {"id": "trees", "fields": {**{key: "" for key in TREE_PROPERTIES}, "point_count": "Number"}},
+                {"id": "bid", "fields": {name: "" for name in BID_PROPERTIES.values()}},
+            ],
+        }
+
+
+_TILE_PATH = re.compile(r"^/tiles/(\d+)/(\d+)/(\d+)\.mvt$")
+
+
+def make_handler(server):
+    """HTTP handler class serving /tiles/{z}/{x}/{y}.mvt and /tiles.json for a TileServer"""
+
+    class TileHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/tiles.json":
+                url = f"http://{self.headers.get('Host', 'localhost')}/tiles/{{z}}/{{x}}/{{y}}.mvt"
+                self._send(json.dumps(server.tilejson(url)).encode(), "application/json", "no-cache")
+                return
+            match = _TILE_PATH.match(path)
+            if not match:
+                self.send_error(404)
+                return
+            try:
+                body = server.tile(*map(int, match.groups()))
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+            # The URL changes with the data only through the cache namespace, so keep it short
+            self._send(body, "application/vnd.mapbox-vector-tile", "public, max-age=300")
+
+        def _send(self, body, content_type, cache_control):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", cache_control)
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return TileHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the tree and BID layers as vector tiles")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8003)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_MB, help="disk cache budget")
+    parser.add_argument("--trees", default=TREES_PATH, help="tree point GeoJSON")
+    parser.add_argument("--bid", default=BID_PATH, help="BID polygon GeoJSON")
+    args = parser.parse_args()
+
+    cache = TileCache(args.cache_dir, int(args.cache_mb * 1024 * 1024))
+    tile_server = TileServer(load_layers(args.trees, args.bid), cache, sources=(args.trees, args.bid))
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(tile_server))
+    print(f"Serving vector tiles on http://{args.host}:{args.port}/tiles/{{z}}/{{x}}/{{y}}.mvt")
+    server.serve_forever()
@@ -0,0 +1,271 @@
+"""
+Spatial index over the tree points in trees.json.
+
+Loads the GeoJSON once into a packed (N, 2) coordinate array and buckets the
+points into a uniform grid (CSR layout: points sorted by cell, plus a start
+offset per cell), so bounding-box, radius and k-nearest queries only touch
+the handful of cells around the query instead of scanning every tree.
+
+Distances use a local equirectangular projection around the data's centre,
+which is accurate to well under a metre at BID scale.
+
+Below SCAN_MAX_POINTS points (the LIC extract has ~1,300) the fixed cost of
+walking the grid exceeds that of testing every point, so small indexes scan
+instead; bench_tree_index.py measures both sides of the threshold.
+
+Run as a script to serve the queries as JSON over HTTP:
+
+    python data/tree_index.py --port 8001
+    curl "localhost:8001/trees/bbox?bbox=-73.945,40.745,-73.940,40.748"
+    curl "localhost:8001/trees/radius?lon=-73.9356&lat=40.743&r=150"
+    curl "localhost:8001/trees/nearest?lon=-73.9356&lat=40.743&k=10"
+"""
+import argparse
+import json
+import math
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TREES_PATH = os.path.join(REPO_DIR, "trees.json")
+
+EARTH_RADIUS_M = 6371008.8
+DEFAULT_CELL_SIZE_M = 50.0
+SCAN_MAX_POINTS = 4096  # at or below this many points, queries scan every point
+
+
+def load_tree_features(path=TREES_PATH):
+    """(lonlat array of shape (N, 2), list of property dicts) from a point GeoJSON"""
+    with open(path) as f:
+        collection = json.load(f)
+    features = [f for f in collection["features"] if f.get("geometry") and f["geometry"]["type"] == "Point"]
+    lonlat = np.array([f["geometry"]["coordinates"][:2] for f in features], dtype=np.float64).reshape(-1, 2)
+    return lonlat, [f["properties"] for f in features]
+
+
+def _check_finite(**values):
+    for name, value in values.items():
+        if not math.isfinite(value):
+            raise ValueError(f"{name} must be finite, got {value!r}")
+
+
+def _check_lonlat(*points):
+    for lon, lat in points:
+        _check_finite(lon=lon, lat=lat)
+        if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+            raise ValueError(f"({lon!r}, {lat!r}) is not a lon/lat coordinate")
+
+
+class TreeIndex:
+    """
+    Uniform-grid index answering bbox, radius and k-nearest queries over points
+
+    Parameters:
+    - lonlat: (N, 2) point coordinates
+    - properties: per-point property dicts for to_feature_collection
+    - cell_size: grid cell size in metres
+    - scan_max_points: scan every point instead of the grid at or below this size
+    """
+
+    def __init__(self, lonlat, properties=None, cell_size=DEFAULT_CELL_SIZE_M, scan_max_points=SCAN_MAX_POINTS):
+        self.lonlat = np.ascontiguousarray(lonlat, dtype=np.float64).reshape(-1, 2)
+        self.properties = properties
+        self.cell_size = float(cell_size)
+        if not (math.isfinite(self.cell_size) and self.cell_size > 0):
+            raise ValueError(f"cell_size must be a positive number of metres, got {cell_size!r}")
+        self.scan = len(self.lonlat) <= scan_max_points
+
+        if len(self.lonlat):
+            lo, hi = self.lonlat.min(axis=0), self.lonlat.max(axis=0)
+            self.origin = (lo + hi) / 2
+        else:
+            self.origin = np.zeros(2)
+        self._scale = np.radians(1.0) * EARTH_RADIUS_M * np.array([np.cos(np.radians(self.origin[1])), 1.0])
+        self.xy = self.project(self.lonlat)
+
+        self.xy_min = self.xy.min(axis=0) if len(self.xy) else np.zeros(2)
+        extent = (self.xy.max(axis=0) - self.xy_min) if len(self.xy) else np.zeros(2)
+        self.nx, self.ny = (np.floor(extent / self.cell_size).astype(int) + 1).tolist()
+
+        cells = self._cell_of(self.xy)
+        cell_ids = cells[:, 1] * self.nx + cells[:, 0]
+        self.order = np.argsort(cell_ids, kind="stable")
+        self.cell_start = np.searchsorted(cell_ids[self.order], np.arange(self.nx * self.ny + 1))
+        # Points in cell order, so candidate gathering reads contiguous memory
+        self._x_sorted = np.ascontiguousarray(self.xy[self.order, 0])
+        self._y_sorted = np.ascontiguousarray(self.xy[self.order, 1])
+
+        # Python floats for the scalar query path
+        self._origin_lon, self._origin_lat = self.origin.tolist()
+        self._scale_x, self._scale_y = self._scale.tolist()
+        self._min_x, self._min_y = self.xy_min.tolist()
+        self._mean_per_cell = max(len(self) / (self.nx * self.ny), 1e-9)
+        self._all = np.arange(len(self), dtype=np.intp)
+
+    @classmethod
+    def from_geojson(cls, path=TREES_PATH, cell_size=DEFAULT_CELL_SIZE_M, scan_max_points=SCAN_MAX_POINTS):
+        lonlat, properties = load_tree_features(path)
+        return cls(lonlat, properties, cell_size, scan_max_points)
+
+    def __len__(self):
+        return len(self.lonlat)
+
+    def project(self, lonlat):
+        """Local planar coordinates in metres of (..., 2) lon/lat"""
+        return (np.asarray(lonlat, dtype=np.float64) - self.origin) * self._scale
+
+    def _cell_of(self, xy):
+        return np.floor((xy - self.xy_min) / self.cell_size).astype(int)
+
+    def _project_point(self, lon, lat):
+        # Scalar fast path of project(); queries are latency bound, not throughput bound
+        return ((lon - self._origin_lon) * self._scale_x, (lat - self._origin_lat) * self._scale_y)
+
+    def _cell_index(self, value, origin, count):
+        # Clamped before flooring, so boxes far beyond the grid (or projected to
+        # +-inf) give -1 / count instead of overflowing int()
+        return math.floor(min(max((value - origin) / self.cell_size, -1.0), float(count)))
+
+    def _candidates(self, x0, y0, x1, y1):
+        """Positions (into the cell-sorted arrays) of points in grid cells overlapping the box"""
+        if self.scan:
+            return self._all
+        cx0 = max(self._cell_index(x0, self._min_x, self.nx), 0)
+        cy0 = max(self._cell_index(y0, self._min_y, self.ny), 0)
+        cx1 = min(self._cell_index(x1, self._min_x, self.nx), self.nx - 1)
+        cy1 = min(self._cell_index(y1, self._min_y, self.ny), self.ny - 1)
+        if cx0 > cx1 or cy0 > cy1:
+            return np.empty(0, dtype=np.intp)
+        # Cells cx0..cx1 of one grid row are contiguous in cell order, so each
+        # row contributes one slice; expand the slices without a Python loop
+        rows = np.arange(cy0 * self.nx, cy1 * self.nx + 1, self.nx)
+        starts = self.cell_start[rows + cx0]
+        lengths = self.cell_start[rows + cx1 + 1] - starts
+        offsets = np.cumsum(lengths) - lengths
+        return np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+    def _coordinates(self, positions):
+        """Projected x, y of candidate positions; the arrays themselves, uncopied, when scanning"""
+        if positions is self._all:
+            return self._x_sorted, self._y_sorted
+        return self._x_sorted[positions], self._y_sorted[positions]
+
+    def bbox(self, min_lon, min_lat, max_lon, max_lat):
+        """Indices of points inside the lon/lat bounding box"""
+        _check_lonlat((min_lon, min_lat), (max_lon, max_lat))
+        x0, y0 = self._project_point(min_lon, min_lat)
+        x1, y1 = self._project_point(max_lon, max_lat)
+        positions = self._candidates(x0, y0, x1, y1)
+        x, y = self._coordinates(positions)
+        inside = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+        return self.order[positions[inside]]
+
+    def _within(self, x, y, radius):
+        positions = self._candidates(x - radius, y - radius, x + radius, y + radius)
+        px, py = self._coordinates(positions)
+        distances = np.hypot(px - x, py - y)
+        keep = distances <= radius
+        return positions[keep], distances[keep]
+
+    def within_radius(self, lon, lat, radius_m):
+        """(indices, distances in metres) of points within radius_m, nearest first"""
+        _check_lonlat((lon, lat))
+        _check_finite(radius_m=radius_m)
+        if radius_m < 0:
+            raise ValueError(f"radius_m must not be negative, got {radius_m!r}")
+        positions, distances = self._within(*self._project_point(lon, lat), radius_m)
+        ranked = np.argsort(distances, kind="stable")
+        return self.order[positions[ranked]], distances[ranked]
+
+    def nearest(self, lon, lat, k=1):
+        """(indices, distances in metres) of the k nearest points, nearest first"""
+        _check_lonlat((lon, lat))
+        k = min(int(k), len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+
+        x, y = self._project_point(lon, lat)
+        if self.scan:
+            positions = self._all
+            distances = np.hypot(self._x_sorted - x, self._y_sorted - y)
+            ranked = np.argpartition(distances, k - 1)[:k] if len(distances) > k else positions
+            ranked = ranked[np.argsort(distances[ranked], kind="stable")]
+            return self.order[ranked], distances[ranked]
+        grid_x1 = self._min_x + self.cell_size * self.nx
+        grid_y1 = self._min_y + self.cell_size * self.ny
+        max_radius = math.hypot(max(abs(x - self._min_x), abs(x - grid_x1)), max(abs(y - self._min_y), abs(y - grid_y1)))
+        # Start with a box expected to hold about k points and double it
+        radius = self.cell_size * max(1.0, math.sqrt(k / self._mean_per_cell) / 2)
+        while True:
+            # Every point within `radius` is a candidate, so once k of them are
+            # found they are the k nearest overall
+            positions, distances = self._within(x, y, radius)
+            if len(positions) >= k or radius >= max_radius:
+                break
+            radius *= 2
+        ranked = np.argpartition(distances, k - 1)[:k] if len(distances) > k else np.arange(len(distances))
+        ranked = ranked[np.argsort(distances[ranked], kind="stable")]
+        return self.order[positions[ranked]], distances[ranked]
+
+    def to_feature_collection(self, indices):
+        """GeoJSON FeatureCollection of the given points, for the map front end"""
+        return {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "properties": self.properties[i] if self.properties is not None else {},
+                    "geometry": {"type": "Point", "coordinates": self.lonlat[i].tolist()},
+                }
+                for i in np.asarray(indices).tolist()
+            ],
+        }
+
+
+def make_handler(index):
+    """HTTP handler class serving bbox/radius/nearest queries against index"""
+
+    class TreeQueryHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            try:
+                if url.path == "/trees/bbox":
+                    indices = index.bbox(*map(float, params["bbox"].split(",")))
+                elif url.path == "/trees/radius":
+                    indices, _ = index.within_radius(float(params["lon"]), float(params["lat"]), float(params["r"]))
+                elif url.path == "/trees/nearest":
+                    indices, _ = index.nearest(float(params["lon"]), float(params["lat"]), int(params.get("k", 1)))
+                else:
+                    self.send_error(404)
+                    return
+            except (KeyError, TypeError, ValueError) as e:
+                self.send_error(400, f"Bad query: {e}")
+                return
+
+            body = json.dumps(index.to_feature_collection(indices)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/geo+json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(body)
+
+    return TreeQueryHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve bbox/radius/nearest tree queries as GeoJSON")
+    parser.add_argument("--trees", default=TREES_PATH, help="tree point GeoJSON (default: trees.json)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--cell-size", type=float, default=DEFAULT_CELL_SIZE_M, help="grid cell size in metres")
+    args = parser.parse_args()
+
+    tree_index = TreeIndex.from_geojson(args.trees, args.cell_size)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(tree_index))
+    print(f"Serving {len(tree_index):,} trees on http://{args.host}:{args.port}/trees/{{bbox,radius,nearest}}")
+    server.serve_forever()
@@ -0,0 +1,228 @@
+"""
+Compact columnar binary format for the tree dataset, with memory-mapped loading.
+
+trees.json spends almost all of its 2.6 MB on repeated property strings
+(GlobalIDs, a WKT copy of the geometry, the full species name per tree). This
+module writes just the columns the map needs:
+
+    coords     float32 (N, 2)  lon/lat offsets from a float64 origin
+    object_id  uint32          OBJECTID
+    dbh        int16           diameter at breast height, -1 when missing
+    species    uint16          code into the species dictionary
+    condition  uint8           code into the condition dictionary
+    structure  uint8           code into the structure dictionary
+
+Storing coordinates as float32 offsets from the dataset origin keeps them
+well under a millimetre of the float64 source, which plain float32 lon/lat
+(~0.6 m at NYC longitudes) would not.
+
+File layout: 8-byte magic, uint32 little-endian header length, a JSON header
+(origin, row count, dictionaries and each column's dtype/shape/offset), then
+the column data, each column aligned to 16 bytes. Readers map the file and
+expose every column as a zero-copy NumPy view.
+
+verify_round_trip() checks a store against its GeoJSON source: coordinates
+within float32 resolution, every attribute exactly. `--check` runs it on a
+fresh export without touching trees.bin.
+
+Usage: python data/tree_store.py [trees.json] [-o trees.bin] [--check]
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TREES_PATH = os.path.join(REPO_DIR, "trees.json")
+STORE_PATH = os.path.join(REPO_DIR, "trees.bin")
+
+MAGIC = b"LICTREE1"
+_ALIGNMENT = 16
+
+# Dictionary-encoded columns: column name -> (GeoJSON property, code dtype)
+DICTIONARY_COLUMNS = {
+    "species": ("GenusSpecies", np.uint16),
+    "condition": ("TPCondition", np.uint8),
+    "structure": ("TPStructure", np.uint8),
+}
+
+MISSING_DBH = -1
+
+
+def _encode_dictionary(values, dtype):
+    """(codes, sorted dictionary) for a list of strings"""
+    dictionary = sorted(set(values))
+    if len(dictionary) > np.iinfo(dtype).max + 1:
+        raise ValueError(f"{len(dictionary)} distinct values do not fit in {np.dtype(dtype).name}")
+    lookup = {value: code for code, value in enumerate(dictionary)}
+    return np.array([lookup[v] for v in values], dtype=dtype), dictionary
+
+
+def columns_from_geojson(path=TREES_PATH):
+    """Read trees.json into (origin, {column: array}, {column: dictionary})"""
+    with open(path) as f:
+        features = [feature for feature in json.load(f)["features"] if feature.get("geometry")]
+
+    lonlat = np.array([feature["geometry"]["coordinates"][:2] for feature in features],
+                      dtype=np.float64).reshape(-1, 2)
+    origin = lonlat.min(axis=0) if len(lonlat) else np.zeros(2)
+    properties = [feature["properties"] for feature in features]
+
+    columns = {
+        "coords": (lonlat - origin).astype(np.float32),
+        "object_id": np.array([int(p["OBJECTID"]) for p in properties], dtype=np.uint32),
+        "dbh": np.array([int(p["DBH"]) if p["DBH"] not in ("", None) else MISSING_DBH for p in properties], dtype=np.int16),
+    }
+    dictionaries = {}
+    for column, (prop, dtype) in DICTIONARY_COLUMNS.items():
+        columns[column], dictionaries[column] = _encode_dictionary([p[prop] or "" for p in properties], dtype)
+    return origin, columns, dictionaries
+
+
+def _align(offset):
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def write_store(origin, columns, dictionaries, path=STORE_PATH, magic=MAGIC):
+    """Write columns in the binary layout described in the module docstring; rows is the first column's length"""
+    layout = {}
+    offset = 0
+    for name, array in columns.items():
+        offset = _align(offset)
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+
+    rows = len(next(iter(columns.values()))) if columns else 0
+    header = json.dumps({
+        "rows": rows,
+        "origin": [float(v) for v in origin],
+        "dictionaries": dictionaries,
+        "columns": layout,
+    }).encode()
+    # Column offsets are relative to the aligned start of the data section
+    data_start = _align(len(magic) + 4 + len(header))
+
+    with open(path, "wb") as f:
+        f.write(magic)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for name, array in columns.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+    return path
+
+
+class TreeStore:
+    """Memory-mapped, read-only view of a tree store file; columns are zero-copy arrays"""
+
+    def __init__(self, path=STORE_PATH, magic=MAGIC):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(magic)] != magic:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a {magic.decode()} store file")
+        (header_len,) = struct.unpack_from("<I", self._mmap, len(magic))
+        header_start = len(magic) + 4
+        header = json.loads(self._mmap[header_start:header_start + header_len])
+        data_start = _align(header_start + header_len)
+
+        self.rows = header["rows"]
+        self.origin = np.array(header["origin"], dtype=np.float64)
+        self.dictionaries = {name: np.array(values, dtype=object) for name, values in header["dictionaries"].items()}
+        self.columns = {}
+        for name, spec in header["columns"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=data_start + spec["offset"])
+            self.columns[name] = array.reshape(spec["shape"])
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def lonlat(self):
+        """float64 (N, 2) lon/lat (materialized; the stored coords are offsets)"""
+        return self.columns["coords"].astype(np.float64) + self.origin
+
+    def decode(self, name, rows=None):
+        """String values of a dictionary-encoded column, optionally only for the given rows"""
+        codes = self.columns[name] if rows is None else self.columns[name][rows]
+        return self.dictionaries[name][codes]
+
+    def close(self):
+        self.columns = {}
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Column arrays handed out earlier still reference the map; it is
+            # released once they are garbage collected
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export(source=TREES_PATH, path=STORE_PATH):
+    """Convert a tree GeoJSON to a store file; returns the output path"""
+    return write_store(*columns_from_geojson(source), path=path)
+
+
+def verify_round_trip(store, source=TREES_PATH):
+    """
+    Assert that a store holds exactly the trees of its GeoJSON source
+
+    Coordinates must match to within the float32 resolution of the stored
+    offsets; OBJECTID, DBH, species, condition and structure must be equal.
+
+    Returns:
+    - largest coordinate error, in degrees
+    """
+    with open(source) as f:
+        features = [feature for feature in json.load(f)["features"] if feature.get("geometry")]
+    assert len(store) == len(features), (len(store), len(features))
+
+    lonlat = np.array([feature["geometry"]["coordinates"][:2] for feature in features],
+                      dtype=np.float64).reshape(-1, 2)
+    offsets = np.abs(store["coords"]).max() if len(store) else np.float32(0)
+    tolerance = float(np.spacing(np.float32(offsets)))  # one float32 step at the largest offset
+    error_deg = float(np.abs(store.lonlat() - lonlat).max()) if len(store) else 0.0
+    assert error_deg <= tolerance, (error_deg, tolerance)
+
+    properties = [feature["properties"] for feature in features]
+    assert store["object_id"].tolist() == [int(p["OBJECTID"]) for p in properties]
+    dbh = [int(p["DBH"]) if p["DBH"] not in ("", None) else MISSING_DBH for p in properties]
+    assert store["dbh"].tolist() == dbh
+    for column, (prop, _) in DICTIONARY_COLUMNS.items():
+        assert store.decode(column).tolist() == [p[prop] or "" for p in properties], column
+    return error_deg
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the tree GeoJSON to the compact binary store format")
+    parser.add_argument("source", nargs="?", default=TREES_PATH, help="tree point GeoJSON (default: trees.json)")
+    parser.add_argument("-o", "--output", default=STORE_PATH, help="output file (default: trees.bin)")
+    parser.add_argument("--check", action="store_true", help="export to a temporary file and verify the round trip")
+    args = parser.parse_args()
+
+    if args.check:
+        with tempfile.TemporaryDirectory() as tmp:
+            with TreeStore(export(args.source, os.path.join(tmp, "trees.bin"))) as store:
+                try:
+                    error_deg = verify_round_trip(store, args.source)
+                except AssertionError as e:
+                    sys.exit(f"round trip FAILED: {e!r}")
+                print(f"round trip OK ({len(store):,} trees, max coordinate error {error_deg:.1e} deg)")
+        sys.exit()
+    export(args.source, args.output)
+    print(f"{args.source}: {os.path.getsize(args.source):,} B -> {args.output}: {os.path.getsize(args.output):,} B")
@@ -25,6 +25,9 @@ let QRRotation = 0;
 let qrWeight = 1; // Add new variable for QR weight
 let showNeighborhoods = true;  // Whether to show neighborhood highlighting
 let showBikeRoutes = true;  // Whether to show bike routes
+const BIKE_ROUTES_ZOOM = INITIAL_VIEW_STATE.zoom; // Preprocessed zoom to load; one of data/bike_routes.py ZOOMS
+let useVectorTiles = false; // Draw trees and BID polygons from the tile server (data/tiles.py) instead of the full JSON
+const VECTOR_TILE_URL = "http://localhost:8003/tiles/{z}/{x}/{y}.mvt";
 let showCitibikeStations = true; // Whether to show Citibike stations
 let showCitibikeHexagons = false;  // For Citibike hexagons
 let showCitibikeCountData = false; // Whether to show Citibike count data as hexagons
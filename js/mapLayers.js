@@ -10,6 +10,7 @@ const {
   LineLayer,
   ScatterplotLayer,
   GeoJsonLayer,
+  MVTLayer,
 } = deck;
 
 // Add the CSV conversion function directly here
@@ -192,7 +193,8 @@ async function loadCitibikeCountData() {
 
 async function updateLayers() {
   if (window.deckOverlay) {
-    const treesData = await loadTreesData();
+    // Vector tiles replace the full files unless the hexagon layer needs every tree
+    const treesData = showHexagonLayer || !useVectorTiles ? await loadTreesData() : [];
     const licBidData = await loadLicBidData();
     const layers = [];
 
@@ -259,7 +261,7 @@ async function updateLayers() {
       );
     } else {
       // layers.push(createScatterplotLayer(treesData));
-      layers.push(createLicBidLayer(licBidData));
+      layers.push(useVectorTiles ? createVectorTileLayer() : createLicBidLayer(licBidData));
     }
 
     // Citibike hexagon layer (independent toggle)
@@ -300,6 +302,29 @@ function createLicBidLayer(licBidData) {
   });
 }
 
+// Trees and BID polygons from data/tiles.py; only the tiles in view are fetched
+function createVectorTileLayer() {
+  return new MVTLayer({
+    id: "vector-tile-layer",
+    data: VECTOR_TILE_URL,
+    minZoom: 10,
+    maxZoom: 18,
+    pickable: true,
+    pointType: "circle",
+    pointRadiusUnits: "pixels",
+    getPointRadius: (f) => (f.properties.point_count > 1 ? 4 : 3),
+    getFillColor: (f) => {
+      if (f.properties.layerName !== "trees") return [140, 170, 180, 100];
+      const color = f.properties.color;
+      return [color >> 16, (color >> 8) & 255, color & 255];
+    },
+    getLineColor: [160, 160, 180],
+    lineWidthMinPixels: 1,
+    // Tree tooltip only; hovering a BID polygon hides it
+    onHover: (info) => updateTooltip(info.object && info.object.properties.layerName === "trees" ? info : { ...info, object: null }),
+  });
+}
+
 function createScatterplotLayer(treesData) {
   return new ScatterplotLayer({
     id: "scatterplot-layer",
@@ -385,8 +410,15 @@ function createNeighborhoodHighlightLayer(licBidData) {
 // Add a new function to load bike route data
 async function loadBikeRoutesData() {
   try {
-    const response = await fetch("data/bikes/bike_routes.csv");
-    const csvText = await response.text();
+    // Preprocessed by data/bike_routes.py; simplified for the initial zoom
+    const response = await fetch(`data/bikes/routes/bike_routes.z${BIKE_ROUTES_ZOOM}.geojson`);
+    if (response.ok) {
+      const geoJson = await response.json();
+      return geoJson.features;
+    }
+    // Fall back to parsing the raw CSV if the preprocessed file is missing
+    const csvResponse = await fetch("data/bikes/bike_routes.csv");
+    const csvText = await csvResponse.text();
     const geoJson = bikeCsvToGeoJson(csvText);
     return geoJson.features;
   } catch (error) {
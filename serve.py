@@ -0,0 +1,375 @@
+"""
+Static server for the map front end, with precompressed files and HTTP caching.
+
+A drop-in replacement for `python -m http.server` that serves the front end
+from memory: only the files and directories listed in SERVED (index.html,
+styles.css, js/, trees.json, lic_bid.json and the data outputs the map
+fetches), never the rest of the repository:
+
+- text and data files are gzip- (and, with the brotli package installed,
+  brotli-) compressed once at startup at the highest level, and the
+  compressed copies are kept in .static_cache/ keyed by content hash, so
+  restarts reuse them; `--build` only fills the cache
+- files over STREAM_BYTES are neither loaded nor compressed; they are
+  streamed from disk, with Range support
+- every response carries a strong ETag (one per encoding), Last-Modified,
+  Vary: Accept-Encoding and a Cache-Control policy: code and pages are
+  revalidated on each load (a 304 costs a few hundred bytes), data files are
+  cached for --max-age seconds
+- single byte ranges (Range / If-Range) are served from the uncompressed file
+- requests are handled on threads over keep-alive HTTP/1.1 connections
+
+Files are re-read and recompressed when their size or mtime changes, so the
+server can stay up while data is rebuilt.
+
+    python serve.py [--port 8000] [--max-age 3600]
+    python serve.py --build
+"""
+import argparse
+import email.utils
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import unquote, urlparse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ROOT, ".static_cache")
+
+COMPRESSIBLE = {".html", ".js", ".css", ".json", ".geojson", ".csv", ".svg", ".txt", ".md", ".bin"}
+MIN_COMPRESS_BYTES = 1024  # smaller files gain less than the header costs
+# Revalidated on every load so edits show up; everything else is data
+REVALIDATE = {".html", ".js", ".css"}
+DEFAULT_MAX_AGE = 3600
+# Files and directories (trailing /) under the root that the front end loads
+SERVED = (
+    "index.html",
+    "styles.css",
+    "js/",
+    "trees.json",
+    "trees.bin",
+    "lic_bid.json",
+    "data/bikes/citibike_count.json",
+    "data/bikes/bike_routes.csv",
+    "data/bikes/routes/",
+)
+STREAM_BYTES = 16 * 2 ** 20  # larger files are streamed from disk instead of held in memory
+_STREAM_CHUNK = 2 ** 16
+
+mimetypes.add_type("application/geo+json", ".geojson")
+mimetypes.add_type("text/javascript", ".js")
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+class Representation(NamedTuple):
+    body: Optional[bytes]  # None: streamed from the file
+    etag: str
+
+
+class StaticFile(NamedTuple):
+    path: str
+    mtime_ns: int
+    size: int
+    content_type: str
+    last_modified: str
+    variants: Dict[str, Representation]  # content coding ("identity", "gzip", "br") -> body
+
+
+def _compress(data, coding):
+    if coding == "gzip":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    return brotli.compress(data, quality=11)
+
+
+CODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+_SUFFIX = {"gzip": "gz", "br": "br"}
+
+
+def load_file(path, cache_dir=CACHE_DIR):
+    """StaticFile for path, compressing (or reusing cached compressed copies) as needed"""
+    stat = os.stat(path)
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type.endswith(("json", "javascript")):
+        content_type += "; charset=utf-8"
+    last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+    if stat.st_size > STREAM_BYTES:
+        # Too big to hold or compress: streamed, with an ETag from the stat
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        return StaticFile(path, stat.st_mtime_ns, stat.st_size, content_type, last_modified,
+                          {"identity": Representation(None, etag)})
+
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    extension = os.path.splitext(path)[1].lower()
+
+    variants = {"identity": Representation(data, f'"{digest}"')}
+    if extension in COMPRESSIBLE and len(data) >= MIN_COMPRESS_BYTES:
+        for coding in CODINGS:
+            cached = os.path.join(cache_dir, f"{digest}.{_SUFFIX[coding]}")
+            if os.path.exists(cached):
+                with open(cached, "rb") as f:
+                    body = f.read()
+            else:
+                body = _compress(data, coding)
+                os.makedirs(cache_dir, exist_ok=True)
+                with open(f"{cached}.tmp", "wb") as f:
+                    f.write(body)
+                os.replace(f"{cached}.tmp", cached)
+            if len(body) < len(data):
+                variants[coding] = Representation(body, f'"{digest}-{_SUFFIX[coding]}"')
+    return StaticFile(path, stat.st_mtime_ns, stat.st_size, content_type, last_modified, variants)
+
+
+class StaticSite:
+    """
+    In-memory files under a root directory, refreshed when they change on disk
+
+    Parameters:
+    - root: directory to serve
+    - cache_dir: where compressed copies are kept between runs
+    - served: files and directories (trailing /) under root that may be served
+    """
+
+    def __init__(self, root=ROOT, cache_dir=CACHE_DIR, served=SERVED):
+        self.root = os.path.abspath(root)
+        self.cache_dir = cache_dir
+        self.served = tuple(served)
+        self.files: Dict[str, StaticFile] = {}
+        self._lock = threading.Lock()
+
+    def allowed(self, relative):
+        """Whether a relative path is one of the served files or inside a served directory"""
+        return any(relative == entry or (entry.endswith("/") and relative.startswith(entry))
+                   for entry in self.served)
+
+    def walk(self):
+        """Relative paths of every servable file that exists"""
+        for entry in self.served:
+            full = os.path.join(self.root, *entry.rstrip("/").split("/"))
+            if not entry.endswith("/"):
+                if os.path.isfile(full):
+                    yield entry
+                continue
+            for directory, dirs, names in os.walk(full):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                for name in sorted(names):
+                    if not name.startswith("."):
+                        yield os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, "/")
+
+    def preload(self):
+        """Load (and compress) every servable file; returns their count"""
+        for relative in self.walk():
+            self.get(relative)
+        return len(self.files)
+
+    def resolve(self, url_path):
+        """Relative file path for a URL path, None if it escapes the root or is not served"""
+        path = posixpath.normpath(unquote(url_path)).lstrip("/")
+        if path in ("", "."):
+            path = "index.html"
+        parts = path.split("/")
+        if ".." in parts or any(part.startswith(".") for part in parts):
+            return None
+        if os.path.isdir(os.path.join(self.root, *parts)):
+            path = posixpath.join(path, "index.html")
+        return path if self.allowed(path) else None
+
+    def get(self, relative) -> Optional[StaticFile]:
+        """StaticFile for a relative path, reloaded if the file changed; None if missing"""
+        full = os.path.join(self.root, *relative.split("/"))
+        try:
+            stat = os.stat(full)
+        except OSError:
+            self.files.pop(relative, None)
+            return None
+        entry = self.files.get(relative)
+        if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+            return entry
+        with self._lock:
+            entry = self.files.get(relative)
+            if entry is None or entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+                entry = self.files[relative] = load_file(full, self.cache_dir)
+        return entry
+
+
+def accepted_codings(header):
+    """{coding: q} from an Accept-Encoding header"""
+    codings = {}
+    for item in (header or "").split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        codings[name.strip().lower()] = q
+    return codings
+
+
+def choose_coding(entry, accept_encoding):
+    """Best stored encoding the client accepts, preferring the smallest body"""
+    accepted = accepted_codings(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    options = [coding for coding in entry.variants
+               if coding != "identity" and accepted.get(coding, wildcard) > 0]
+    if not options:
+        return "identity"
+    return min(options, key=lambda coding: len(entry.variants[coding].body))
+
+
+def parse_range(header, size):
+    """(start, end inclusive) of a single byte range, None to ignore the header, or "unsatisfiable" """
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None  # malformed or several ranges: serve the whole file
+    first, last = match.groups()
+    if not first:
+        if not last or int(last) == 0:
+            return "unsatisfiable"
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        return "unsatisfiable"
+    return start, end
+
+
+def make_handler(site, max_age=DEFAULT_MAX_AGE):
+    """HTTP handler class serving a StaticSite"""
+
+    class StaticHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; without this, Nagle's algorithm and
+        # delayed ACKs stall every keep-alive response by ~40 ms
+        disable_nagle_algorithm = True
+        server_version = "LICStatic/1.0"
+
+        def do_HEAD(self):
+            self._serve(head=True)
+
+        def do_GET(self):
+            self._serve(head=False)
+
+        def _serve(self, head):
+            relative = site.resolve(urlparse(self.path).path)
+            entry = site.get(relative) if relative else None
+            if entry is None:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+
+            range_header = self.headers.get("Range")
+            if range_header and self.headers.get("If-Range") not in (None, entry.variants["identity"].etag,
+                                                                     entry.last_modified):
+                range_header = None
+            # Ranges address the plain file; otherwise pick the best encoding
+            coding = "identity" if range_header else choose_coding(entry, self.headers.get("Accept-Encoding"))
+            representation = entry.variants[coding]
+
+            if self._not_modified(entry, representation):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self._common_headers(entry, representation, coding)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            body = representation.body
+            size = entry.size if body is None else len(body)
+            byte_range = parse_range(range_header, size) if range_header else None
+            if byte_range == "unsatisfiable":
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            self.send_response(HTTPStatus.PARTIAL_CONTENT if byte_range else HTTPStatus.OK)
+            self._common_headers(entry, representation, coding)
+            self.send_header("Content-Type", entry.content_type)
+            start, end = byte_range or (0, size - 1)
+            if byte_range:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.end_headers()
+            if head:
+                return
+            if body is not None:
+                self.wfile.write(memoryview(body)[start:end + 1])
+            else:
+                self._stream(entry.path, start, end - start + 1)
+
+        def _stream(self, path, start, length):
+            with open(path, "rb") as f:
+                f.seek(start)
+                while length > 0:
+                    chunk = f.read(min(_STREAM_CHUNK, length))
+                    if not chunk:
+                        break  # truncated since the stat; the client sees a short body
+                    self.wfile.write(chunk)
+                    length -= len(chunk)
+
+        def _not_modified(self, entry, representation):
+            if_none_match = self.headers.get("If-None-Match")
+            if if_none_match is not None:
+                tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+                return "*" in tags or representation.etag in tags
+            since = self.headers.get("If-Modified-Since")
+            if since:
+                try:
+                    return entry.mtime_ns // 1_000_000_000 <= email.utils.parsedate_to_datetime(since).timestamp()
+                except (TypeError, ValueError):
+                    return False
+            return False
+
+        def _common_headers(self, entry, representation, coding):
+            self.send_header("ETag", representation.etag)
+            self.send_header("Last-Modified", entry.last_modified)
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Vary", "Accept-Encoding")
+            extension = os.path.splitext(entry.path)[1].lower()
+            self.send_header("Cache-Control", "no-cache" if extension in REVALIDATE else f"public, max-age={max_age}")
+            if coding != "identity":
+                self.send_header("Content-Encoding", coding)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StaticHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the map front end with precompression and caching")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--root", default=ROOT, help="directory to serve (default: the repository)")
+    parser.add_argument("--max-age", type=int, default=DEFAULT_MAX_AGE, help="Cache-Control max-age for data files")
+    parser.add_argument("--build", action="store_true", help="only precompress into .static_cache/ and exit")
+    args = parser.parse_args()
+
+    site = StaticSite(args.root)
+    start = time.perf_counter()
+    count = site.preload()
+    compressed = sum(len(entry.variants) > 1 for entry in site.files.values())
+    print(f"Loaded {count} files ({compressed} precompressed, {'/'.join(CODINGS)}) "
+          f"in {time.perf_counter() - start:.1f} s")
+    if not args.build:
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(site, args.max_age))
+        print(f"Serving {site.root} on http://{args.host}:{args.port}/")
+        server.serve_forever()
@@ -0,0 +1,78 @@
+"""
+Import-time regression guard.
+
+Imports each module below in a fresh interpreter with -X importtime and checks
+that (a) it pulls in none of the heavy packages it is meant to avoid and
+(b) its cumulative import time stays under a budget. Exits non-zero on any
+violation, so it can run as a CI step.
+
+Usage: python bench_import_time.py [--repeat N]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HEAVY_PACKAGES = ("streamlit", "plotly", "pandas", "numpy", "PIL", "pyarrow")
+
+# module -> (packages it must not import, cumulative import-time budget in ms)
+TARGETS = {
+    "core": (HEAVY_PACKAGES, 50),
+    "scenario_table": (HEAVY_PACKAGES, 50),
+    "evaluate_scenarios": (HEAVY_PACKAGES, 150),
+    "batch_metrics": (("streamlit", "plotly", "pandas", "PIL", "pyarrow"), 500),
+    "optimizer": (("streamlit", "plotly", "pandas", "PIL", "pyarrow"), 500),
+    "uncertainty": (("streamlit", "plotly", "pandas", "PIL", "pyarrow"), 500),
+    # streamlit itself imports plotly (for its chart theme) and PIL
+    "render_cache": (("pandas", "numpy", "pyarrow"), 3000),
+}
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module):
+    """Import module in a fresh interpreter; returns (cumulative us, set of imported top-level packages)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR, capture_output=True, text=True, check=True,
+    )
+    cumulative = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        imported.add(name.split(".")[0])
+        if name == module:
+            cumulative = int(match.group(2))
+    return cumulative, imported
+
+
+def run(repeat):
+    failures = []
+    print(f"{'module':<22}{'best ms':>10}{'budget ms':>11}  heavy imports")
+    for module, (forbidden, budget_ms) in TARGETS.items():
+        samples = [measure(module) for _ in range(repeat)]
+        best_ms = min(cumulative for cumulative, _ in samples) / 1000
+        leaked = sorted(set(forbidden) & samples[0][1])
+
+        print(f"{module:<22}{best_ms:>10.1f}{budget_ms:>11}  {', '.join(leaked) or '-'}")
+        if leaked:
+            failures.append(f"{module} imports {', '.join(leaked)}")
+        if best_ms > budget_ms:
+            failures.append(f"{module} took {best_ms:.1f} ms (budget {budget_ms} ms)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module; the best time is reported")
+    args = parser.parse_args()
+    sys.exit(run(args.repeat))
@@ -0,0 +1,105 @@
+"""
+Check the combined optimizer against brute force and measure how it scales.
+
+For several objective and limit choices, scores every plan in the joint level
+space of the real interventions, takes the Pareto front of the feasible ones,
+and checks optimize() finds the same front. Then it times the search over a
+growing number of synthetic interventions (three 3-level sliders each, with
+linear effects like the real calculators), checking against brute force while
+the joint space is small enough to enumerate.
+
+Usage: python bench_optimizer.py [max_interventions]
+"""
+import sys
+import time
+
+import numpy as np
+
+from optimizer import AXES, AXIS_SENSE, COST_LOSS_AXIS, InterventionSpace, intervention_space, pareto_mask, search
+from core.config import INTERVENTIONS
+
+CASES = [
+    (("Community Engagement", "Sidewalk Clearance"), None, None),
+    (("Community Engagement", "Pedestrian Safety", "Cost Efficiency"), None, None),
+    (("Business Access", "Traffic Flow"), {"Sidewalk Clearance": (80, None)}, 30),
+    (("Community Engagement", COST_LOSS_AXIS), {"Pedestrian Safety": (55, 70)}, None),
+    (tuple(AXES[:-1]), {"Traffic Flow": (None, 70)}, 40),
+]
+
+BRUTE_FORCE_MAX_PLANS = 2_000_000
+
+
+def brute_force(spaces, objectives, limits, budget):
+    """Score every joint plan; returns the set of distinct objective vectors on the feasible front"""
+    values = np.zeros((1, len(AXES)))
+    for space in spaces:
+        values = (values[:, None, :] + space.values[None, :, :]).reshape(-1, len(AXES))
+    limits = dict(limits or {})
+    if budget is not None:
+        limits[COST_LOSS_AXIS] = (None, budget)
+    feasible = np.ones(len(values), dtype=bool)
+    for axis, (low, high) in limits.items():
+        column = values[:, AXES.index(axis)]
+        if low is not None:
+            feasible &= column >= low
+        if high is not None:
+            feasible &= column <= high
+    columns = [AXES.index(axis) for axis in objectives]
+    scores = values[feasible][:, columns] * [AXIS_SENSE[axis] for axis in objectives]
+    return _rows(scores[pareto_mask(scores)])
+
+
+def _rows(scores):
+    return set(map(tuple, np.round(scores, 9).tolist()))
+
+
+def check(front, spaces, limits, budget):
+    """Compare a ParetoFront with brute force; returns the brute-force time in seconds"""
+    objectives = front.objectives
+    columns = [AXES.index(axis) for axis in objectives]
+    found = _rows(front.scores[:, columns] * [AXIS_SENSE[axis] for axis in objectives])
+    start = time.perf_counter()
+    expected = brute_force(spaces, objectives, limits, budget)
+    elapsed = time.perf_counter() - start
+    assert found == expected, (objectives, limits, budget)
+    return elapsed
+
+
+def synthetic_space(rng, name, params=3, levels=3):
+    """A made-up intervention: each slider level adds a fixed effect to every axis"""
+    effects = rng.uniform(-4, 8, size=(params, len(AXES)))
+    effects[:, -1] = rng.uniform(0, 6, size=params)  # cost efficiency loss
+    grid = np.indices((levels,) * params).reshape(params, -1).T
+    values = grid @ effects
+    return InterventionSpace(name, tuple(f"param_{j}" for j in range(params)), grid, values)
+
+
+def main(max_interventions):
+    spaces = [intervention_space(name) for name in INTERVENTIONS]
+    for objectives, limits, budget in CASES:
+        front = search(spaces, objectives, limits, budget)
+        check(front, spaces, limits, budget)
+        print(f"{len(front.plans):>4} plans on the front of {front.joint_size} "
+              f"({front.evaluated} scored): {', '.join(objectives)}; limits {limits}, budget {budget}")
+
+    rng = np.random.default_rng(0)
+    objectives = ("Community Engagement", "Pedestrian Safety", "Sidewalk Clearance")
+    limits, budget = {"Traffic Flow": (0, None)}, None
+    synthetic = [synthetic_space(rng, f"synthetic {i}") for i in range(max_interventions)]
+    print(f"{'interventions':>14}{'joint plans':>16}{'scored':>10}{'front':>8}{'search ms':>11}{'brute ms':>10}")
+    for count in range(1, max_interventions + 1):
+        subset = synthetic[:count]
+        # Per-intervention budgets scale with the number of interventions
+        budget = 15.0 * count
+        start = time.perf_counter()
+        front = search(subset, objectives, limits, budget)
+        elapsed = time.perf_counter() - start
+        brute = "-"
+        if front.joint_size <= BRUTE_FORCE_MAX_PLANS:
+            brute = f"{check(front, subset, limits, budget) * 1e3:.1f}"
+        print(f"{count:>14}{front.joint_size:>16,}{front.evaluated:>10,}{len(front.plans):>8}"
+              f"{elapsed * 1e3:>11.1f}{brute:>10}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 7)
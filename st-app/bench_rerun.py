@@ -0,0 +1,57 @@
+"""
+Measure Streamlit rerun latency of app.py headlessly.
+
+Drives the app with streamlit's AppTest harness, moving the first slider of
+each intervention through every level and timing each rerun (the script run
+that follows a widget change). The first run per session is reported
+separately since it includes cache warm-up.
+
+Usage: python bench_rerun.py [rounds]
+"""
+import os
+import statistics
+import sys
+import time
+
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def _timed_run(at):
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(at.exception)
+    return elapsed
+
+
+def run(rounds):
+    # The app resolves assets relative to the working directory
+    os.chdir(os.path.dirname(APP_PATH))
+
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    first_run = _timed_run(at)
+
+    timings = {}
+    for intervention in at.selectbox[0].options:
+        at.selectbox[0].select(intervention)
+        _timed_run(at)
+        samples = timings.setdefault(intervention, [])
+        for _ in range(rounds):
+            for level in (0, 1, 2):
+                at.slider[0].set_value(level)
+                samples.append(_timed_run(at))
+
+    print(f"first run: {first_run * 1000:.1f} ms")
+    print(f"{'Intervention':<28}{'reruns':>8}{'mean ms':>10}{'p50 ms':>10}{'p90 ms':>10}")
+    for intervention, samples in timings.items():
+        samples_ms = sorted(s * 1000 for s in samples)
+        p90 = samples_ms[int(0.9 * (len(samples_ms) - 1))]
+        print(f"{intervention:<28}{len(samples_ms):>8}{statistics.mean(samples_ms):>10.1f}"
+              f"{statistics.median(samples_ms):>10.1f}{p90:>10.1f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
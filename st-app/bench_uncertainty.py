@@ -0,0 +1,131 @@
+"""
+Check the Monte Carlo analysis in uncertainty.py and measure how it scales.
+
+Checks, for one scenario of each intervention:
+- the point scores match the scalar calculators exactly;
+- the streamed percentiles match np.percentile over the same draws to within
+  the histogram resolution;
+- first-order indices sum to at most 1 and none exceeds its total index;
+- where an axis is linear in independent coefficients and no clamp is active,
+  the Sobol indices match the analytic variance shares (q * h)^2 / 6 of each
+  symmetric triangular coefficient with half-width h.
+
+Then it times analyze() for a growing number of draws and reports the peak
+memory it allocated, which should stay flat once the draws exceed one chunk.
+
+Usage: python bench_uncertainty.py [max_draws]
+"""
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from core.metrics import generate_source
+from core.registry import REGISTRY
+from scenario_table import result_at
+from uncertainty import CHUNK_DRAWS, HISTOGRAM_BINS, PERCENTILES, _scores, _triangular, analyze, coefficient_model
+
+SCENARIOS = {
+    "Public Seating Management": (2, 1),
+    "Mobility Management": (1, 1, 1),
+}
+
+SOBOL_DRAWS = 200_000
+SOBOL_TOLERANCE = 0.02
+
+
+def check_point(name, levels, result):
+    intervention = REGISTRY[name]
+    expected = [result_at(intervention.calculate(*levels), path) for path in intervention.chart.values()]
+    assert np.array_equal(result.point, expected), (name, result.point, expected)
+
+
+def check_percentiles(name, levels, draws=50_000, seed=1):
+    """Streamed percentiles against np.percentile of the same draws (one chunk, same random stream)"""
+    result = analyze(name, levels, draws, seed=seed)
+    model = coefficient_model(name)
+    rng = np.random.default_rng(seed)
+    k = len(model.uncertain)
+    a = _triangular(model, rng.random((k, draws)))
+    b = _triangular(model, rng.random((k, draws)))
+    scores = np.concatenate([_scores(model, levels, a), _scores(model, levels, b)], axis=1)
+    exact = np.percentile(scores, PERCENTILES, axis=1).T
+    resolution = 1.2 * (scores.max(axis=1) - scores.min(axis=1)) / HISTOGRAM_BINS
+    assert np.all(np.abs(result.percentiles - exact) <= resolution[:, None] + 1e-9), (name, result.percentiles, exact)
+
+
+def check_sobol(name, levels, result):
+    """Sobol indices against the analytic shares on axes linear in their own coefficients; returns axes checked"""
+    intervention = REGISTRY[name]
+    model = coefficient_model(name)
+    generated = generate_source(intervention.spec, sampled=True)
+    results = intervention.calculate(*levels)
+    assert np.all(result.first_order.sum(axis=1) <= 1 + SOBOL_TOLERANCE), name
+    assert np.all(result.first_order <= result.total + SOBOL_TOLERANCE), name
+    checked = 0
+    for a, path in enumerate(model.paths):
+        node = _formula(intervention.spec["outputs"], path)
+        own = [c for c, i in enumerate(model.uncertain) if generated.coefficients[i].formula == ("outputs",) + path]
+        others = [c for c, i in enumerate(model.uncertain) if i in generated.depends[path] and c not in own]
+        clamped = ("max" in node and result_at(results, path) + 4 * result.std[a] >= node["max"]) or \
+                  ("min" in node and result_at(results, path) - 4 * result.std[a] <= node["min"])
+        if others or clamped:
+            continue
+        # Linear axis: each coefficient's variance share is (quantity * half-width)^2 / 6
+        quantities = {term: _quantity(intervention, term, levels) for term in node["terms"]}
+        variances = np.array([
+            (quantities[generated.coefficients[model.uncertain[c]].term] * model.half_widths[c]) ** 2 / 6
+            for c in own
+        ])
+        if variances.sum() == 0:
+            continue
+        shares = variances / variances.sum()
+        assert np.allclose(result.first_order[a, own], shares, atol=SOBOL_TOLERANCE), (name, path)
+        assert np.allclose(result.total[a, own], shares, atol=SOBOL_TOLERANCE), (name, path)
+        checked += 1
+    return checked
+
+
+def _formula(outputs, path):
+    for key in path:
+        outputs = outputs[key]
+    return outputs
+
+
+def _quantity(intervention, name, levels):
+    """Value of an input or quantity at the point estimates"""
+    if name in intervention.inputs:
+        return levels[intervention.inputs.index(name)]
+    node = intervention.spec["quantities"][name]
+    if "input" in node:
+        return node["levels"][levels[intervention.inputs.index(node["input"])]]
+    return node.get("base", 0) + sum(_quantity(intervention, term, levels) * c for term, c in node["terms"].items())
+
+
+def main(max_draws):
+    for name, levels in SCENARIOS.items():
+        result = analyze(name, levels, SOBOL_DRAWS)
+        check_point(name, levels, result)
+        check_percentiles(name, levels)
+        axes = check_sobol(name, levels, result)
+        print(f"{name}: point scores, percentiles and Sobol indices verified, analytically on {axes} linear axes "
+              f"({len(result.coefficients)} uncertain coefficients)")
+
+    print(f"{'intervention':<28}{'draws':>12}{'evaluations':>14}{'seconds':>10}{'M eval/s':>10}{'peak MB':>9}")
+    for name, levels in SCENARIOS.items():
+        draws = CHUNK_DRAWS // 4
+        while draws <= max_draws:
+            tracemalloc.start()
+            start = time.perf_counter()
+            result = analyze(name, levels, draws)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{name:<28}{draws:>12,}{result.evaluations:>14,}{elapsed:>10.2f}"
+                  f"{result.evaluations / elapsed / 1e6:>10.1f}{peak / 2 ** 20:>9.1f}")
+            draws *= 4
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4 * 2 ** 20)
@@ -0,0 +1,142 @@
+"""
+Offline build step for the images in ./assets.
+
+Writes compressed, resized variants of every PNG to ./static/variants, which
+Streamlit serves at app/static/variants/ when server.enableStaticServing is on
+(see .streamlit/config.toml). Each source gets one file per (format, width)
+named <stem>-<width>w.<content hash>.<ext>, so the files are immutable and
+can be cached by the browser forever. A manifest.json next to them records
+the variants per source together with the source's sha256; sources whose hash
+is unchanged are skipped on the next run and stale variants are removed.
+
+Usage: python build_assets.py [--force]
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+
+from PIL import Image, features
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(APP_DIR, "assets")
+VARIANTS_DIR = os.path.join(APP_DIR, "static", "variants")
+MANIFEST_PATH = os.path.join(VARIANTS_DIR, "manifest.json")
+
+# Served under this URL path by Streamlit's static file serving
+VARIANTS_URL = "app/static/variants"
+
+VARIANT_WIDTHS = (320, 640, 1280)
+
+# Output formats in order of browser preference; PNG is the universal fallback
+VARIANT_FORMATS = {
+    "avif": {"format": "AVIF", "quality": 55},
+    "webp": {"format": "WEBP", "quality": 80, "method": 6},
+    "png": {"format": "PNG", "optimize": True},
+}
+
+
+def available_formats():
+    """The VARIANT_FORMATS this Pillow build can encode"""
+    return [ext for ext in VARIANT_FORMATS if ext == "png" or features.check(ext)]
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _target_widths(source_width):
+    """VARIANT_WIDTHS narrower than the source, plus the source width itself if smaller than the largest"""
+    widths = [w for w in VARIANT_WIDTHS if w < source_width]
+    if source_width <= VARIANT_WIDTHS[-1]:
+        widths.append(source_width)
+    return widths
+
+
+def build_variants(name, data, formats):
+    """Encode every (format, width) variant of one source; returns (file name, bytes, entry) tuples"""
+    stem = os.path.splitext(name)[0]
+    outputs = []
+    with Image.open(io.BytesIO(data)) as source:
+        source.load()
+        for width in _target_widths(source.width):
+            height = round(source.height * width / source.width)
+            image = source if width == source.width else source.resize((width, height), Image.LANCZOS)
+            for ext in formats:
+                buffer = io.BytesIO()
+                image.save(buffer, **VARIANT_FORMATS[ext])
+                encoded = buffer.getvalue()
+                file_name = f"{stem}-{width}w.{_sha256(encoded)[:10]}.{ext}"
+                outputs.append((file_name, encoded, {
+                    "file": file_name,
+                    "format": ext,
+                    "width": width,
+                    "height": height,
+                    "bytes": len(encoded),
+                }))
+    return outputs
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Previously built manifest, or an empty one"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"sources": {}}
+
+
+def build(force=False):
+    """Build variants for every PNG in ./assets, skipping unchanged sources"""
+    os.makedirs(VARIANTS_DIR, exist_ok=True)
+    formats = available_formats()
+    previous = load_manifest()["sources"]
+    sources = {}
+
+    for name in sorted(os.listdir(ASSETS_DIR)):
+        if not name.lower().endswith(".png"):
+            continue
+        with open(os.path.join(ASSETS_DIR, name), "rb") as f:
+            data = f.read()
+        source_hash = _sha256(data)
+
+        entry = previous.get(name)
+        if (
+            not force
+            and entry is not None
+            and entry["sha256"] == source_hash
+            and entry["formats"] == formats
+            and all(os.path.exists(os.path.join(VARIANTS_DIR, v["file"])) for v in entry["variants"])
+        ):
+            sources[name] = entry
+            continue
+
+        variants = []
+        for file_name, encoded, variant in build_variants(name, data, formats):
+            with open(os.path.join(VARIANTS_DIR, file_name), "wb") as f:
+                f.write(encoded)
+            variants.append(variant)
+        sources[name] = {"sha256": source_hash, "bytes": len(data), "formats": formats, "variants": variants}
+        print(f"built {name}: {len(data):,} B -> {len(variants)} variants")
+
+    # Remove variants no longer referenced by any source
+    referenced = {v["file"] for entry in sources.values() for v in entry["variants"]}
+    for file_name in os.listdir(VARIANTS_DIR):
+        if file_name != os.path.basename(MANIFEST_PATH) and file_name not in referenced:
+            os.remove(os.path.join(VARIANTS_DIR, file_name))
+
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump({"url": VARIANTS_URL, "sources": sources}, f, indent=2)
+    return sources
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--force", action="store_true", help="rebuild every source even if unchanged")
+    args = parser.parse_args()
+
+    sources = build(force=args.force)
+    original = sum(entry["bytes"] for entry in sources.values())
+    variants = sum(v["bytes"] for entry in sources.values() for v in entry["variants"])
+    print(f"{len(sources)} sources: {original:,} B of PNGs, {variants:,} B across all variants")
@@ -0,0 +1,11 @@
+"""
+Core of the interventions tool: the intervention registry loaded from the
+spec files in core/interventions/, and the metric calculators compiled from
+their formulas.
+
+Pure Python with no third-party dependencies (PyYAML only for YAML specs),
+so headless tools (e.g. evaluate_scenarios.py) can import it without pulling
+in streamlit, plotly, pandas or numpy. bench_import_time.py guards this.
+"""
+from .config import COMBINED_TRADEOFFS, INTERVENTIONS, SIMPLIFIED_CALCULATORS
+from .registry import REGISTRY
@@ -0,0 +1,76 @@
+from .registry import REGISTRY
+
+# Global definitions
+CATEGORICAL_LABELS = {
+    0: "None",
+    1: "Minimal",
+    2: "Extensive"
+}
+
+IMPLEMENTATION_LABELS = {
+    0: "None",
+    1: "Mid",
+    2: "Full"
+}
+
+# The interventions, as defined by the spec files in core/interventions/
+# (see core/registry.py). The dicts below are views of the registry for the
+# rest of the app.
+INTERVENTIONS = {
+    name: {
+        "description": intervention.description,
+        "parameters": intervention.parameters,
+        "conflicts": list(intervention.conflicts),
+    }
+    for name, intervention in REGISTRY.items()
+}
+
+
+# Trade-off axes (0-100) of the combined multi-intervention optimizer, and the
+# result key path each intervention reports the axis under. A combined plan
+# scores the mean over the interventions that report an axis.
+COMBINED_TRADEOFFS = {}
+for _name, _intervention in REGISTRY.items():
+    for _axis, _path in _intervention.combined.items():
+        COMBINED_TRADEOFFS.setdefault(_axis, {})[_name] = _path
+
+# Combined optimizer settings merged from the specs' "optimizer" sections: the
+# axis whose drop from doing nothing the budget caps (None: no budget), the
+# objectives the app preselects (default the first combined axis) and the
+# default minimum of each limit slider
+COST_AXIS = None
+PRESET_OBJECTIVES = []
+PRESET_MINIMUMS = {}
+for _intervention in REGISTRY.values():
+    _cost_axis = _intervention.optimizer.get("cost_axis")
+    if COST_AXIS is not None and _cost_axis not in (None, COST_AXIS):
+        raise ValueError(f"{_intervention.path}: cost_axis {_cost_axis!r} differs from {COST_AXIS!r} in another spec")
+    COST_AXIS = COST_AXIS or _cost_axis
+    PRESET_OBJECTIVES += [axis for axis in _intervention.optimizer.get("objectives", ()) if axis not in PRESET_OBJECTIVES]
+    for _axis, _minimum in _intervention.optimizer.get("minimums", {}).items():
+        PRESET_MINIMUMS.setdefault(_axis, _minimum)
+PRESET_OBJECTIVES = tuple(PRESET_OBJECTIVES or list(COMBINED_TRADEOFFS)[:1])
+
+
+# Images shown in the "Impact Analysis" tab. "transformations" maps the tuple of
+# parameter values (in "levels" order) to the (file in ./assets, caption) shown
+# in the Transformation column; validated against ./assets at app startup.
+ASSET_MANIFEST = {
+    name: {
+        "levels": tuple(intervention.parameters),
+        "current": tuple(intervention.assets["current"]),
+        "transformations": {
+            tuple(entry["levels"]): (entry["image"], entry["caption"])
+            for entry in intervention.assets["transformations"]
+        },
+    }
+    for name, intervention in REGISTRY.items()
+    if intervention.assets
+}
+
+# Width (px) images are downscaled to before being sent to the browser; one
+# before/after column of the wide layout at 2x pixel density
+COLUMN_IMAGE_WIDTH = 640
+
+
+SIMPLIFIED_CALCULATORS = {name: intervention.calculate for name, intervention in REGISTRY.items()}
@@ -0,0 +1,253 @@
+"""
+Compiler for the metric formulas of the intervention specs in core/interventions/.
+
+A spec's "quantities" and "outputs" are formulas of three kinds:
+
+- lookup:    {"input": "seating_level", "levels": [0, 2, 5]}
+             the value for the input's level (numbers or text)
+- linear:    {"base": 40, "terms": {"bench_impact": 1.5, ...}, "min": 0, "max": 100}
+             base + q1 * c1 + q2 * c2 ... left to right, then clamped;
+             the base (default none) and the clamps are optional. An
+             optional "spread": {"bench_impact": 0.1} gives a coefficient's
+             relative uncertainty for uncertainty.py
+- over_base: {"over_base": ["metrics", "Pedestrian Dwell Time (min)"], "format": "{:.1f}X"}
+             a linear output divided by its base; formatted by the scalar
+             evaluator, left as the raw ratio by the vectorized one
+
+Terms name inputs or earlier quantities. An output whose value is a dict of
+formulas is a section of the nested result.
+
+compile_formulas() turns a spec into the source of one straight-line Python
+function taking the inputs as positional arguments and compiles it once, so
+evaluating a scenario never walks the spec. The backend decides what the code
+runs on: SCALAR_BACKEND evaluates plain int levels with min()/max(), exactly
+like hand-written calculators; batch_metrics.py supplies a NumPy backend so
+the same source scores arrays of levels.
+"""
+import keyword
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+
+class Backend(NamedTuple):
+    table: Callable[[list], Any]  # level -> value lookup table from a list
+    levels: Callable[[Any, str, int], Any]  # validate (value, input name, level count)
+    broadcast: Callable[..., Any]  # the validated inputs, broadcast against each other
+    minimum: Callable[[Any, Any], Any]
+    maximum: Callable[[Any, Any], Any]
+    format: Callable[[str, Any], Any]  # (format string, ratio) of an over_base output
+
+
+def _scalar_levels(value, name, count):
+    if value not in range(count):
+        raise ValueError(f"{name} must be in the range 0..{count - 1}, got {value!r}")
+    return value
+
+
+SCALAR_BACKEND = Backend(
+    table=tuple,
+    levels=_scalar_levels,
+    broadcast=lambda *values: values,
+    minimum=min,
+    maximum=max,
+    format=lambda format_str, value: format_str.format(value),
+)
+
+
+def formula_kind(node):
+    """"lookup", "linear", "over_base", or None for a section of further outputs"""
+    if "input" in node:
+        return "lookup"
+    if "over_base" in node:
+        return "over_base"
+    if "terms" in node:
+        return "linear"
+    return None
+
+
+def iter_outputs(outputs, prefix=()):
+    """(path, formula) of every output, sections flattened, in spec order"""
+    for key, node in outputs.items():
+        if not isinstance(node, dict):
+            raise ValueError(f"output {'.'.join(prefix + (key,))} must be a formula or a section")
+        if formula_kind(node) is None:
+            yield from iter_outputs(node, prefix + (key,))
+        else:
+            yield prefix + (key,), node
+
+
+def input_levels(spec):
+    """{input: number of levels}, from the lookup tables that read each input"""
+    counts = {}
+    formulas = [(("quantities", name), node) for name, node in spec.get("quantities", {}).items()]
+    formulas += [(("outputs",) + path, node) for path, node in iter_outputs(spec["outputs"])]
+    for path, node in formulas:
+        if formula_kind(node) != "lookup":
+            continue
+        name = node["input"]
+        if name not in spec["inputs"]:
+            raise ValueError(f"{'.'.join(path)} reads unknown input {name!r}")
+        if counts.setdefault(name, len(node["levels"])) != len(node["levels"]):
+            raise ValueError(f"{'.'.join(path)} has {len(node['levels'])} levels, other lookups of {name} have {counts[name]}")
+    for name in spec["inputs"]:
+        if name not in counts:
+            raise ValueError(f"input {name!r} is not read by any lookup, so its levels are unknown")
+    return {name: counts[name] for name in spec["inputs"]}
+
+
+def _check_name(name, what):
+    if not name.isidentifier() or keyword.iskeyword(name) or name.startswith("_"):
+        raise ValueError(f"{what} {name!r} must be a Python identifier not starting with _")
+
+
+def _linear_source(node, names, path, coefficient_source):
+    terms = node["terms"]
+    if not terms:
+        raise ValueError(f"{path} needs at least one term")
+    for name, spread in node.get("spread", {}).items():
+        if name not in terms or isinstance(spread, bool) or not isinstance(spread, (int, float)) or not 0 <= spread < 1:
+            raise ValueError(f"{path}: spread of {name!r} must be a number in [0, 1) for one of its terms")
+    parts = [repr(node["base"])] if "base" in node else []
+    for name, coefficient in terms.items():
+        if name not in names:
+            raise ValueError(f"{path} refers to {name!r}, which is not an input or an earlier quantity")
+        if isinstance(coefficient, bool) or not isinstance(coefficient, (int, float)):
+            raise ValueError(f"{path}: coefficient of {name} must be a number")
+        parts.append(f"{name} * {coefficient_source(name, coefficient)}")
+    expression = " + ".join(parts)
+    if "min" in node:
+        expression = f"_maximum({node['min']!r}, {expression})"
+    if "max" in node:
+        expression = f"_minimum({node['max']!r}, {expression})"
+    return expression
+
+
+class Coefficient(NamedTuple):
+    formula: Tuple[str, ...]  # ("quantities", name) or ("outputs", *path)
+    term: str
+    value: float  # point estimate from the spec
+    spread: Optional[float]  # relative half-width from the formula's "spread", None if not given
+
+
+class GeneratedSource(NamedTuple):
+    source: str
+    tables: List[list]  # lookup value lists, referenced in the source as _table_0, _table_1, ...
+    coefficients: List[Coefficient]  # every linear term, in the order of _coefficients
+    depends: Dict[Tuple[str, ...], FrozenSet[int]]  # output path -> indices of the coefficients it depends on
+
+
+def generate_source(spec, function_name="evaluate", sampled=False):
+    """
+    Python source of the evaluator for a spec
+
+    Parameters:
+    - spec: intervention spec
+    - function_name: name of the generated function
+    - sampled: if True the function takes the linear coefficients as a last
+      argument, _coefficients (indexed like GeneratedSource.coefficients),
+      instead of inlining the spec's point estimates
+
+    Returns:
+    - GeneratedSource
+    """
+    inputs = list(spec["inputs"])
+    for name in inputs:
+        _check_name(name, "input")
+    counts = input_levels(spec)
+
+    tables = []
+    coefficients = []
+    depends = {name: frozenset() for name in inputs}
+
+    def lookup(node):
+        tables.append(list(node["levels"]))
+        return f"_table_{len(tables) - 1}[{node['input']}]"
+
+    def linear(node, path, formula):
+        first = len(coefficients)
+
+        def coefficient_source(term, value):
+            coefficients.append(Coefficient(formula, term, value, node.get("spread", {}).get(term)))
+            return f"_coefficients[{len(coefficients) - 1}]" if sampled else repr(value)
+
+        expression = _linear_source(node, names, path, coefficient_source)
+        used = frozenset(range(first, len(coefficients)))
+        return expression, used.union(*(depends[term] for term in node["terms"]))
+
+    arguments = inputs + ["_coefficients"] if sampled else inputs
+    lines = [f"def {function_name}({', '.join(arguments)}):"]
+    for name in inputs:
+        lines.append(f"    {name} = _levels({name}, {name!r}, {counts[name]})")
+    lines.append(f"    {', '.join(inputs)}, = _broadcast({', '.join(inputs)})")
+
+    names = set(inputs)
+    for name, node in spec.get("quantities", {}).items():
+        _check_name(name, "quantity")
+        if name in names:
+            raise ValueError(f"quantity {name!r} is defined twice")
+        kind = formula_kind(node)
+        if kind == "lookup":
+            expression, depends[name] = lookup(node), frozenset()
+        elif kind == "linear":
+            expression, depends[name] = linear(node, f"quantities.{name}", ("quantities", name))
+        else:
+            raise ValueError(f"quantity {name!r} must be a lookup or linear formula")
+        lines.append(f"    {name} = {expression}")
+        names.add(name)
+
+    variables = {}
+    output_depends = {}
+    for i, (path, node) in enumerate(iter_outputs(spec["outputs"])):
+        label = "outputs." + ".".join(path)
+        kind = formula_kind(node)
+        if kind == "lookup":
+            expression, output_depends[path] = lookup(node), frozenset()
+        elif kind == "linear":
+            expression, output_depends[path] = linear(node, label, ("outputs",) + path)
+        else:
+            target = tuple(node["over_base"])
+            source = dict(iter_outputs(spec["outputs"])).get(target)
+            if target not in variables or formula_kind(source) != "linear":
+                raise ValueError(f"{label} must refer to an earlier linear output, got {list(target)}")
+            expression = f"_format({node.get('format', '{}')!r}, {variables[target]} / {source.get('base', 0)!r})"
+            output_depends[path] = output_depends[target]
+        variables[path] = f"_v{i}"
+        lines.append(f"    _v{i} = {expression}")
+
+    def result(outputs, prefix=()):
+        items = []
+        for key, node in outputs.items():
+            value = result(node, prefix + (key,)) if formula_kind(node) is None else variables[prefix + (key,)]
+            items.append(f"{key!r}: {value}")
+        return "{" + ", ".join(items) + "}"
+
+    lines.append(f"    return {result(spec['outputs'])}")
+    return GeneratedSource("\n".join(lines) + "\n", tables, coefficients, output_depends)
+
+
+def compile_formulas(spec, backend=SCALAR_BACKEND, sampled=False):
+    """
+    Compile a spec's formulas into an evaluator function
+
+    Parameters:
+    - spec: intervention spec with "inputs", "quantities" and "outputs"
+    - backend: Backend the generated code runs on
+    - sampled: take the linear coefficients as a last argument (see generate_source)
+
+    Returns:
+    - Function taking one level per input (positionally, in "inputs" order)
+      and returning the nested output dict
+    """
+    function_name = "calculate_" + "".join(c if c.isalnum() else "_" for c in spec["name"].lower())
+    source, tables, _, _ = generate_source(spec, function_name, sampled)
+    namespace = {
+        "_levels": backend.levels,
+        "_broadcast": backend.broadcast,
+        "_minimum": backend.minimum,
+        "_maximum": backend.maximum,
+        "_format": backend.format,
+    }
+    namespace.update({f"_table_{i}": backend.table(values) for i, values in enumerate(tables)})
+    exec(compile(source, f"<{spec['name']} formulas>", "exec"), namespace)
+    function = namespace[function_name]
+    function.__doc__ = f"Metrics of {spec['name']} compiled from its spec; one level per input: {', '.join(spec['inputs'])}"
+    return function
@@ -0,0 +1,158 @@
+"""
+Registry of the interventions defined by the spec files in core/interventions/.
+
+Each *.json file (or *.yaml / *.yml, when PyYAML is installed) defines one
+intervention: its sliders, level mappings and metric formulas, the rows and
+chart the app shows, its axes in the combined optimizer, notes and images. An
+optional top-level "spread" sets the relative uncertainty of every formula
+coefficient that does not give its own (see uncertainty.py). An optional
+"optimizer" section names, among its combined axes, the "cost_axis" whose
+drop the optimizer budgets, the "objectives" the app preselects and the
+default "minimums" of its limit sliders.
+Files load in name order, which is the order the app lists them in. Specs are
+validated and their formulas compiled once, at import; adding an intervention
+means adding a file, and adding or editing one takes effect when the app is
+restarted.
+"""
+import json
+import os
+from typing import Callable, Dict, NamedTuple, Tuple
+
+from .metrics import compile_formulas, input_levels, iter_outputs
+
+SPEC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "interventions")
+SPEC_EXTENSIONS = (".json", ".yaml", ".yml")
+
+_REQUIRED_KEYS = ("name", "description", "inputs", "parameters", "outputs")
+_PARAMETER_KEYS = ("label", "min", "max", "default", "description")
+
+
+class Intervention(NamedTuple):
+    name: str
+    description: str
+    inputs: Tuple[str, ...]  # calculator arguments, in order
+    level_counts: Tuple[int, ...]  # number of levels of each input
+    parameters: dict  # {input: slider definition}; inputs without a slider stay at level 0
+    display: tuple  # ({label, value path, format[, delta path]}, ...) rows of the metrics column
+    chart: dict  # {radar axis: result path}
+    combined: dict  # {combined optimizer axis: result path}
+    optimizer: dict  # {"cost_axis": axis, "objectives": [axis, ...], "minimums": {axis: score}}, all optional
+    conflicts: tuple
+    recommendations: tuple
+    assets: dict  # {"current": [image, caption], "transformations": [{levels, image, caption}, ...]}, or {} without images
+    spec: dict  # as loaded, for other backends (batch_metrics.py)
+    calculate: Callable  # compiled scalar evaluator
+    path: str
+
+
+def spec_paths(directory=SPEC_DIR):
+    """Spec files in load order"""
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if name.endswith(SPEC_EXTENSIONS)]
+
+
+def load_spec(path):
+    """Parse one spec file; YAML needs PyYAML, which is only imported for YAML files"""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        try:
+            import yaml
+        except ImportError as e:
+            raise ImportError(f"{path}: install PyYAML to load YAML specs, or write the spec as JSON") from e
+        return yaml.safe_load(f)
+
+
+def _check_path(outputs, path, where):
+    paths = {path for path, _ in iter_outputs(outputs)}
+    if tuple(path) not in paths:
+        raise ValueError(f"{where} refers to unknown output {list(path)}")
+    return tuple(path)
+
+
+def build_intervention(spec, path="<spec>"):
+    """
+    Validate a parsed spec and compile its formulas
+
+    Parameters:
+    - spec: dict as loaded from a spec file
+    - path: file it came from, for error messages
+
+    Returns:
+    - Intervention
+
+    Raises:
+    - ValueError: missing keys, unknown inputs or outputs, sliders outside the
+      levels, or formula errors from core.metrics
+    """
+    try:
+        missing = [key for key in _REQUIRED_KEYS if key not in spec]
+        if missing:
+            raise ValueError(f"missing {', '.join(missing)}")
+        counts = input_levels(spec)
+        spread = spec.get("spread", 0)
+        if isinstance(spread, bool) or not isinstance(spread, (int, float)) or not 0 <= spread < 1:
+            raise ValueError("spread must be a number in [0, 1)")
+        for name, parameter in spec["parameters"].items():
+            if name not in counts:
+                raise ValueError(f"slider {name!r} is not an input")
+            missing = [key for key in _PARAMETER_KEYS if key not in parameter]
+            if missing:
+                raise ValueError(f"slider {name!r} is missing {', '.join(missing)}")
+            if not 0 <= parameter["min"] <= parameter["default"] <= parameter["max"] < counts[name]:
+                raise ValueError(f"slider {name!r} needs 0 <= min <= default <= max < {counts[name]}")
+        outputs = spec["outputs"]
+        display = []
+        for row in spec.get("display", []):
+            row = dict(row, value=_check_path(outputs, row["value"], f"display row {row['label']!r}"))
+            if "delta" in row:
+                row["delta"] = _check_path(outputs, row["delta"], f"display row {row['label']!r}")
+            display.append(row)
+        chart = {axis: _check_path(outputs, p, f"chart axis {axis!r}") for axis, p in spec.get("chart", {}).items()}
+        combined = {axis: _check_path(outputs, p, f"combined axis {axis!r}") for axis, p in spec.get("combined", {}).items()}
+        optimizer = spec.get("optimizer", {})
+        axes = [optimizer["cost_axis"]] if "cost_axis" in optimizer else []
+        axes += [*optimizer.get("objectives", ()), *optimizer.get("minimums", {})]
+        unknown = [axis for axis in axes if axis not in combined]
+        if unknown:
+            raise ValueError(f"optimizer names axes missing from combined: {', '.join(unknown)}")
+        assets = spec.get("assets", {})
+        if assets:
+            missing = [key for key in ("current", "transformations") if key not in assets]
+            if missing:
+                raise ValueError(f"assets is missing {', '.join(missing)}")
+        calculate = compile_formulas(spec)
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"{path}: {e}") from e
+
+    return Intervention(
+        name=spec["name"],
+        description=spec["description"],
+        inputs=tuple(spec["inputs"]),
+        level_counts=tuple(counts[name] for name in spec["inputs"]),
+        parameters=spec["parameters"],
+        display=tuple(display),
+        chart=chart,
+        combined=combined,
+        optimizer=optimizer,
+        conflicts=tuple(spec.get("conflicts", ())),
+        recommendations=tuple(spec.get("recommendations", ())),
+        assets=assets,
+        spec=spec,
+        calculate=calculate,
+        path=path,
+    )
+
+
+def load_registry(directory=SPEC_DIR) -> Dict[str, Intervention]:
+    """{intervention name: Intervention} for every spec file in directory, in file name order"""
+    registry = {}
+    for path in spec_paths(directory):
+        intervention = build_intervention(load_spec(path), path)
+        if intervention.name in registry:
+            raise ValueError(f"{path}: intervention {intervention.name!r} is already defined by {registry[intervention.name].path}")
+        registry[intervention.name] = intervention
+    return registry
+
+
+REGISTRY = load_registry()
@@ -0,0 +1,186 @@
+"""
+Headless bulk evaluation of intervention scenarios.
+
+Reads scenario rows from CSV, JSON / JSON Lines or Parquet, evaluates each one
+with the calculator registered in SIMPLIFIED_CALCULATORS, and streams the
+results out as CSV or JSON Lines while later chunks are still being computed.
+Only the core package is imported, so this runs without streamlit, plotly
+or pandas installed (Parquet input additionally needs pyarrow).
+
+Each input row names its intervention in an "intervention" column (or use
+--intervention for the whole file) and gives levels in columns named after the
+calculator arguments, e.g. seating_level, plaza_level; missing levels are 0.
+Every other column is passed through to the output unchanged.
+
+Usage:
+    python evaluate_scenarios.py plans.csv -o results.jsonl
+    python evaluate_scenarios.py plans.parquet --intervention "Mobility Management" --format csv
+"""
+import argparse
+import csv
+import functools
+import inspect
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from core.config import SIMPLIFIED_CALCULATORS
+
+CALCULATOR_ARGS = {
+    intervention: tuple(inspect.signature(calculator).parameters)
+    for intervention, calculator in SIMPLIFIED_CALCULATORS.items()
+}
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+
+def flatten_results(results, prefix=""):
+    """Flatten nested calculator output into {"section.key": value} columns"""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten_results(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+@functools.lru_cache(maxsize=None)
+def _evaluate_levels(intervention, levels):
+    # The level space is tiny, so each worker evaluates every combination once
+    return flatten_results(SIMPLIFIED_CALCULATORS[intervention](*levels))
+
+
+def evaluate_row(row, default_intervention=None):
+    """Evaluate one scenario row; returns the row with the result columns added"""
+    intervention = row.get("intervention") or default_intervention
+    if intervention not in SIMPLIFIED_CALCULATORS:
+        raise ValueError(f"Unknown intervention {intervention!r}")
+    levels = tuple(int(row.get(name) or 0) for name in CALCULATOR_ARGS[intervention])
+    return {**row, "intervention": intervention, **_evaluate_levels(intervention, levels)}
+
+
+def evaluate_chunk(rows, default_intervention=None):
+    return [evaluate_row(row, default_intervention) for row in rows]
+
+
+def result_columns():
+    """Union of the flattened result columns over every calculator, in a stable order"""
+    columns = {}
+    for intervention, args in CALCULATOR_ARGS.items():
+        for column in _evaluate_levels(intervention, (0,) * len(args)):
+            columns.setdefault(column)
+    return list(columns)
+
+
+RESULT_COLUMNS = result_columns()
+
+
+def read_rows(path):
+    """Stream scenario rows (dicts) from a .csv, .json, .jsonl/.ndjson or .parquet file, or CSV on stdin for '-'"""
+    if path == "-":
+        yield from csv.DictReader(sys.stdin)
+        return
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        with open(path, newline="") as f:
+            yield from csv.DictReader(f)
+    elif ext in (".jsonl", ".ndjson"):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif ext == ".json":
+        with open(path) as f:
+            yield from json.load(f)
+    elif ext == ".parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+    else:
+        raise ValueError(f"Unsupported input format {ext!r} (expected .csv, .json, .jsonl, .ndjson or .parquet)")
+
+
+def _chunks(rows, size):
+    iterator = iter(rows)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def evaluate_stream(rows, default_intervention=None, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Evaluate scenario rows in chunks across a process pool
+
+    Yields result rows in input order as soon as each chunk is done; at most a
+    few chunks per worker are in flight, so memory stays bounded for
+    arbitrarily long inputs. workers=0 evaluates in the calling process.
+    """
+    chunks = _chunks(rows, chunk_size)
+    evaluate = functools.partial(evaluate_chunk, default_intervention=default_intervention)
+
+    if workers == 0:
+        for chunk in chunks:
+            yield from evaluate(chunk)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        max_pending = 2 * workers
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(evaluate, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.pop(0).result()
+        for future in pending:
+            yield from future.result()
+
+
+def write_results(results, output, output_format):
+    """Write result rows incrementally as CSV or JSON Lines; returns the row count"""
+    count = 0
+    if output_format == "csv":
+        writer = None
+        for row in results:
+            if writer is None:
+                input_columns = [c for c in row if c not in RESULT_COLUMNS]
+                writer = csv.DictWriter(output, fieldnames=input_columns + RESULT_COLUMNS, extrasaction="ignore")
+                writer.writeheader()
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in results:
+            output.write(json.dumps(row))
+            output.write("\n")
+            count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate intervention scenarios in bulk without the Streamlit UI")
+    parser.add_argument("input", help="scenario file (.csv, .json, .jsonl, .ndjson, .parquet) or - for CSV on stdin")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="output format (default: from the output extension, else jsonl)")
+    parser.add_argument("--intervention", choices=list(SIMPLIFIED_CALCULATORS), help="intervention for rows without an intervention column")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count, 0 = in-process)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per work item")
+    args = parser.parse_args(argv)
+
+    output_format = args.format
+    if output_format is None:
+        output_format = "csv" if args.output and args.output.lower().endswith(".csv") else "jsonl"
+
+    results = evaluate_stream(read_rows(args.input), args.intervention, args.workers, args.chunk_size)
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            count = write_results(results, f, output_format)
+    else:
+        count = write_results(results, sys.stdout, output_format)
+    print(f"Evaluated {count:,} scenarios", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
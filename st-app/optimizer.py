@@ -0,0 +1,318 @@
+"""
+Combined multi-intervention optimizer over the vectorized calculators in batch_metrics.py.
+
+A plan sets the slider levels of every intervention in INTERVENTIONS at once
+and is scored on the combined trade-off axes of COMBINED_TRADEOFFS, each the
+mean of the 0-100 scores the interventions report for it, plus the Cost
+Efficiency points the plan gives up against doing nothing. optimize() returns
+the plans no other plan beats on every chosen objective, among those meeting
+the budget and per-axis limits.
+
+Every axis is a sum of per-intervention contributions, so the joint level
+space never has to be enumerated:
+
+- each intervention's own level grid is evaluated once, in one batch call
+- a level combination another one of the same intervention dominates (on the
+  objectives and the limited axes) cannot be part of an optimal plan, so only
+  each intervention's Pareto front is kept
+- interventions are joined one at a time by broadcasting the partial plans
+  against the next front; partial plans that cannot meet a limit even with
+  the best contributions still to come are cut, and the rest are reduced to
+  their Pareto front before the next join
+- a quick first pass that only carries the best BEAM_WIDTH partial plans
+  through each join finds good complete plans; in the exact pass, a partial
+  plan one of them beats even if every later intervention added its best is
+  cut as well
+
+so the work grows with the size of the fronts rather than with the product of
+every level range. bench_optimizer.py checks the result against brute force.
+"""
+import inspect
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+from batch_metrics import BATCH_CALCULATORS, evaluate_levels
+from core.config import COMBINED_TRADEOFFS, COST_AXIS, INTERVENTIONS
+from scenario_table import result_at
+
+# Points of the specs' cost axis (e.g. Cost Efficiency) a plan loses against
+# all levels at 0, summed over the interventions; the budget is a cap on it.
+# None when no spec names a cost axis.
+COST_LOSS_AXIS = f"{COST_AXIS} Loss" if COST_AXIS is not None else None
+AXES = (*COMBINED_TRADEOFFS, COST_LOSS_AXIS) if COST_LOSS_AXIS is not None else tuple(COMBINED_TRADEOFFS)
+
+# +1 for axes where higher is better, -1 where lower is
+AXIS_SENSE = {axis: -1 if axis == COST_LOSS_AXIS else 1 for axis in AXES}
+
+DEFAULT_OBJECTIVES = tuple(COMBINED_TRADEOFFS)
+
+CALCULATOR_ARGS = {
+    intervention: tuple(inspect.signature(calculator).parameters)
+    for intervention, calculator in BATCH_CALCULATORS.items()
+}
+
+
+class InterventionSpace(NamedTuple):
+    intervention: str
+    params: Tuple[str, ...]  # slider parameters searched, in calculator argument order
+    levels: np.ndarray  # (n, len(params)) slider levels
+    values: np.ndarray  # (n, len(AXES)) contribution of each level combination to every axis
+
+
+class ParetoFront(NamedTuple):
+    objectives: Tuple[str, ...]
+    columns: Tuple[Tuple[str, str], ...]  # (intervention, parameter) of each plans column
+    plans: np.ndarray  # (n, len(columns)) slider levels
+    scores: np.ndarray  # (n, len(AXES)) combined axis values
+    joint_size: int  # plans in the full joint level space
+    evaluated: int  # partial and full plans scored during the search
+
+    def params_values(self, i):
+        """{intervention: {parameter: level}} of plan i, as the sliders take them"""
+        values = {}
+        for (intervention, param), level in zip(self.columns, self.plans[i].tolist()):
+            values.setdefault(intervention, {})[param] = level
+        return values
+
+    def axis(self, name):
+        """Scores of every plan on one axis"""
+        return self.scores[:, AXES.index(name)]
+
+
+def intervention_space(intervention):
+    """
+    Evaluate every slider level combination of one intervention
+
+    Calculator arguments without a slider are held at 0, as in the app.
+
+    Returns:
+    - InterventionSpace with the contribution of each combination to every axis
+    """
+    parameters = INTERVENTIONS[intervention]["parameters"]
+    arg_names = CALCULATOR_ARGS[intervention]
+    params = tuple(name for name in arg_names if name in parameters)
+    low = np.array([parameters[name]["min"] for name in params], dtype=np.intp)
+    shape = tuple(parameters[name]["max"] - parameters[name]["min"] + 1 for name in params)
+    levels = np.indices(shape, dtype=np.intp).reshape(len(params), -1).T + low
+
+    # Row 0 is the do-nothing baseline the cost loss is measured from
+    args = np.zeros((len(levels) + 1, len(arg_names)), dtype=np.intp)
+    args[1:, [arg_names.index(name) for name in params]] = levels
+    results = evaluate_levels(intervention, args)
+
+    values = np.zeros((len(levels), len(AXES)))
+    for k, (axis, sources) in enumerate(COMBINED_TRADEOFFS.items()):
+        if intervention in sources:
+            values[:, k] = np.asarray(result_at(results, sources[intervention]), dtype=np.float64)[1:] / len(sources)
+    cost_path = COMBINED_TRADEOFFS[COST_AXIS].get(intervention) if COST_AXIS is not None else None
+    if cost_path is not None:
+        cost = np.asarray(result_at(results, cost_path), dtype=np.float64)
+        values[:, -1] = cost[0] - cost[1:]
+    return InterventionSpace(intervention, params, levels, values)
+
+
+# pareto_mask sweeps with this many front rows before switching to blocks
+SWEEP_ROWS = 64
+BLOCK_ROWS = 512
+
+# Partial plans carried through each join by the quick pass that finds the
+# plans used to cut the exact search
+BEAM_WIDTH = 4096
+
+
+def pareto_mask(scores):
+    """
+    Rows of scores no other row dominates (at least as good everywhere, better somewhere)
+
+    Parameters:
+    - scores: (n, m) array, higher is better in every column
+
+    Returns:
+    - Boolean mask of length n; rows with equal scores are all kept
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    # A row can only be dominated by one with a larger total, so rows visited by
+    # decreasing total that survive everything before them are on the front
+    index = np.argsort(-scores.sum(axis=1), kind="stable")
+    remaining = scores[index]
+
+    # The first front rows each drop what they dominate, which usually thins
+    # the set out a lot for the price of one pass each
+    i = 0
+    while i < len(remaining) and i < SWEEP_ROWS:
+        keep = np.any(remaining > remaining[i], axis=1) | np.all(remaining == remaining[i], axis=1)
+        index, remaining = index[keep], remaining[keep]
+        i = np.count_nonzero(keep[:i]) + 1
+
+    # Then blocks of the rest are checked against the front found so far
+    keep = np.ones(len(remaining), dtype=bool)
+    fronts = []
+    for start in range(i, len(remaining), BLOCK_ROWS):
+        block = remaining[start:start + BLOCK_ROWS]
+        dominated = _dominated(block, block)
+        for front in fronts:
+            dominated |= _dominated(block, front)
+        keep[start:start + BLOCK_ROWS] = ~dominated
+        fronts.append(block[~dominated])
+
+    mask = np.zeros(len(scores), dtype=bool)
+    mask[index[keep]] = True
+    return mask
+
+
+def _dominated(rows, front, max_cells=4_000_000):
+    """Mask of the rows some row of front dominates (higher is better in every column)"""
+    dominated = np.zeros(len(rows), dtype=bool)
+    step = max(1, max_cells // max(len(front), 1))
+    for start in range(0, len(rows), step):
+        block = rows[start:start + step]
+        worse = np.zeros((len(front), len(block)), dtype=bool)
+        better = np.zeros((len(front), len(block)), dtype=bool)
+        for column in range(rows.shape[1]):
+            worse |= front[:, column, None] < block[None, :, column]
+            better |= front[:, column, None] > block[None, :, column]
+        dominated[start:start + step] = np.any(better & ~worse, axis=0)
+    return dominated
+
+
+def _normalize_limits(limits, budget):
+    """{axis index: (low, high)} with None replaced by -inf/+inf"""
+    limits = dict(limits or {})
+    if budget is not None:
+        if COST_LOSS_AXIS is None:
+            raise ValueError("A budget needs a cost_axis in the optimizer section of a spec")
+        low, high = limits.get(COST_LOSS_AXIS, (None, None))
+        limits[COST_LOSS_AXIS] = (low, budget if high is None else min(high, budget))
+    bounds = {}
+    for axis, (low, high) in limits.items():
+        if axis not in AXES:
+            raise ValueError(f"Unknown axis {axis!r} (expected one of {', '.join(AXES)})")
+        bounds[AXES.index(axis)] = (-np.inf if low is None else low, np.inf if high is None else high)
+    return bounds
+
+
+def optimize(objectives=DEFAULT_OBJECTIVES, limits=None, budget=None, interventions=None):
+    """
+    Pareto front of combined plans over several interventions
+
+    Parameters:
+    - objectives: axes of AXES to optimize (COST_LOSS_AXIS is minimized, the
+      rest maximized); default every combined trade-off score
+    - limits: {axis: (low, high)} bounds a plan must meet, either may be None,
+      e.g. {"Sidewalk Clearance": (80, None)}
+    - budget: maximum cost loss, shorthand for a COST_LOSS_AXIS limit
+    - interventions: interventions to combine (default all of INTERVENTIONS)
+
+    Returns:
+    - ParetoFront sorted by the first objective, best first; empty if no
+      plan meets the limits
+    """
+    spaces = [intervention_space(name) for name in (interventions or INTERVENTIONS)]
+    return search(spaces, objectives, limits, budget)
+
+
+def search(spaces, objectives=DEFAULT_OBJECTIVES, limits=None, budget=None):
+    """optimize() over already evaluated InterventionSpaces"""
+    objectives = tuple(objectives)
+    for axis in objectives:
+        if axis not in AXES:
+            raise ValueError(f"Unknown objective {axis!r} (expected one of {', '.join(AXES)})")
+    if not objectives:
+        raise ValueError("At least one objective is required")
+    bounds = _normalize_limits(limits, budget)
+
+    # Columns dominance is judged on, oriented so higher is better. A limited
+    # axis counts in its safe direction; a two-sided one both ways, so only
+    # equal values can replace each other.
+    signs, columns = [], []
+    for axis in objectives:
+        columns.append(AXES.index(axis))
+        signs.append(AXIS_SENSE[axis])
+    for k, (low, high) in bounds.items():
+        if low > -np.inf:
+            columns.append(k)
+            signs.append(1)
+        if high < np.inf:
+            columns.append(k)
+            signs.append(-1)
+    columns, signs = np.array(columns), np.array(signs, dtype=np.float64)
+
+    def oriented(values, rest=None):
+        if rest is None:
+            return values[:, columns] * signs
+        # A limit every partial plan meets whatever comes next constrains nothing
+        # any more; dropping its column keeps the fronts small
+        settled = np.array([
+            k >= len(objectives) and (
+                np.all(values[:, c] + worst_rest[rest, c] >= bounds[c][0]) if sign > 0
+                else np.all(values[:, c] + best_rest[rest, c] <= bounds[c][1]))
+            for k, (c, sign) in enumerate(zip(columns, signs))
+        ], dtype=bool)
+        return values[:, columns[~settled]] * signs[~settled]
+
+    joint_size = int(np.prod([len(space.levels) for space in spaces]))
+    spaces = [space._replace(levels=space.levels[mask], values=space.values[mask])
+              for space in spaces for mask in [pareto_mask(oriented(space.values))]]
+
+    # Best and worst contributions of the interventions still to join, per axis
+    best_rest = np.zeros((len(spaces) + 1, len(AXES)))
+    worst_rest = np.zeros((len(spaces) + 1, len(AXES)))
+    for i in range(len(spaces) - 1, -1, -1):
+        best_rest[i] = best_rest[i + 1] + spaces[i].values.max(axis=0)
+        worst_rest[i] = worst_rest[i + 1] + spaces[i].values.min(axis=0)
+    bound_axes = np.array(list(bounds), dtype=np.intp)
+    low = np.array([bounds[k][0] for k in bound_axes])
+    high = np.array([bounds[k][1] for k in bound_axes])
+
+    # Objectives oriented so higher is better, and the most the rest can add to each
+    objective_columns = np.array([AXES.index(axis) for axis in objectives])
+    objective_signs = np.array([AXIS_SENSE[axis] for axis in objectives], dtype=np.float64)
+    best_objectives = np.zeros((len(spaces) + 1, len(objectives)))
+    for i in range(len(spaces) - 1, -1, -1):
+        best_objectives[i] = best_objectives[i + 1] + (spaces[i].values[:, objective_columns] * objective_signs).max(axis=0)
+
+    def join(beam=None, incumbents=None):
+        plans = np.zeros((1, 0), dtype=np.intp)
+        values = np.zeros((1, len(AXES)))
+        evaluated = 0
+        for i, space in enumerate(spaces):
+            n, m = len(values), len(space.values)
+            values = (values[:, None, :] + space.values[None, :, :]).reshape(n * m, len(AXES))
+            plans = np.hstack([np.repeat(plans, m, axis=0), np.tile(space.levels, (n, 1))])
+            evaluated += len(values)
+            keep = (np.all(values[:, bound_axes] + best_rest[i + 1, bound_axes] >= low, axis=1)
+                    & np.all(values[:, bound_axes] + worst_rest[i + 1, bound_axes] <= high, axis=1))
+            if incumbents is not None:
+                optimistic = values[:, objective_columns] * objective_signs + best_objectives[i + 1]
+                keep &= ~_dominated(optimistic, incumbents)
+            plans, values = plans[keep], values[keep]
+            if beam is None:
+                keep = pareto_mask(oriented(values, i + 1))
+            else:
+                totals = (values[:, objective_columns] * objective_signs).sum(axis=1)
+                keep = np.argsort(-totals, kind="stable")[:beam]
+            plans, values = plans[keep], values[keep]
+        return plans, values, evaluated
+
+    # A quick pass that only carries the best partial plans on finds good
+    # complete ones; the exact pass then cuts every partial plan that one of
+    # them beats even if the rest of the plan adds the most it could
+    _, values, evaluated = join(beam=BEAM_WIDTH)
+    incumbents = values[:, objective_columns] * objective_signs
+    plans, values, exact_evaluated = join(incumbents=incumbents[pareto_mask(incumbents)])
+    evaluated += exact_evaluated
+
+    # The limited axes have done their job; the front is over the objectives alone
+    keep = pareto_mask(values[:, objective_columns] * objective_signs)
+    plans, values = plans[keep], values[keep]
+    order = np.lexsort((-values[:, objective_columns] * objective_signs).T[::-1])
+
+    return ParetoFront(
+        objectives,
+        tuple((space.intervention, param) for space in spaces for param in space.params),
+        plans[order],
+        values[order],
+        joint_size,
+        evaluated,
+    )
@@ -0,0 +1,353 @@
+"""
+Streamlit caching layer for everything app.py renders.
+
+Figures and dataframes are cached keyed by (intervention, level tuple,
+scenario table version) so moving a slider back to a previously seen
+position skips rebuilding them. Per-scenario caches are LRU bounded with
+max_entries; the asset bytes are loaded once per process.
+"""
+import hashlib
+import io
+import itertools
+import json
+import os
+
+import streamlit as st
+
+from core.config import ASSET_MANIFEST, CATEGORICAL_LABELS, COLUMN_IMAGE_WIDTH, INTERVENTIONS
+from core.registry import REGISTRY
+from scenario_table import get_table, result_at
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(APP_DIR, "assets")
+
+# Written by build_assets.py; served by Streamlit's static file serving
+VARIANT_MANIFEST_PATH = os.path.join(APP_DIR, "static", "variants", "manifest.json")
+
+# <picture> sizes hint: a before/after column is ~1/3 of the wide layout,
+# full width on narrow screens where Streamlit stacks the columns
+COLUMN_IMAGE_SIZES = "(max-width: 640px) 100vw, 33vw"
+
+# LRU bound for the per-scenario caches (the full level space is 9 + 27 entries)
+MAX_CACHED_SCENARIOS = 64
+
+# LRU bound for decoded thumbnails (one per distinct asset and width)
+MAX_CACHED_THUMBNAILS = 32
+
+
+@st.cache_resource
+def load_assets():
+    """Read every PNG in ./assets once and keep the bytes for the process lifetime"""
+    assets = {}
+    for name in sorted(os.listdir(ASSETS_DIR)):
+        if name.lower().endswith(".png"):
+            with open(os.path.join(ASSETS_DIR, name), "rb") as f:
+                assets[name] = f.read()
+    return assets
+
+
+def asset_bytes(name):
+    """Preloaded bytes for an asset file name, e.g. "b0.png" """
+    return load_assets()[name]
+
+
+def validate_asset_manifest(assets_dir=ASSETS_DIR):
+    """
+    Check ASSET_MANIFEST against the files in ./assets and the slider ranges
+
+    Raises ValueError listing every missing file and uncovered level combination.
+    """
+    available = set(os.listdir(assets_dir))
+    problems = []
+    for intervention, manifest in ASSET_MANIFEST.items():
+        parameters = INTERVENTIONS[intervention]["parameters"]
+        ranges = [range(parameters[name]["min"], parameters[name]["max"] + 1) for name in manifest["levels"]]
+        for levels in itertools.product(*ranges):
+            if levels not in manifest["transformations"]:
+                problems.append(f"{intervention}: no image for levels {levels}")
+
+        entries = [manifest["current"], *manifest["transformations"].values()]
+        for name in sorted({name for name, _ in entries} - available):
+            problems.append(f"{intervention}: missing asset {name}")
+
+    if problems:
+        raise ValueError("Invalid ASSET_MANIFEST:\n" + "\n".join(problems))
+
+
+def resolve_asset(intervention, params_values):
+    """(file name, caption) of the Transformation image for the current slider values, None if the spec has no assets"""
+    manifest = ASSET_MANIFEST.get(intervention)
+    if manifest is None:
+        return None
+    levels = tuple(params_values.get(name, 0) for name in manifest["levels"])
+    return manifest["transformations"][levels]
+
+
+@st.cache_resource(max_entries=MAX_CACHED_THUMBNAILS)
+def thumbnail(name, width=COLUMN_IMAGE_WIDTH):
+    """
+    PNG bytes of an asset downscaled to at most width pixels wide
+
+    Decoded lazily on first use from the preloaded asset bytes, so the page
+    never ships the full-resolution originals.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(asset_bytes(name))) as image:
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format="PNG")
+    return output.getvalue()
+
+
+@st.cache_data(max_entries=MAX_CACHED_SCENARIOS)
+def radar_figure(intervention, levels, version, draws=0):
+    """
+    Serialized radar chart of the scores in the intervention spec's "chart" for one scenario
+
+    version is the scenario table version; it is only part of the cache key so
+    cached figures are dropped when the modules that compile the specs change
+    (spec edits need a restart, see scenario_table). With
+    draws, the 5-95th and 25-75th percentile bands of uncertainty_analysis()
+    are drawn around the scores.
+    """
+    import plotly.graph_objects as go
+
+    results = get_table(intervention).scenarios[levels].results
+    chart = REGISTRY[intervention].chart
+    categories = list(chart)
+    values = [result_at(results, path) for path in chart.values()]
+
+    fig_radar = go.Figure()
+
+    # Add trace for current values
+    fig_radar.add_trace(go.Scatterpolar(
+        r=values,
+        theta=categories,
+        fill='toself',
+        name='Current Selection',
+        line=dict(color='rgba(31, 119, 180, 0.8)'),
+        fillcolor='rgba(31, 119, 180, 0.3)'
+    ))
+
+    # Add trace for baseline (50% on all metrics)
+    fig_radar.add_trace(go.Scatterpolar(
+        r=[50] * len(categories),
+        theta=categories,
+        fill='toself',
+        name='Baseline',
+        line=dict(color='rgba(100, 100, 100, 0.3)'),
+        fillcolor='rgba(100, 100, 100, 0.1)'
+    ))
+
+    if draws:
+        analysis = uncertainty_analysis(intervention, levels, draws, version)
+        closed = categories + categories[:1]
+        for (low, high), name, opacity in (((0, 4), "5-95th percentile", 0.15), ((1, 3), "25-75th percentile", 0.3)):
+            # The inner ring first, then the outer one filled back to it
+            for column, fill in ((low, None), (high, 'tonext')):
+                ring = analysis.percentiles[:, column].tolist()
+                fig_radar.add_trace(go.Scatterpolar(
+                    r=ring + ring[:1],
+                    theta=closed,
+                    mode='lines',
+                    fill=fill,
+                    name=name,
+                    legendgroup=name,
+                    showlegend=fill is not None,
+                    line=dict(color='rgba(255, 127, 14, 0.5)', width=1),
+                    fillcolor=f'rgba(255, 127, 14, {opacity})'
+                ))
+
+    # Update radar layout
+    fig_radar.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 100]
+            )
+        ),
+        showlegend=True,
+        height=450,
+        margin=dict(l=80, r=80, t=40, b=40)
+    )
+
+    # A plain dict pickles far cheaper than a go.Figure on every cache hit
+    return fig_radar.to_plotly_json()
+
+
+@st.cache_data(max_entries=MAX_CACHED_SCENARIOS)
+def uncertainty_analysis(intervention, levels, draws, version):
+    """Monte Carlo and Sobol analysis of one scenario's chart axes (see uncertainty.py); version as in radar_figure"""
+    from uncertainty import analyze
+
+    return analyze(intervention, levels, draws)
+
+
+@st.cache_data(max_entries=MAX_CACHED_SCENARIOS)
+def uncertainty_frames(intervention, levels, draws, version):
+    """
+    DataFrames of an uncertainty_analysis() for display
+
+    Returns:
+    - (bands, sensitivity): bands has one row per chart axis with the point
+      score, mean, standard deviation and percentiles; sensitivity one row per
+      axis and uncertain coefficient with its Sobol indices and tornado scores
+    """
+    import pandas as pd
+    from uncertainty import PERCENTILES
+
+    analysis = uncertainty_analysis(intervention, levels, draws, version)
+    bands = pd.DataFrame({
+        "Trade-off": analysis.axes,
+        "Estimate": analysis.point.round(1),
+        "Mean": analysis.mean.round(1),
+        "Std": analysis.std.round(2),
+        **{f"P{q}": analysis.percentiles[:, j].round(1) for j, q in enumerate(PERCENTILES)},
+    })
+    columns = ["Trade-off", "Coefficient", "First-order", "Total", "Low", "High"]
+    sensitivity = pd.DataFrame([
+        {
+            "Trade-off": axis,
+            "Coefficient": coefficient,
+            "First-order": round(float(analysis.first_order[a, c]), 3),
+            "Total": round(float(analysis.total[a, c]), 3),
+            "Low": round(float(analysis.low[a, c]), 2),
+            "High": round(float(analysis.high[a, c]), 2),
+        }
+        for a, axis in enumerate(analysis.axes)
+        for c, coefficient in enumerate(analysis.coefficients)
+        if analysis.low[a, c] != analysis.high[a, c]
+    ], columns=columns)
+    return bands, sensitivity
+
+
+@st.cache_data(max_entries=MAX_CACHED_SCENARIOS)
+def tornado_figure(intervention, levels, draws, axis, version):
+    """Serialized tornado chart of one chart axis: score with each coefficient at the ends of its range"""
+    import plotly.graph_objects as go
+
+    _, sensitivity = uncertainty_frames(intervention, levels, draws, version)
+    analysis = uncertainty_analysis(intervention, levels, draws, version)
+    point = float(analysis.point[analysis.axes.index(axis)])
+    rows = sensitivity[sensitivity["Trade-off"] == axis]
+    rows = rows.assign(swing=(rows["High"] - rows["Low"]).abs()).sort_values("swing")
+
+    fig = go.Figure()
+    for end, color in (("Low", 'rgba(214, 39, 40, 0.7)'), ("High", 'rgba(44, 160, 44, 0.7)')):
+        fig.add_trace(go.Bar(
+            y=rows["Coefficient"],
+            x=rows[end] - point,
+            base=point,
+            orientation='h',
+            name=f"Coefficient at {end.lower()} end",
+            marker_color=color,
+            customdata=rows["Total"],
+            hovertemplate="%{y}: %{x:+.2f} (Sobol total %{customdata:.3f})<extra></extra>",
+        ))
+    fig.update_layout(
+        barmode='overlay',
+        height=max(250, 40 * len(rows) + 100),
+        margin=dict(l=20, r=20, t=30, b=20),
+        xaxis_title=f"{axis} (estimate {point:.1f})",
+    )
+    return fig.to_plotly_json()
+
+
+@st.cache_data(max_entries=MAX_CACHED_SCENARIOS)
+def combined_plans_frame(objectives, limits, budget, version):
+    """
+    DataFrame of the Pareto-optimal combined plans for the optimizer settings
+
+    One row per plan: the level of every slider, then its combined scores on
+    the objectives, the limited axes and the cost loss. limits is a
+    tuple of (axis, low, high); version as in radar_figure.
+    """
+    import pandas as pd
+    from optimizer import COST_LOSS_AXIS, optimize
+
+    front = optimize(objectives, {axis: (low, high) for axis, low, high in limits}, budget)
+    shown = [*objectives, *(axis for axis, _, _ in limits)]
+    if COST_LOSS_AXIS is not None:
+        shown.append(COST_LOSS_AXIS)
+    shown = list(dict.fromkeys(shown))
+    rows = []
+    for i in range(len(front.plans)):
+        row = {
+            INTERVENTIONS[intervention]["parameters"][param]["label"]: CATEGORICAL_LABELS[level]
+            for (intervention, param), level in zip(front.columns, front.plans[i].tolist())
+        }
+        row.update({axis: round(float(front.axis(axis)[i]), 1) for axis in shown})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def load_variant_manifest():
+    """
+    Variant manifest written by build_assets.py, or None if it has not been built
+
+    Only a manifest that exists is cached, keyed by its mtime, so running
+    build_assets.py takes effect without restarting the server.
+    """
+    try:
+        mtime_ns = os.stat(VARIANT_MANIFEST_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _read_variant_manifest(mtime_ns)
+
+
+@st.cache_resource(max_entries=1)
+def _read_variant_manifest(mtime_ns):
+    with open(VARIANT_MANIFEST_PATH) as f:
+        return json.load(f)
+
+
+@st.cache_resource
+def asset_sha256(name):
+    """sha256 of the preloaded asset bytes, to detect variants built from an older file"""
+    return hashlib.sha256(asset_bytes(name)).hexdigest()
+
+
+def _picture_html(url, entry):
+    """<picture> element letting the browser pick format and width from the built variants"""
+    by_format = {}
+    for variant in entry["variants"]:
+        by_format.setdefault(variant["format"], []).append(variant)
+
+    def srcset(variants):
+        return ", ".join(f"{url}/{v['file']} {v['width']}w" for v in sorted(variants, key=lambda v: v["width"]))
+
+    sources = "".join(
+        f'<source type="image/{fmt}" srcset="{srcset(variants)}" sizes="{COLUMN_IMAGE_SIZES}">'
+        for fmt, variants in by_format.items() if fmt != "png"
+    )
+    fallbacks = by_format["png"]
+    fallback = min(fallbacks, key=lambda v: (v["width"] < COLUMN_IMAGE_WIDTH, abs(v["width"] - COLUMN_IMAGE_WIDTH)))
+    img = (
+        f'<img src="{url}/{fallback["file"]}" srcset="{srcset(fallbacks)}" sizes="{COLUMN_IMAGE_SIZES}" '
+        f'width="{fallback["width"]}" height="{fallback["height"]}" style="width: 100%; height: auto" alt="">'
+    )
+    return f"<picture>{sources}{img}</picture>"
+
+
+def show_asset(name, caption):
+    """
+    Render an asset image in the current column
+
+    Uses the compressed, content-hashed variants from build_assets.py when they
+    exist, are up to date and static serving is enabled; otherwise falls back
+    to a downscaled PNG thumbnail.
+    """
+    manifest = load_variant_manifest()
+    entry = manifest["sources"].get(name) if manifest else None
+    if (
+        entry is not None
+        and st.get_option("server.enableStaticServing")
+        and entry["sha256"] == asset_sha256(name)
+    ):
+        st.markdown(_picture_html(manifest["url"], entry), unsafe_allow_html=True)
+        st.caption(caption)
+    else:
+        st.image(thumbnail(name), caption=caption, use_column_width=True)
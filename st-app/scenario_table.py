@@ -0,0 +1,122 @@
+"""
+Startup-time precomputation of every scenario in the intervention registry.
+
+The level space is tiny (3x3 for seating, 3x3x3 for mobility), so instead of
+calling the calculators and formatting their output on every Streamlit rerun,
+each intervention's full level grid is evaluated once into an immutable table
+keyed by the level tuple. Tables carry a version hash of the modules that
+compile the specs, and are rebuilt automatically when those files change.
+The spec files themselves are not hashed: core.registry compiles them once,
+at import, so an edited spec only takes effect after restarting the app.
+"""
+import hashlib
+import inspect
+import itertools
+import os
+from types import MappingProxyType
+from typing import Any, Mapping, NamedTuple, Tuple
+
+from core import config, metrics, registry
+from core.registry import REGISTRY
+
+# Modules whose source, with the registry loaded at import, determines the table contents
+_VERSIONED_MODULES = (metrics, registry, config)
+
+
+class Scenario(NamedTuple):
+    levels: Tuple[int, ...]
+    results: Mapping[str, Any]  # frozen calculator output
+    display: Tuple[Tuple[str, str, Any], ...]  # (display_name, formatted value, delta)
+
+
+class ScenarioTable(NamedTuple):
+    intervention: str
+    version: str
+    arg_names: Tuple[str, ...]
+    scenarios: Mapping[Tuple[int, ...], Scenario]
+
+    def levels_for(self, params_values):
+        """Map slider values to the calculator's positional level tuple"""
+        return tuple(params_values.get(name, 0) for name in self.arg_names)
+
+    def lookup(self, params_values):
+        """Return the precomputed Scenario for a dict of parameter values"""
+        return self.scenarios[self.levels_for(params_values)]
+
+
+def _freeze(value):
+    """Recursively wrap dicts in read-only proxies"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    return value
+
+
+def result_at(results, path):
+    """The calculator output at a key path such as ("metrics", "Pedestrian Dwell Time (min)")"""
+    for key in path:
+        results = results[key]
+    return results
+
+
+def _display_rows(intervention, results):
+    """Format the rows listed in the intervention spec's "display" for st.metric"""
+    rows = []
+    for row in REGISTRY[intervention].display:
+        delta = result_at(results, row["delta"]) if "delta" in row else None
+        rows.append((row["label"], row["format"].format(result_at(results, row["value"])), delta))
+    return tuple(rows)
+
+
+_source_hash_cache = {}
+
+
+def _source_hash(path):
+    """Content hash of a source file, re-read only when its stat changes"""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _source_hash_cache:
+        with open(path, "rb") as f:
+            _source_hash_cache[key] = hashlib.sha256(f.read()).hexdigest()
+    return _source_hash_cache[key]
+
+
+def sources_version():
+    """Version hash of the modules that compile the intervention specs"""
+    digest = hashlib.sha256()
+    for path in [inspect.getsourcefile(module) for module in _VERSIONED_MODULES]:
+        digest.update(_source_hash(path).encode())
+    return digest.hexdigest()[:16]
+
+
+def build_table(intervention, version=None):
+    """Evaluate every level combination for one intervention"""
+    spec = REGISTRY[intervention]
+
+    scenarios = {}
+    for levels in itertools.product(*(range(count) for count in spec.level_counts)):
+        results = spec.calculate(*levels)
+        scenarios[levels] = Scenario(levels, _freeze(results), _display_rows(intervention, results))
+
+    return ScenarioTable(
+        intervention,
+        version or sources_version(),
+        spec.inputs,
+        MappingProxyType(scenarios),
+    )
+
+
+_tables = {}
+
+
+def get_table(intervention):
+    """Return the scenario table for an intervention, rebuilding it if the sources changed"""
+    version = sources_version()
+    table = _tables.get(intervention)
+    if table is None or table.version != version:
+        table = _tables[intervention] = build_table(intervention, version)
+    return table
+
+
+def build_all_tables():
+    """Precompute tables for every intervention (called once at app startup)"""
+    return {intervention: get_table(intervention) for intervention in REGISTRY}
@@ -0,0 +1,223 @@
+"""
+Monte Carlo uncertainty and sensitivity analysis of the trade-off scores.
+
+The coefficients of the spec formulas (e.g. bench_impact * 0.8) are point
+estimates. Here each one is drawn from a symmetric triangular distribution
+around its estimate, with half-width spread * |estimate|. The spread comes
+from the formula's "spread" entry, else the spec's top-level "spread", else
+DEFAULT_SPREAD. Coefficients with spread 0 stay fixed.
+
+For one scenario (fixed slider levels), analyze() evaluates the spec's chart
+axes over many draws with the formulas compiled against NumPy, which take
+every draw of a coefficient as one array. Draws are processed in chunks of
+CHUNK_DRAWS, so memory stays flat however many draws are requested. It
+reports:
+
+- percentiles of each axis, streamed through fixed histograms (resolution:
+  the axis range seen in the first chunk / HISTOGRAM_BINS);
+- first-order and total Sobol indices per axis and coefficient, using the
+  Saltelli (2010) and Jansen (1999) estimators. Each chunk of n draws costs
+  n * (k + 2) evaluations for k uncertain coefficients;
+- tornado swings: each axis with one coefficient at the low, then the high,
+  end of its range and the others at their estimates.
+"""
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+from batch_metrics import NUMPY_BACKEND
+from core.metrics import compile_formulas, generate_source
+from core.registry import REGISTRY
+from scenario_table import result_at
+
+DEFAULT_SPREAD = 0.2  # coefficients within +-20% of the estimate
+PERCENTILES = (5, 25, 50, 75, 95)
+CHUNK_DRAWS = 65_536
+HISTOGRAM_BINS = 8192
+
+
+class CoefficientModel(NamedTuple):
+    intervention: str
+    evaluate: object  # evaluator compiled with sampled=True
+    axes: Tuple[str, ...]  # chart axes
+    paths: Tuple[tuple, ...]  # result path of each axis
+    estimates: np.ndarray  # point estimate of every coefficient
+    uncertain: np.ndarray  # indices of the sampled coefficients that affect an axis
+    half_widths: np.ndarray  # triangular half-width of each uncertain coefficient
+    labels: Tuple[str, ...]  # "formula × term" of each uncertain coefficient
+
+
+class UncertaintyResult(NamedTuple):
+    intervention: str
+    levels: Tuple[int, ...]
+    axes: Tuple[str, ...]
+    draws: int
+    evaluations: int
+    point: np.ndarray  # (axes,) score with every coefficient at its estimate
+    mean: np.ndarray  # (axes,)
+    std: np.ndarray  # (axes,)
+    percentiles: np.ndarray  # (axes, len(PERCENTILES))
+    coefficients: Tuple[str, ...]  # labels of the uncertain coefficients
+    first_order: np.ndarray  # (axes, coefficients) Sobol first-order indices
+    total: np.ndarray  # (axes, coefficients) Sobol total indices
+    low: np.ndarray  # (axes, coefficients) score with the coefficient at the low end
+    high: np.ndarray  # (axes, coefficients) score with the coefficient at the high end
+
+
+_models = {}
+
+
+def coefficient_model(intervention):
+    """Compiled sampled evaluator and coefficient distributions of an intervention (built once)"""
+    if intervention not in _models:
+        entry = REGISTRY[intervention]
+        generated = generate_source(entry.spec, sampled=True)
+        default = entry.spec.get("spread", DEFAULT_SPREAD)
+        axes = tuple(entry.chart)
+        paths = tuple(entry.chart.values())
+        relevant = set().union(*(generated.depends[path] for path in paths))
+
+        estimates = np.array([c.value for c in generated.coefficients], dtype=np.float64)
+        spreads = np.array([default if c.spread is None else c.spread for c in generated.coefficients])
+        uncertain = np.array(sorted(i for i in relevant if spreads[i] > 0 and estimates[i] != 0), dtype=np.intp)
+        labels = tuple(
+            f"{generated.coefficients[i].formula[-1]} × {generated.coefficients[i].term}" for i in uncertain
+        )
+        _models[intervention] = CoefficientModel(
+            intervention,
+            compile_formulas(entry.spec, NUMPY_BACKEND, sampled=True),
+            axes,
+            paths,
+            estimates,
+            uncertain,
+            spreads[uncertain] * np.abs(estimates[uncertain]),
+            labels,
+        )
+    return _models[intervention]
+
+
+def _triangular(model, uniform):
+    """Map uniform (k, n) draws to the symmetric triangular coefficient distributions"""
+    centered = np.where(uniform < 0.5, np.sqrt(2 * uniform) - 1, 1 - np.sqrt(2 * (1 - uniform)))
+    return model.estimates[model.uncertain, None] + model.half_widths[:, None] * centered
+
+
+def _scores(model, levels, samples):
+    """(axes, n) chart scores with the uncertain coefficients set to samples (k, n)"""
+    coefficients = list(model.estimates)
+    for row, i in enumerate(model.uncertain):
+        coefficients[i] = samples[row]
+    results = model.evaluate(*levels, coefficients)
+    n = samples.shape[1]
+    return np.stack([np.broadcast_to(result_at(results, path), (n,)) for path in model.paths])
+
+
+class _Histograms:
+    """Per-axis streaming histograms for percentiles of more draws than fit in memory"""
+
+    def __init__(self, first_chunk):
+        low, high = first_chunk.min(axis=1), first_chunk.max(axis=1)
+        pad = np.maximum((high - low) * 0.05, 1e-9)
+        self.low, self.high = low - pad, high + pad
+        self.width = (self.high - self.low) / HISTOGRAM_BINS
+        self.counts = np.zeros((len(low), HISTOGRAM_BINS), dtype=np.int64)
+
+    def add(self, values):
+        bins = ((values - self.low[:, None]) / self.width[:, None]).astype(np.intp)
+        np.clip(bins, 0, HISTOGRAM_BINS - 1, out=bins)
+        for axis, row in enumerate(bins):
+            self.counts[axis] += np.bincount(row, minlength=HISTOGRAM_BINS)
+
+    def percentiles(self, qs):
+        cumulative = np.cumsum(self.counts, axis=1)
+        total = cumulative[:, -1:]
+        out = np.empty((len(self.counts), len(qs)))
+        for j, q in enumerate(qs):
+            target = total[:, 0] * q / 100
+            bin_index = np.minimum(np.argmax(cumulative >= target[:, None], axis=1), HISTOGRAM_BINS - 1)
+            rows = np.arange(len(self.counts))
+            before = np.where(bin_index > 0, cumulative[rows, bin_index - 1], 0)
+            inside = self.counts[rows, bin_index]
+            fraction = np.divide(target - before, inside, out=np.full(len(rows), 0.5), where=inside > 0)
+            out[:, j] = self.low + (bin_index + fraction) * self.width
+        return out
+
+
+def analyze(intervention, levels, draws=100_000, seed=0, chunk_draws=CHUNK_DRAWS):
+    """
+    Monte Carlo uncertainty and Sobol sensitivity of an intervention's chart axes
+
+    Parameters:
+    - intervention: key of the registry
+    - levels: level of each calculator input, in positional order
+    - draws: Monte Carlo sample size; the percentiles use 2 * draws draws and
+      the model is evaluated draws * (coefficients + 2) times
+    - seed: random seed, for reproducible bands
+    - chunk_draws: draws evaluated per batch, which bounds memory
+
+    Returns:
+    - UncertaintyResult
+    """
+    if draws < 1:
+        raise ValueError(f"draws must be at least 1, got {draws}")
+    model = coefficient_model(intervention)
+    levels = tuple(int(level) for level in levels)
+    k = len(model.uncertain)
+    rng = np.random.default_rng(seed)
+
+    point = _scores(model, levels, model.estimates[model.uncertain, None])[:, 0]
+    ends = np.repeat(model.estimates[model.uncertain, None], 2 * k, axis=1)
+    ends[np.arange(k), 2 * np.arange(k)] -= model.half_widths
+    ends[np.arange(k), 2 * np.arange(k) + 1] += model.half_widths
+    swings = _scores(model, levels, ends) if k else np.empty((len(model.axes), 0))
+
+    histograms = None
+    count = 0
+    total = np.zeros(len(model.axes))
+    total_sq = np.zeros(len(model.axes))
+    first_sum = np.zeros((len(model.axes), k))
+    total_sum = np.zeros((len(model.axes), k))
+    for start in range(0, draws, chunk_draws):
+        n = min(chunk_draws, draws - start)
+        a = _triangular(model, rng.random((k, n)))
+        b = _triangular(model, rng.random((k, n)))
+        # Centering on the point estimate keeps the running sums well conditioned
+        y_a = _scores(model, levels, a) - point[:, None]
+        y_b = _scores(model, levels, b) - point[:, None]
+        for i in range(k):
+            a_b = a.copy()
+            a_b[i] = b[i]
+            y_ab = _scores(model, levels, a_b) - point[:, None]
+            first_sum[:, i] += np.einsum("an,an->a", y_b, y_ab - y_a)
+            total_sum[:, i] += np.einsum("an,an->a", y_a - y_ab, y_a - y_ab)
+
+        both = np.concatenate([y_a, y_b], axis=1)
+        if histograms is None:
+            histograms = _Histograms(both)
+        histograms.add(both)
+        count += 2 * n
+        total += both.sum(axis=1)
+        total_sq += np.einsum("an,an->a", both, both)
+
+    mean = total / count
+    variance = np.maximum(total_sq / count - mean ** 2, 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        first_order = np.where(variance[:, None] > 0, first_sum / (count / 2) / variance[:, None], 0.0)
+        total_order = np.where(variance[:, None] > 0, total_sum / (count / 2) / 2 / variance[:, None], 0.0)
+
+    return UncertaintyResult(
+        intervention=intervention,
+        levels=levels,
+        axes=model.axes,
+        draws=draws,
+        evaluations=draws * (k + 2),
+        point=point,
+        mean=mean + point,
+        std=np.sqrt(variance),
+        percentiles=histograms.percentiles(PERCENTILES) + point[:, None],
+        coefficients=model.labels,
+        first_order=first_order,
+        total=total_order,
+        low=swings[:, 0::2],
+        high=swings[:, 1::2],
+    )